@@ -0,0 +1,134 @@
+"""
+On disk evaluation cache for parameter sweeps
+
+Evaluations are keyed by agent class and configuration, parameters as the strategy uses them, a
+fingerprint of the environment data and the episode settings and seed. Proposals rounding to the same configuration,
+repeated sweeps and notebook re-runs read earlier results instead of running the backtests again.
+Results live in a local sqlite file, safe to share between threads and processes.
+"""
+import hashlib
+import json
+import sqlite3
+from threading import Lock
+
+from ..utils import *
+
+import pandas as pd
+
+def to_json(value):
+    # numpy scalars and arrays as python values, anything else by its repr
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return repr(value)
+
+
+def fingerprint(env):
+    """
+    Hash of what an evaluation reads from the environment
+    :param env: BacktestEnvironment instance
+    :return: str: hex digest
+    """
+    digest = hashlib.sha1()
+    for pair in env.pairs:
+        digest.update(pd.util.hash_pandas_object(env.tapi.ohlc_data[pair], index=True).values.tobytes())
+    digest.update(json.dumps([env.period, env.obs_steps, env._fiat, env.episode_bounds(), env.benchmark,
+                              sorted(env.tax.items()), env.init_balance], default=to_json).encode())
+    return digest.hexdigest()
+
+
+def config_value(value):
+    # Hosted agents by their own configuration, functions by their qualified name
+    if hasattr(value, 'init_args'):
+        return agent_config(value)
+    if isinstance(value, (tuple, list)):
+        return [config_value(item) for item in value]
+    if callable(value) and hasattr(value, '__qualname__'):
+        return value.__module__ + '.' + value.__qualname__
+    return value
+
+
+def agent_config(agent):
+    """
+    Configuration of an agent, the arguments it was built with
+    :param agent: APrioriAgent instance
+    :return: dict: Constructor arguments and batch group, the agent name left out
+    """
+    config = {key: config_value(value) for key, value in agent.init_args.items() if key != 'name'}
+    config['batch_group'] = agent.batch_group()
+    return config
+
+
+class EvaluationCache(object):
+    """
+    Memoized backtest evaluations stored on disk
+    """
+    def __init__(self, path='./evaluations.sqlite'):
+        """
+        :param path: str: sqlite file, created if missing
+        """
+        self.path = path
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS evaluations (key TEXT PRIMARY KEY, params TEXT, "
+                              "reward REAL, reward_std REAL)")
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def __repr__(self):
+        return "EvaluationCache(%s, %d hits, %d misses, hit rate %.2f%%)" % (self.path, self.hits, self.misses,
+                                                                            100 * self.hit_rate)
+
+    @property
+    def hit_rate(self):
+        return safe_div(self.hits, self.hits + self.misses) if self.hits + self.misses else 0.
+
+    @staticmethod
+    def key(agent, params, env_fingerprint, settings):
+        """
+        :param agent: APrioriAgent: Evaluated agent
+        :param params: dict: Normalized parameters
+        :param env_fingerprint: str: Environment fingerprint
+        :param settings: dict: Episode settings and seed
+        :return: tuple: cache key and its parameters json
+        """
+        # Searched parameters are read from params
+        config = {key: value for key, value in agent_config(agent).items() if key not in params}
+        params = json.dumps(params, sort_keys=True, default=to_json)
+        key = json.dumps([agent.__class__.__module__ + '.' + agent.__class__.__name__, config, params,
+                          env_fingerprint, settings], sort_keys=True, default=to_json)
+        return hashlib.sha1(key.encode()).hexdigest(), params
+
+    def get(self, key):
+        """
+        :return: tuple: (reward mean, reward std) or None on a miss
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT reward, reward_std FROM evaluations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return row
+
+    def put(self, key, params, reward, reward_std):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?)",
+                              (key, params, float(reward), float(reward_std)))
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM evaluations")
+        self.reset_stats()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,174 @@
+"""
+Early stopping hyper parameter search for apriori strategies
+
+Candidates sampled from the search space are scored on short episode prefixes first and only the
+best fraction is resumed on longer ones, so bad parameter sets stop after a few steps.
+Every candidate of a bracket trades the same episodes, reward sums at a rung are comparable.
+Reference:
+    L. Li, K. Jamieson, G. DeSalvo, A. Rostamizadeh, A. Talwalkar.
+    Hyperband: A Novel Bandit-Based Approach to Hyperparameter Optimization, 2018.
+    https://arxiv.org/pdf/1603.06560.pdf
+"""
+from copy import copy, deepcopy
+from time import time
+
+from ..seeding import np_random
+from ..utils import *
+
+import pandas as pd
+
+
+def sample_params(search_space, rng):
+    """
+    Draw parameters from an optunity structured search space
+    :param search_space: dict: Ranges as [low, high], choices as nested dicts
+    :param rng: numpy RandomState
+    :return: dict: Parameters
+    """
+    params = {}
+    for key, value in search_space.items():
+        if isinstance(value, dict):
+            branch = list(value)[rng.randint(len(value))]
+            params[key] = branch
+            if value[branch]:
+                params.update(sample_params(value[branch], rng))
+        elif value is None:
+            params[key] = None
+        else:
+            params[key] = rng.uniform(value[0], value[1])
+
+    return params
+
+
+class SuccessiveHalving(object):
+    """
+    Successive halving evaluation budget.
+    Starts nb_steps candidates on min_steps long episodes and resumes the best 1 / eta of them on eta
+    times longer ones, until the survivors reach the full episode length.
+    """
+    def __init__(self, min_steps, eta=3, seed=None):
+        """
+        :param min_steps: int: Episode steps of the first rung
+        :param eta: int: Rung steps growth and survivors reduction factor
+        :param seed: int: Candidates and episode start points seed
+        """
+        assert eta > 1, "eta must be greater than one."
+        self.min_steps = min_steps
+        self.eta = eta
+        self.np_random, _ = np_random(seed)
+
+    def max_rung(self, max_steps):
+        return max(int(np.log(max_steps / self.min_steps) / np.log(self.eta) + 1e-9), 0)
+
+    def brackets(self, nb_steps, max_steps):
+        """
+        :return: list: (number of candidates, first rung steps) tuples
+        """
+        return [(nb_steps, max_steps / self.eta ** self.max_rung(max_steps))]
+
+    def sample(self, n, search_space, constraints):
+        candidates = []
+        for _ in range(n * 100):
+            params = sample_params(search_space, self.np_random)
+            if all(constraint(**params) for constraint in constraints):
+                candidates.append(params)
+            if len(candidates) == n:
+                break
+        return candidates
+
+    def advance(self, candidate, steps):
+        """
+        Resume every episode of a candidate up to steps
+        :return: float: Reward sum averaged over the episodes
+        """
+        for episode in candidate['episodes']:
+            if not episode['done'] and episode['steps'] < steps:
+                episode['obs'], r, episode['done'] = episode['agent'].test_steps(episode['env'],
+                                                                                 steps - episode['steps'],
+                                                                                 episode['obs'],
+                                                                                 episode['start_step'])
+                episode['reward'] += r
+                episode['steps'] = steps
+        score = np.mean([episode['reward'] for episode in candidate['episodes']])
+        return score if np.isfinite(score) else -np.inf
+
+    def search(self, agent, env, nb_steps, batch_size, search_space, constraints=None, nb_max_episode_steps=None,
+               start_step=0, verbose=1):
+        """
+        Search parameters
+        :param agent: APrioriAgent: Strategy to optimize, it is copied for every candidate episode
+        :param env: BacktestEnvironment instance
+        :param nb_steps: int: Candidates of the widest bracket
+        :param batch_size: int: Episodes per candidate
+        :param search_space: dict: optunity structured search space
+        :param constraints: list: Functions returning False when constraints are violated
+        :param nb_max_episode_steps: int: Full episode length, defaults to the env episode span
+        :return: tuple: Best parameters, dict with every evaluation and the env steps spent
+        """
+        if not env.initialized:
+            env.setup()
+        if not constraints:
+            constraints = [lambda *args, **kwargs: True]
+
+        first, last = env.episode_bounds()
+        max_steps = min(nb_max_episode_steps or last - first, last - first)
+
+        evaluations = []
+        spent = 0
+        best = (-np.inf, None)
+        t0 = time()
+        for n, steps in self.brackets(nb_steps, max_steps):
+            # Candidates of a bracket share the episodes
+            starts = self.np_random.randint(first, last - max_steps + 1, size=batch_size)
+            candidates = []
+            for params in self.sample(n, search_space, constraints):
+                model = deepcopy(agent)
+                model.set_params(**params)
+                episodes = []
+                for start in starts:
+                    episode_env = copy(env)
+                    episode_env.set_window(start, start + max_steps)
+                    episode_env.training = False
+                    episodes.append({'agent': deepcopy(model), 'env': episode_env, 'obs': None, 'reward': 0.,
+                                     'steps': 0, 'done': False, 'start_step': start_step})
+                candidates.append({'params': params, 'episodes': episodes})
+
+            done_steps = 0
+            for rung in range(self.max_rung(max_steps) + 1):
+                if not candidates:
+                    break
+                rung_steps = int(min(round(steps * self.eta ** rung), max_steps))
+                scores = [self.advance(candidate, rung_steps) for candidate in candidates]
+                spent += len(candidates) * (rung_steps - done_steps) * batch_size
+                done_steps = rung_steps
+                evaluations += [(candidate['params'], rung_steps, score) for candidate, score in
+                                zip(candidates, scores)]
+
+                if verbose:
+                    print("Bracket of {0} candidates, rung {1}: {2} candidates, {3} steps, best r: {4:.8f} elapsed: {5}"
+                          "          ".format(n, rung, len(candidates), rung_steps, max(scores),
+                                              str(pd.to_timedelta(time() - t0, unit='s'))), end="\r")
+
+                order = np.argsort(scores)[::-1]
+                if rung_steps >= max_steps:
+                    if best[1] is None or scores[order[0]] > best[0]:
+                        best = (scores[order[0]], candidates[order[0]]['params'])
+                    break
+                candidates = [candidates[i] for i in order[:max(len(candidates) // self.eta, 1)]]
+
+        if best[1] is None:
+            raise ValueError("No candidate satisfies the constraints.")
+
+        return best[1], {'evaluations': evaluations, 'steps': spent, 'best': best[0]}
+
+
+class Hyperband(SuccessiveHalving):
+    """
+    Hyperband evaluation budget.
+    Runs successive halving brackets from many candidates on short episodes to few candidates on full
+    episodes, hedging against rewards that only separate candidates late in the episode.
+    """
+    def brackets(self, nb_steps, max_steps):
+        s_max = self.max_rung(max_steps)
+        return [(int(np.ceil(nb_steps * (s_max + 1) / ((s + 1) * self.eta ** (s_max - s)))),
+                 max_steps / self.eta ** s) for s in range(s_max, -1, -1)]
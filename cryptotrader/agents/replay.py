@@ -0,0 +1,316 @@
+"""
+Replay storage for off policy agents
+
+Transitions keep only the bar index and the amounts held, observation windows are rebuilt
+from the shared price tensor on sampling. Storage is a set of flat numpy arrays, optionally
+memory mapped to a local directory so checkpoints are a flush instead of a pickle.
+"""
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from ..envs.vector import price_tensor, window_columns
+from ..seeding import np_random
+
+Experience = namedtuple('Experience', 'state0, action, reward, state1, terminal1')
+
+
+class SumTree(object):
+    """
+    Binary sum tree over leaf priorities, vectorised updates and prefix sum search
+    """
+    def __init__(self, capacity):
+        self.size = 1
+        while self.size < capacity:
+            self.size *= 2
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def update(self, leaves, priorities):
+        nodes = np.asarray(leaves) + self.size
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        """
+        Leaves whose priority prefix sums hold values
+        :param values: numpy array: in [0, total)
+        :return: numpy array: leaf indexes
+        """
+        nodes = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        while nodes[0] < self.size:
+            left = self.tree[2 * nodes]
+            right = values >= left
+            values -= left * right
+            nodes = 2 * nodes + right
+        return nodes - self.size
+
+
+class ReplayStore(object):
+    """
+    Ring buffer of transitions indexed into a shared price tensor.
+    Observations follow the get_observation(True) column layout, amounts held at each window bar are taken
+    from earlier transitions of the same episode.
+    Uniform sampling by default, proportional prioritised sampling when alpha > 0.
+    """
+    def __init__(self, prices, obs_steps, capacity, n_actions=None, alpha=0., beta=0.4, path=None, seed=None,
+                 mode='w+'):
+        """
+        :param prices: numpy array: shape (data_length, n_pairs, 5), see price_tensor
+        :param obs_steps: int: Observation window length
+        :param capacity: int: Max transitions kept
+        :param n_actions: int: Action vector length, defaults to n_pairs + 1
+        :param alpha: float: Priority exponent, 0 for uniform sampling
+        :param beta: float: Importance sampling exponent
+        :param path: str: Directory to memory map the buffers into
+        :param seed: int: Sampling seed
+        :param mode: str: 'w+' to create the mapped buffers, 'r+' to open existing ones
+        """
+        self.prices = prices
+        self.obs_steps = obs_steps
+        self.capacity = capacity
+        self.n_symbols = prices.shape[1] + 1
+        self.n_actions = n_actions or self.n_symbols
+        self.alpha = alpha
+        self.beta = beta
+        self.path = path
+        self.offsets = np.arange(-obs_steps + 1, 1)
+        self.np_random, _ = np_random(seed)
+
+        self.env = None
+        self.count = 0
+        self.episode_first = 0
+        self.max_priority = 1.
+        self.window_length = 1
+        self.tree = SumTree(capacity) if alpha > 0 else None
+
+        self.buffers = self.allocate(path, mode)
+
+    @classmethod
+    def from_env(cls, env, capacity, **kwargs):
+        """
+        Store over a backtest env data. Appends without index read it from the env
+        :param env: BacktestEnvironment
+        :param capacity: int: Max transitions kept
+        """
+        if not env.initialized:
+            env.setup()
+        if getattr(env, 'vec', None) is not None:
+            prices = env.vec.prices
+        else:
+            prices = price_tensor(env.tapi, env.pairs)
+        store = cls(prices, env.obs_steps, capacity, **kwargs)
+        store.env = env
+        return store
+
+    def allocate(self, path, mode):
+        shapes = {'step': ((self.capacity,), np.int64),
+                  'first': ((self.capacity,), np.int64),
+                  'index': ((self.capacity,), np.int32),
+                  'amounts': ((self.capacity, self.n_symbols), np.float32),
+                  'action': ((self.capacity, self.n_actions), np.float32),
+                  'reward': ((self.capacity,), np.float32),
+                  'terminal': ((self.capacity,), np.bool_),
+                  'priority': ((self.capacity,), np.float32)}
+        buffers = {}
+        for name, (shape, dtype) in shapes.items():
+            if path is None:
+                buffers[name] = np.zeros(shape, dtype=dtype)
+            else:
+                os.makedirs(path, exist_ok=True)
+                buffers[name] = np.lib.format.open_memmap(os.path.join(path, name + '.npy'), mode=mode,
+                                                          dtype=dtype, shape=shape if mode == 'w+' else None)
+        return buffers
+
+    @property
+    def nb_entries(self):
+        return min(self.count, self.capacity)
+
+    def __len__(self):
+        return self.nb_entries
+
+    # Storage
+    def add(self, index, amounts, action, reward, terminal):
+        """
+        Store one transition
+        :param index: int: Bar index of the observation the action was taken on
+        :param amounts: array like: Amounts held on that bar before acting, fiat last
+        :param action: array like: Action taken
+        :param reward: float: Reward received
+        :param terminal: bool: Episode ended on this transition
+        """
+        slot = self.count % self.capacity
+        b = self.buffers
+        b['step'][slot] = self.count
+        b['first'][slot] = self.episode_first
+        b['index'][slot] = index
+        b['amounts'][slot] = amounts
+        b['action'][slot] = action
+        b['reward'][slot] = reward
+        b['terminal'][slot] = terminal
+        b['priority'][slot] = self.max_priority
+        if self.tree is not None:
+            self.tree.update([slot], [self.max_priority ** self.alpha])
+
+        self.count += 1
+        if terminal:
+            self.episode_first = self.count
+
+    def append(self, observation, action, reward, terminal, training=True, index=None):
+        """
+        Store a transition from an observation in the get_observation(True) layout
+        :param observation: numpy array: Observation the action was taken on
+        :param index: int: Its bar index. Defaults to the bar before the bound env one, as the env has stepped since
+        """
+        if not training:
+            return
+        if index is None:
+            index = self.env.index - 1
+        observation = np.asarray(observation).reshape(-1, observation.shape[-1])
+        n_pairs = self.n_symbols - 1
+        amounts = np.append(observation[-1, 5:n_pairs * 6:6], observation[-1, -1])
+        self.add(index, amounts, action, reward, terminal)
+
+    def get_recent_state(self, current_observation):
+        return [current_observation]
+
+    # Sampling
+    def observe(self, steps):
+        """
+        Rebuild observations of stored transitions
+        :param steps: numpy array: Global step ids of the transitions
+        :return: numpy array: shape (B, obs_steps, columns)
+        """
+        b = self.buffers
+        slots = steps % self.capacity
+        windows = self.prices[b['index'][slots][:, None] + self.offsets]
+
+        # Window bar d steps back shows the amounts held after the trade d - 1 steps back
+        back = np.maximum(self.obs_steps - 1 - np.arange(self.obs_steps) - 1, 0)
+        oldest = max(self.count - self.capacity, 0)
+        floor = np.maximum(b['first'][slots], oldest)
+        sources = np.maximum(steps[:, None] - back, floor[:, None])
+        return window_columns(windows, b['amounts'][sources % self.capacity])
+
+    def sample_steps(self, batch_size):
+        oldest = max(self.count - self.capacity, 0)
+        if self.count - oldest < 2:
+            raise ValueError("Not enough transitions to sample.")
+
+        if self.tree is None:
+            return self.np_random.randint(oldest, self.count - 1, size=batch_size), None
+
+        # Newest transition has no next state yet
+        newest = (self.count - 1) % self.capacity
+        self.tree.update([newest], [0.])
+        values = (self.np_random.random_sample(batch_size) + np.arange(batch_size)) * self.tree.total / batch_size
+        slots = np.minimum(self.tree.find(values), self.nb_entries - 1)
+        probs = self.tree.tree[slots + self.tree.size] / self.tree.total
+        self.tree.update([newest], [self.buffers['priority'][newest] ** self.alpha])
+
+        weights = (self.nb_entries * probs) ** -self.beta
+        steps = self.buffers['step'][slots]
+        return steps, (weights / weights.max()).astype(np.float32)
+
+    def sample_batch(self, batch_size):
+        """
+        Random minibatch as arrays
+        :param batch_size: int
+        :return: dict: state0, action, reward, state1, terminal1, steps and importance weights
+        """
+        steps, weights = self.sample_steps(batch_size)
+        slots = steps % self.capacity
+        b = self.buffers
+        return {'state0': self.observe(steps),
+                'action': b['action'][slots],
+                'reward': b['reward'][slots],
+                'state1': self.observe(steps + 1),
+                'terminal1': b['terminal'][slots],
+                'steps': steps,
+                'weights': weights}
+
+    def sample(self, batch_size, batch_idxs=None):
+        """
+        Random minibatch as a list of experiences, window length one
+        """
+        batch = self.sample_batch(batch_size)
+        return [Experience(state0=[batch['state0'][i]], action=batch['action'][i], reward=batch['reward'][i],
+                           state1=[batch['state1'][i]], terminal1=batch['terminal1'][i])
+                for i in range(batch_size)]
+
+    def update_priorities(self, steps, errors, eps=1e-6):
+        """
+        Set sampled transitions priorities from their errors
+        :param steps: numpy array: Global step ids, as returned by sample_batch
+        :param errors: numpy array: Absolute td errors
+        """
+        if self.tree is None:
+            return
+        priorities = np.abs(errors) + eps
+        slots = steps % self.capacity
+        self.buffers['priority'][slots] = priorities
+        self.tree.update(slots, priorities ** self.alpha)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+    # Persistence
+    def state(self):
+        return {'count': self.count, 'episode_first': self.episode_first, 'max_priority': self.max_priority,
+                'capacity': self.capacity, 'obs_steps': self.obs_steps, 'n_actions': self.n_actions,
+                'alpha': self.alpha, 'beta': self.beta}
+
+    def save(self, path=None):
+        """
+        Write buffers to a directory. Memory mapped stores only flush
+        :param path: str: Directory, defaults to the mapped one
+        """
+        path = path or self.path
+        if path is None:
+            raise ValueError("No path to save replay store.")
+
+        if path == self.path:
+            for buffer in self.buffers.values():
+                buffer.flush()
+        else:
+            os.makedirs(path, exist_ok=True)
+            for name, buffer in self.buffers.items():
+                np.save(os.path.join(path, name + '.npy'), buffer)
+
+        prices_file = os.path.join(path, 'prices.npy')
+        if not os.path.exists(prices_file):
+            np.save(prices_file, self.prices)
+
+        with open(os.path.join(path, 'state.json'), 'w') as file:
+            json.dump(self.state(), file)
+
+    @classmethod
+    def load(cls, path, prices=None, seed=None):
+        """
+        Map a saved store back
+        :param path: str: Directory written by save
+        :param prices: numpy array: Price tensor, read from path if None
+        :return: ReplayStore
+        """
+        with open(os.path.join(path, 'state.json')) as file:
+            state = json.load(file)
+        if prices is None:
+            prices = np.load(os.path.join(path, 'prices.npy'), mmap_mode='r')
+
+        store = cls(prices, state['obs_steps'], state['capacity'], state['n_actions'], state['alpha'], state['beta'],
+                    path=path, seed=seed, mode='r+')
+        store.count = state['count']
+        store.episode_first = state['episode_first']
+        store.max_priority = state['max_priority']
+
+        if store.tree is not None:
+            n = store.nb_entries
+            store.tree.update(np.arange(n), store.buffers['priority'][:n] ** store.alpha)
+        return store
@@ -0,0 +1,3 @@
+"""
+Apriori strategy modules, load them through cryptotrader.agents.apriori.get
+"""
@@ -0,0 +1,419 @@
+"""
+Apriori agent base class and agent composition
+"""
+import random
+from functools import wraps
+from importlib import import_module
+from inspect import signature
+from threading import Lock
+from time import time
+
+from ...core import Agent
+from ...seeding import ThreadRandom, child_seed
+from ...utils import *
+from ..cache import fingerprint
+
+import pandas as pd
+
+# Solver and indicator backends load on first use
+ot = lazy_import('optunity')
+
+# optunity solvers draw from the random module, seeded sweeps give them a stream of their own
+OPTUNITY_RANDOM = ('ParticleSwarm', 'TPE', 'Sobol', 'RandomSearch', 'util')
+search_random = ThreadRandom()
+patch_lock = Lock()
+
+
+def patch_optunity():
+    """
+    Point optunity solvers at search_random and serialize the Sobol generator,
+    which keeps its state in module globals
+    """
+    with patch_lock:
+        for name in OPTUNITY_RANDOM:
+            import_module('optunity.solvers.' + name).random = search_random
+
+        sobol = import_module('optunity.solvers.Sobol').Sobol
+        i4_sobol = sobol.i4_sobol
+        if not hasattr(i4_sobol, 'lock'):
+            lock = Lock()
+
+            @wraps(i4_sobol)
+            def locked_sobol(dim_num, seed):
+                with lock:
+                    return i4_sobol(dim_num, seed)
+
+            locked_sobol.lock = lock
+            sobol.i4_sobol = staticmethod(locked_sobol)
+
+
+def use_search_random(rng):
+    """
+    Make optunity searches of the calling thread draw from rng
+    :param rng: random.Random: Thread stream, None for the random module
+    :return: random.Random: Previous thread stream
+    """
+    patch_optunity()
+    return search_random.use(rng)
+
+
+class APrioriAgent(Agent):
+    """
+    Apriori abstract trading agent.
+    Use this class to create trading strategies and deploy to Trading environment
+    to train and deploy models directly into the market
+    """
+    def __new__(cls, *args, **kwargs):
+        agent = super().__new__(cls)
+        # Constructor arguments, the agent configuration for evaluation caches
+        arguments = signature(cls.__init__).bind_partial(None, *args, **kwargs)
+        arguments.apply_defaults()
+        agent.init_args = dict(list(arguments.arguments.items())[1:])
+        return agent
+
+    def __init__(self, fiat, name=""):
+        """
+
+        :param fiat: str: symbol to use as quote
+        :param name: str: agent name
+        """
+        super().__init__(name=name)
+        self.epsilon = 1e-16
+        self.fiat = fiat
+        self.step = 0
+        self.name = name
+        self.log = {}
+        self.n_portfolios = 1
+        self.batch_params = {}
+        self.b_batch = None
+
+    # Model methods
+    def predict(self, obs):
+        """
+        Select action on actual observation
+        :param obs:
+        :return:
+        """
+        raise NotImplementedError()
+
+    def rebalance(self, obs):
+        return NotImplementedError()
+
+    # Portfolio batch methods
+    # Parameters that may differ between the portfolios of a batch
+    batch_keys = ()
+
+    def batch_group(self):
+        """
+        Agents of the same class and group can run as one batch
+        :return: hashable: Settings every portfolio of a batch must share
+        """
+        return None
+
+    def set_batch(self, n_portfolios, **kwargs):
+        """
+        Run n_portfolios copies of the strategy side by side on one shared observation
+        :param n_portfolios: int: Number of portfolios
+        :param kwargs: Per portfolio parameters, scalars or sequences of length n_portfolios.
+                       Parameters not given take the agent values
+        """
+        self.n_portfolios = n_portfolios
+        self.batch_params = {key: np.broadcast_to(np.asarray(value), (n_portfolios,)).copy()
+                             for key, value in kwargs.items()}
+        self.b_batch = None
+
+    def batch_param(self, key):
+        """
+        Per portfolio parameter values
+        :return: numpy array: shape (n_portfolios,)
+        """
+        if key in self.batch_params:
+            return self.batch_params[key]
+        return np.broadcast_to(np.asarray(getattr(self, key)), (self.n_portfolios,))
+
+    def init_batch(self, n_pairs):
+        """
+        Start batch state before the first rebalance
+        :param n_pairs: int: Portfolio vector length
+        """
+        pass
+
+    def price_features(self, obs):
+        """
+        Observation features shared by agents reading the same step
+        :param obs: pandas DataFrame: Environment observation
+        :return: dict: 'prices', open prices array, and 'relative', last open price relative with fiat
+        """
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64).values
+        return {'prices': prices, 'relative': np.append(safe_div(prices[-1], prices[-2]), [1.0])}
+
+    def update_batch(self, b, obs, features=None):
+        """
+        Update every portfolio
+        :param b: numpy array: shape (n_portfolios, n_pairs), last portfolio vectors
+        :param obs: pandas DataFrame: Environment observation
+        :param features: dict: Precomputed price_features of obs, optional
+        :return: numpy array: shape (n_portfolios, n_pairs), new portfolio vectors
+        """
+        raise NotImplementedError("%s has no portfolio batch mode." % self.__class__.__name__)
+
+    def rebalance_batch(self, obs, b=None, features=None):
+        """
+        Performs the rebalance of every portfolio within environment
+        :param obs: pandas DataFrame: Environment observation, shared by all portfolios
+        :param b: numpy array: shape (n_portfolios, n_pairs), portfolio vectors held.
+                  Defaults to the last returned ones. Ignored on the first call
+        :param features: dict: Precomputed price_features of obs, optional
+        :return: numpy array: shape (n_portfolios, n_pairs), portfolio vectors
+        """
+        if self.b_batch is None:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.init_batch(n_pairs)
+            self.b_batch = np.tile(array_normalize(action), (self.n_portfolios, 1))
+        else:
+            b = self.b_batch if b is None else b
+            self.b_batch = self.update_batch(np.array(b, dtype=np.float64), obs, features)
+
+        return self.b_batch.copy()
+
+    # Train methods
+    def set_params(self, **kwargs):
+        raise NotImplementedError("You must overwrite this class in your implementation.")
+
+    def normalize_params(self, **kwargs):
+        """
+        Set parameters and return them as the strategy uses them,
+        so proposals rounding to the same configuration compare equal
+        :return: dict: Parameters
+        """
+        self.set_params(**kwargs)
+        return {key: getattr(self, key, value) for key, value in kwargs.items()}
+
+    def fit(self, env, nb_steps, batch_size, search_space, constraints=None, action_repetition=1, callbacks=None, verbose=1,
+            visualize=False, nb_max_start_steps=0, start_step_policy=None, log_interval=10000, start_step=0,
+            nb_max_episode_steps=None, noise_abs=0.0, scheduler=None, cache=None, episode_seed=None):
+        """
+        Fit the model on parameters on the environment
+        :param env: BacktestEnvironment instance
+        :param nb_steps: Number of optimization evals
+        :param batch_size: Size of the batch for each optimization pass
+        :param search_space: Parameter search space
+        :param constrains: Function returning False when constrains are violated
+        :param action_repetition:
+        :param callbacks:
+        :param verbose:
+        :param visualize:
+        :param nb_max_start_steps:
+        :param start_step_policy:
+        :param log_interval:
+        :param nb_max_episode_steps: Number of steps for one episode
+        :param noise_abs: Noise radius to use on sample runs
+        :param scheduler: SuccessiveHalving or Hyperband instance: Score candidates on episode prefixes and
+                          stop the bad ones early. None runs every optimization eval on full episodes
+        :param cache: EvaluationCache instance: Reuse evaluations of the same configuration. Requires episode_seed
+        :param episode_seed: int: Seeds the optunity search on a stream private to the calling thread, every eval
+                             runs the same episode schedule and noise. The env stream and schedule are restored
+                             afterwards
+        :return: tuple: Optimal parameters, information about the optimization process
+        """
+        if cache is not None and episode_seed is None:
+            raise ValueError("Cached evaluations need an episode_seed to be reproducible.")
+
+        # Seeded sweeps leave the caller streams as they found them
+        if episode_seed is not None:
+            search_state = use_search_random(random.Random(child_seed(episode_seed, 'search')))
+            env_state = env.random_state()
+
+        try:
+            # Initialize train
+            env.training = True
+            i = 0
+            t0 = time()
+
+            if verbose:
+                print("Optimizing model for %d steps with batch size %d..." % (nb_steps, batch_size))
+
+            ### First, optimize benchmark
+            env.optimize_benchmark(nb_steps * 100, verbose=True)
+
+            ## Early stopping search
+            if scheduler is not None:
+                opt_params, info = scheduler.search(self, env, nb_steps, batch_size, search_space, constraints,
+                                                    nb_max_episode_steps, start_step, verbose)
+                self.set_params(**opt_params)
+                env.training = False
+                return opt_params, info
+
+            ## Now optimize model w.r.t benchmark
+            # First define optimization constrains
+            # Ex constrain:
+            # @ot.constraints.constrained([lambda mean_type,
+            #         ma1,
+            #         ma2,
+            #         std_span,
+            #         alpha_up,
+            #         alpha_down: ma1 < ma2])
+
+            if not constraints:
+                constraints = [lambda *args, **kwargs: True]
+
+            # Initialize buffer
+            optimization_rewards = []
+
+            # Same episodes and noise for every candidate
+            if episode_seed is not None:
+                schedule = env.episode_schedule(batch_size, seed=child_seed(episode_seed, 'episodes'))
+
+            # Evaluation cache key parts
+            if cache is not None:
+                env_fingerprint = fingerprint(env)
+                settings = {'batch_size': batch_size, 'nb_max_episode_steps': nb_max_episode_steps,
+                            'start_step': start_step, 'nb_max_start_steps': nb_max_start_steps,
+                            'action_repetition': action_repetition, 'noise_abs': noise_abs, 'seed': episode_seed}
+
+            # Then, define optimization routine
+            @ot.constraints.constrained(constraints)
+            @ot.constraints.violations_defaulted(-100)
+            def find_hp(**kwargs):
+                try:
+                    # Init variables
+                    nonlocal i, nb_steps, t0, env, nb_max_episode_steps, optimization_rewards
+
+                    # Sample params
+                    if cache is not None:
+                        key, params = cache.key(self, self.normalize_params(**kwargs), env_fingerprint, settings)
+                        cached = cache.get(key)
+                    else:
+                        self.set_params(**kwargs)
+                        cached = None
+
+                    if cached is not None:
+                        r, rstd = cached
+                    else:
+                        if episode_seed is not None:
+                            env.seed(child_seed(episode_seed, 'noise'))
+                            env.set_schedule(schedule)
+
+                        # Try model for a batch
+                        # sample environment
+                        r, rstd = self.test(env,
+                                        nb_episodes=batch_size,
+                                        action_repetition=action_repetition,
+                                        callbacks=callbacks,
+                                        visualize=visualize,
+                                        nb_max_episode_steps=nb_max_episode_steps,
+                                        nb_max_start_steps=nb_max_start_steps,
+                                        start_step_policy=start_step_policy,
+                                        start_step=start_step,
+                                        noise_abs=noise_abs,
+                                        verbose=False)
+
+                        if cache is not None:
+                            cache.put(key, params, r, rstd)
+
+                    # Log batch reward
+                    optimization_rewards.append(r)
+
+                    # Increment step counter
+                    i += 1
+
+                    # Update progress
+                    if verbose:
+                        print("Optimization step {0}/{1}, r: {2:.8f}, r std: {3:.8f}, mean r: {4:.8f} ETC: {5}                     ".format(i,
+                                                                            nb_steps,
+                                                                            r,
+                                                                            rstd,
+                                                                            np.mean(optimization_rewards),
+                                                                            str(pd.to_timedelta((time() - t0) * (nb_steps - i), unit='s'))),
+                              end="\r")
+                        t0 = time()
+
+                    # Average rewards and return
+                    return r
+
+                except KeyboardInterrupt:
+                    raise ot.api.fun.MaximumEvaluationsException(0)
+
+            # Define params search space
+            # Ex search space:
+            #
+            # hp = {
+            #     'ma1': [2, env.obs_steps],
+            #     'ma2': [2, env.obs_steps],
+            #     'std_span': [2, env.obs_steps],
+            #     'alpha_up': [1e-8, 1],
+            #     'alpha_down': [1e-8, 1]
+            #     }
+            #
+            # search_space = {'mean_type':{'simple': hp,
+            #                              'exp': hp,
+            #                              'kama': hp
+            #                              }
+            #                 }
+
+            print("\nOptimizing model...")
+
+            # Call optimizer
+            opt_params, info, _ = ot.maximize_structured(find_hp,
+                                              num_evals=nb_steps,
+                                              search_space=search_space
+                                              )
+
+            # Update model params with optimal
+            self.set_params(**opt_params)
+
+            # Set flag off
+            env.training = False
+
+            if cache is not None and verbose:
+                print("\nEvaluation cache hit rate: {0:.2f} %, {1} hits, {2} misses".format(100 * cache.hit_rate,
+                                                                                          cache.hits, cache.misses))
+
+            # Return optimal params and information
+            return opt_params, info
+
+        except KeyboardInterrupt:
+
+            # If interrupted, clean after yourself
+            env.training = False
+            print("\nOptimization interrupted by user.")
+            return opt_params, info
+
+        finally:
+            if episode_seed is not None:
+                use_search_random(search_state)
+                env.set_random_state(env_state)
+
+
+## Agent Pipeline
+class Pipeline(APrioriAgent):
+    def __repr__(self):
+        return "Pipeline"
+
+    def __init__(self, factor, risk, fiat="BTC", name='Pipeline'):
+        super().__init__(fiat=fiat, name=name)
+        self.factor = factor
+        self.risk = risk
+
+    def rebalance(self, obs):
+        """
+         Performs portfolio rebalance within environment
+         :param obs: pandas DataFrame: Environment observation
+         :return: numpy array: Portfolio vector
+         """
+        if not self.step:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = self.b = array_normalize(action)
+            return self.crp
+
+        self.factor.b = self.b
+        self.risk.b = self.factor.rebalance(obs)
+        self.b = self.risk.rebalance(obs)
+
+        self.factor.step = self.risk.step = self.step
+
+        return self.b
@@ -0,0 +1,234 @@
+"""
+Test and benchmark strategies
+"""
+from time import time
+
+from ...utils import *
+
+import pandas as pd
+from decimal import Decimal
+
+from ...random_process import BlockNoise
+from .base import APrioriAgent
+
+
+class TestAgent(APrioriAgent):
+    """
+    Test agent for debugging
+    """
+    def __repr__(self):
+        return "Test"
+
+    def __init__(self, obs_shape, fiat="BTC"):
+        super().__init__(fiat)
+        self.obs_shape = obs_shape
+
+    def predict(self, obs):
+        # Assert obs is valid
+        assert obs.shape == self.obs_shape, "Wrong obs shape."
+
+        for val in obs.applymap(lambda x: isinstance(x, Decimal) and Decimal.is_finite(x)).all():
+            assert val, ("Non decimal value found in obs.", obs.applymap(lambda x: isinstance(x, Decimal) and Decimal.is_finite(x)).all())
+
+        if self.step == 0:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            return array_normalize(action)
+        else:
+            return self.get_portfolio_vector(obs)
+
+    def rebalance(self, obs):
+        return self.predict(obs.apply(convert_to.decimal, raw=True))
+
+    def test(self, env, nb_episodes=1, action_repetition=1, callbacks=None, visualize=False,
+             nb_max_episode_steps=None, nb_max_start_steps=0, start_step_policy=None, verbose=False):
+        """
+        Test agent on environment
+        """
+        try:
+            # Get env params
+            self.fiat = env._fiat
+
+            # Reset observations
+            env.reset_status()
+            env.reset()
+
+            # Get max episode length
+            if nb_max_episode_steps is None:
+                nb_max_episode_steps = env.data_length
+
+            #Reset counters
+            t0 = time()
+            self.step = 0
+            episode_reward = 1
+
+            while True:
+                try:
+                    action = self.rebalance(env.get_observation(True))
+                    obs, reward, _, status = env.step(action)
+                    episode_reward *= np.float64(reward)
+
+                    self.step += 1
+
+                    if visualize:
+                        env.render()
+
+                    if verbose:
+                        print(">> step {0}/{1}, {2} % done, Cumulative Reward: {3}, ETC: {4}, Samples/s: {5:.04f}                   ".format(
+                            self.step,
+                            nb_max_episode_steps - env.obs_steps - 2,
+                            int(100 * self.step / (nb_max_episode_steps - env.obs_steps - 2)),
+                            episode_reward,
+                            str(pd.to_timedelta((time() - t0) * ((nb_max_episode_steps - env.obs_steps - 2)
+                                                                 - self.step), unit='s')),
+                            1 / (time() - t0)
+                        ), end="\r", flush=True)
+                        t0 = time()
+
+                    if status['OOD'] or self.step == nb_max_episode_steps:
+                        return episode_reward
+
+                    if status['Error']:
+                        # e = status['Error']
+                        # print("Env error:",
+                        #       type(e).__name__ + ' in line ' + str(e.__traceback__.tb_lineno) + ': ' + str(e))
+                        break
+
+                except Exception as e:
+                    print("Model Error:",
+                          type(e).__name__ + ' in line ' + str(e.__traceback__.tb_lineno) + ': ' + str(e))
+                    raise e
+
+        except KeyboardInterrupt:
+            print("\nKeyboard Interrupt: Stoping backtest\nElapsed steps: {0}/{1}, {2} % done.".format(self.step,
+                                                                             nb_max_episode_steps,
+                                                                             int(100 * self.step / nb_max_episode_steps)))
+
+
+class TestLookAhead(APrioriAgent):
+    """
+    Test for look ahead bias
+    """
+    def __repr__(self):
+        return "TestLookAhead"
+
+    def __init__(self, mr=False, fiat="BTC"):
+        super().__init__(fiat=fiat)
+        self.mr = mr
+
+    def predict(self, obs):
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64)
+        if self.mr:
+            price_relative = np.append(prices.apply(lambda x: safe_div(x[-2], x[-1])).values, [1.0])
+        else:
+            price_relative = np.append(prices.apply(lambda x: safe_div(x[-1], x[-2])).values, [1.0])
+
+        return price_relative
+
+    def rebalance(self, obs):
+        factor = self.predict(obs)
+        position = np.zeros_like(factor)
+        position[np.argmax(factor)] = 1
+        return position
+
+
+class RandomWalk(APrioriAgent):
+    """
+    Dummytrader that sample actions from a random process
+    """
+    def __repr__(self):
+        return "RandomWalk"
+
+    def __init__(self, random_process=None, activation='softmax', block_size=256, fiat="BTC"):
+        """
+        Initialization method
+        :param env: Apocalipse driver instance
+        :param random_process: Random process used to sample actions from
+        :param activation: Portifolio activation function
+        :param block_size: int: Process steps drawn at once
+        """
+        super().__init__(fiat)
+
+        if random_process is not None and block_size > 1:
+            random_process = BlockNoise(random_process, block_size)
+        self.random_process = random_process
+        self.activation = activation
+
+    def predict(self, obs):
+        """
+        Performs a single step on the environment
+        """
+        if self.random_process:
+            if self.activation == 'softmax':
+                return array_normalize(self.random_process.sample())
+            elif self.activation == 'simplex':
+                return self.simplex_proj(self.random_process.sample())
+            else:
+                return np.array(self.random_process.sample())
+        else:
+            if self.activation == 'softmax':
+                return array_normalize(np.random.random(obs.columns.levels[0].shape[0]))
+            elif self.activation == 'simplex':
+                return self.simplex_proj(np.random.random(obs.columns.levels[0].shape[0]))
+            else:
+                return np.random.random(obs.columns.levels[0].shape[0])
+
+    def rebalance(self, obs):
+        return self.predict(obs)
+
+
+class BuyAndHold(APrioriAgent):
+    """
+    Equally distribute cash at the first step and hold
+    """
+    def __repr__(self):
+        return "BuyAndHold"
+
+    def __init__(self, fiat="BTC"):
+        super().__init__(fiat)
+
+    def predict(self, obs):
+        if self.step == 0:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs - 1)
+            return array_normalize(action)
+        else:
+            return self.get_portfolio_vector(obs)[:-1]
+
+    def rebalance(self, obs):
+        position = self.predict(obs)
+        position.resize(obs.columns.levels[0].shape[0])
+        position[-1] = self.get_portfolio_vector(obs)[-1]
+        return position
+
+
+class ConstantRebalance(APrioriAgent):
+    """
+    Equally distribute portfolio every step
+    """
+    def __repr__(self):
+        return "ContantRebalance"
+
+    def __init__(self, position=None, fiat="BTC"):
+        super().__init__(fiat)
+        if position:
+            self.position = array_normalize(position)
+        else:
+            self.position = False
+
+    def predict(self, obs):
+        if not isinstance(self.position, np.ndarray):
+            n_symbols = obs.columns.levels[0].shape[0]
+            self.position = array_normalize(np.ones(n_symbols - 1))
+            self.position = np.append(self.position, [0.0])
+
+        return self.position
+
+    def rebalance(self, obs):
+        factor = self.predict(obs)
+        return factor
+
+    def set_params(self, **kwargs):
+        self.position = np.append(array_normalize(np.array([kwargs[key]
+                                            for key in kwargs]))[:-1], [0.0])
@@ -0,0 +1,166 @@
+"""
+Expert ensemble strategies
+"""
+from time import time
+
+from ...utils import *
+
+from cryptotrader.optimizers import gt
+from .base import APrioriAgent
+
+
+class MixtureOfExperts(APrioriAgent):
+    """
+    Hosts heterogeneous apriori experts and trades their weighted portfolio.
+    Price features are computed once per step and shared by the experts supporting batch mode, which
+    update from their own last portfolios and run together as one portfolio batch per class.
+    Expert weights follow exponential weights on their log losses, with a fixed learning rate or the
+    AdaHedge adaptive one.
+    Reference:
+        S. de Rooij, T. van Erven, P. D. Grunwald, W. M. Koolen.
+        Follow the Leader If You Can, Hedge If You Must, 2014.
+        https://arxiv.org/pdf/1301.0534.pdf
+    """
+    def __repr__(self):
+        return "MixtureOfExperts"
+
+    def __init__(self, experts, combiner='adahedge', lr=1., batch=True, fiat="BTC", name="MixtureOfExperts"):
+        """
+        :param experts: list: APrioriAgent instances
+        :param combiner: str: 'adahedge' or 'exp'
+        :param lr: float: Exponential weights learning rate, AdaHedge tunes its own
+        :param batch: bool: Run experts of batched strategies together, else as batches of one
+        """
+        super().__init__(fiat=fiat, name=name)
+        if combiner not in ('adahedge', 'exp'):
+            raise TypeError("Bad combiner param.")
+
+        self.experts = list(experts)
+        self.combiner = combiner
+        self.lr = lr
+        self.batch = batch
+        self.labels = ["%s_%d" % (repr(expert), i) for i, expert in enumerate(self.experts)]
+        self.groups = self.make_groups()
+        self.features = None
+        self.opt = gt.ExponentialWeights(lr)
+        self.timing = {label: 0. for label in self.labels}
+        self.reset_weights()
+
+    def make_groups(self):
+        """
+        Split experts in batch groups and single experts
+        :return: list: (host agent or None, expert indexes) tuples
+        """
+        groups = {}
+        singles = []
+        for i, expert in enumerate(self.experts):
+            if self.batch and self.batched(expert):
+                groups.setdefault((type(expert), expert.batch_group()), []).append(i)
+            else:
+                singles.append((None, [i]))
+
+        batches = []
+        for (cls, _), index in groups.items():
+            if len(index) == 1:
+                singles.append((None, index))
+                continue
+            host = self.experts[index[0]]
+            host.set_batch(len(index), **{key: [getattr(self.experts[i], key) for i in index]
+                                          for key in cls.batch_keys})
+            batches.append((host, index))
+
+        return batches + singles
+
+    @staticmethod
+    def batched(expert):
+        """
+        Whether the expert supports batch mode
+        :param expert: APrioriAgent: Hosted expert
+        :return: bool
+        """
+        return type(expert).update_batch is not APrioriAgent.update_batch
+
+    def reset_weights(self):
+        n = len(self.experts)
+        self.w = np.ones(n) / n
+        self.cum_loss = np.zeros(n)
+        self.delta = 0.
+        self.portfolios = None
+
+    def predict(self, obs):
+        """
+        Every expert portfolio
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: shape (n_experts, n_pairs)
+        """
+        n_pairs = obs.columns.levels[0].shape[0]
+        portfolios = np.empty((len(self.experts), n_pairs))
+
+        for host, index in self.groups:
+            t0 = time()
+            expert = host if host is not None else self.experts[index[0]]
+            expert.step = self.step
+            if self.batched(expert):
+                # Experts update from their own last portfolios, not the mixture one
+                if not self.step:
+                    expert.b_batch = None
+                b = self.portfolios[index] if self.portfolios is not None else None
+                portfolios[index] = expert.rebalance_batch(obs, b, self.features)
+            else:
+                portfolios[index[0]] = expert.rebalance(obs)
+
+            elapsed = (time() - t0) / len(index)
+            for i in index:
+                self.timing[self.labels[i]] += elapsed
+
+        return portfolios
+
+    def update(self, losses):
+        """
+        Update expert weights
+        :param losses: numpy array: Last step loss of each expert
+        """
+        self.cum_loss += losses
+
+        if self.combiner == 'adahedge':
+            # Mixability gap drives the learning rate
+            h = np.dot(self.w, losses)
+            if np.isinf(self.opt.lr):
+                m = np.min(losses[self.w > 0])
+            else:
+                m = -np.log(np.dot(self.w, np.exp(-self.opt.lr * (losses - losses.min())))) / self.opt.lr + \
+                    losses.min()
+            self.delta += max(h - m, 0.)
+            self.opt.lr = safe_div(np.log(len(self.experts)), self.delta) if self.delta > 0 else np.inf
+
+        if np.isinf(self.opt.lr):
+            # Follow the leader
+            w = (self.cum_loss == self.cum_loss.min()).astype(np.float64)
+        else:
+            w = self.opt.update(self.opt.compute_grad(self.cum_loss - self.cum_loss.min(), self.w), 1.)
+        self.w = w / w.sum()
+
+        self.log['lr'] = "%.4f" % self.opt.lr
+        self.log['leader'] = self.labels[int(np.argmax(self.w))]
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        self.features = self.price_features(obs)
+        if not self.step:
+            self.reset_weights()
+            self.opt.lr = np.inf if self.combiner == 'adahedge' else self.lr
+        else:
+            # Log loss of each expert on the last step
+            self.update(-np.log(np.maximum(self.portfolios.dot(self.features['relative']), 1e-16)))
+
+        self.portfolios = self.predict(obs)
+        self.b = self.w.dot(self.portfolios)
+        return self.b
+
+    def set_params(self, **kwargs):
+        if 'lr' in kwargs:
+            self.lr = kwargs['lr']
@@ -0,0 +1,603 @@
+"""
+Mean reversion strategies
+"""
+from ...utils import *
+from .base import APrioriAgent
+
+# Solver and indicator backends load on first use
+ta = tl = lazy_import('talib')
+optimize = lazy_import('scipy.optimize')
+stats = lazy_import('scipy.stats')
+
+
+class PAMR(APrioriAgent):
+    """
+    Passive aggressive mean reversion strategy for portfolio selection.
+
+    Reference:
+        B. Li, P. Zhao, S. C.H. Hoi, and V. Gopalkrishnan.
+        Pamr: Passive aggressive mean reversion strategy for portfolio selection, 2012.
+        https://link.springer.com/content/pdf/10.1007%2Fs10994-012-5281-z.pdf
+    """
+    batch_keys = ('eps', 'C', 'variant')
+
+    def __repr__(self):
+        return "PAMR"
+
+    def __init__(self, eps=0.03, C=2444, variant="PAMR1", fiat="BTC", name="PAMR"):
+        """
+        :param sensitivity: float: Sensitivity parameter. Lower is more sensitive.
+        :param C: float: Aggressiveness parameter. For PAMR1 and PAMR2 variants.
+        :param variant: str: The variant of the proposed algorithm. It can be PAMR, PAMR1, PAMR2.
+        :
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.eps = eps
+        self.C = C
+        self.variant = variant
+
+    def predict(self, obs, features=None):
+        """
+        Performs prediction given environment observation
+        :param features: dict: Precomputed price_features of obs, optional
+        """
+        if features is not None:
+            prices = features['prices'][-2:]
+            return np.append(safe_div(prices[-2], prices[-1]), [1.0])
+
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64)
+        price_relative = np.append(prices.apply(lambda x: safe_div(x[-2], x[-1])).values, [1.0])
+
+        return price_relative
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=-2)
+            price_relative = self.predict(obs)
+            return self.update(prev_posit, price_relative)
+        else:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            return array_normalize(action)
+
+    def update(self, b, x):
+        """
+        Update portfolio weights to satisfy constraint b * x <= eps
+        and minimize distance to previous portfolio.
+        :param b: numpy array: Last portfolio vector
+        :param x: numpy array: Price movement prediction
+        """
+        # x_mean = np.mean(x)
+        # if np.dot(b, x) >= 1:
+        #     le = max(0., np.dot(b, x) - (1 + self.sensitivity))
+        # else:
+        #     le = max(0, (1 - self.sensitivity) - np.dot(b, x))
+
+        x_mean = np.mean(x)
+
+        le = max(0., np.dot(b, x) - self.eps)
+
+        if self.variant == 'PAMR0':
+            lam = safe_div(le, np.linalg.norm(x - x_mean) ** 2)
+        elif self.variant == 'PAMR1':
+            lam = min(self.C, safe_div(le, np.linalg.norm(x - x_mean) ** 2))
+        elif self.variant == 'PAMR2':
+            lam = safe_div(le, (np.linalg.norm(x - x_mean) ** 2 + 0.5 / self.C))
+        else:
+            raise TypeError("Bad variant param.")
+
+        # limit lambda to avoid numerical problems
+        lam = min(100000, lam)
+
+        # update portfolio
+        b += lam * (x - x_mean)
+
+        # project it onto simplex
+        return simplex_proj(b)
+
+    def update_batch(self, b, obs, features=None):
+        """
+        Update every portfolio on one price relative
+        :param b: numpy array: shape (n_portfolios, n_pairs), last portfolio vectors
+        :param obs: pandas DataFrame: Environment observation
+        :param features: dict: Precomputed price_features of obs, optional
+        """
+        x = self.predict(obs, features)
+        x_dev = x - np.mean(x)
+        norm = np.linalg.norm(x_dev) ** 2
+
+        eps = self.batch_param('eps')
+        C = self.batch_param('C').astype(np.float64)
+        variant = self.batch_param('variant')
+        if not np.isin(variant, ['PAMR0', 'PAMR1', 'PAMR2']).all():
+            raise TypeError("Bad variant param.")
+
+        le = np.maximum(0., b.dot(x) - eps)
+
+        lam = np.where(variant == 'PAMR1', np.minimum(C, safe_div(le, norm)), safe_div(le, norm))
+        lam = np.where(variant == 'PAMR2', safe_div(le, norm + 0.5 / C), lam)
+
+        # limit lambda to avoid numerical problems
+        lam = np.minimum(100000, lam)
+
+        # update portfolios
+        b += lam[:, None] * x_dev
+
+        # project them onto simplex
+        return simplex_proj_batch(b)
+
+    def set_params(self, **kwargs):
+        self.eps = kwargs['eps']
+        if 'C' in kwargs:
+            self.C = kwargs['C']
+        self.variant = kwargs['variant']
+
+
+class OLMAR(APrioriAgent):
+    """
+        On-Line Portfolio Selection with Moving Average Reversion
+
+        Reference:
+            B. Li and S. C. H. Hoi.
+            On-line portfolio selection with moving average reversion, 2012.
+            http://icml.cc/2012/papers/168.pdf
+        """
+
+    batch_keys = ('eps', 'window')
+
+    def __repr__(self):
+        return "OLMAR"
+
+    def __init__(self, window=7, eps=0.02, fiat="BTC", name="OLMAR"):
+        """
+        :param window: integer: Lookback window size.
+        :param eps: float: Threshold value for updating portfolio.
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.window = window
+        self.eps = eps
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64)
+        price_predict = np.append(safe_div(prices.iloc[-self.window:].mean().values, prices.iloc[-1].values), [1.0])
+
+        return price_predict
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=-2)
+            price_predict = self.predict(obs)
+            return self.update(prev_posit, price_predict)
+        else:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            return array_normalize(action)
+
+    def update(self, b, x):
+        """
+        Update portfolio weights to satisfy constraint b * x >= eps
+        and minimize distance to previous weights.
+        :param b: numpy array: Last portfolio vector
+        :param x: numpy array: Price movement prediction
+        """
+        xt = np.dot(b, x)
+        x_mean = np.mean(x)
+
+        lam = max(0., safe_div((xt - self.eps), np.linalg.norm(x - x_mean) ** 2))
+
+        # limit lambda to avoid numerical problems
+        lam = min(100000, lam)
+
+        # update portfolio
+        b += lam * (x - x_mean)
+
+        # project it onto simplex
+        return simplex_proj(b)
+
+    def predict_batch(self, obs, features=None):
+        """
+        Price predictions of every portfolio window
+        :param obs: pandas DataFrame: Environment observation
+        :param features: dict: Precomputed price_features of obs, optional
+        :return: numpy array: shape (n_portfolios, n_pairs)
+        """
+        if features is not None:
+            prices = features['prices']
+        else:
+            prices = obs.xs('open', level=1, axis=1).astype(np.float64).values
+        window = np.minimum(self.batch_param('window').astype(np.int64), prices.shape[0])
+
+        # Moving averages of all windows from one cumulative sum
+        sums = np.cumsum(prices[::-1], axis=0)
+        means = sums[window - 1] / window[:, None]
+
+        return np.hstack([safe_div(means, prices[-1]), np.ones((window.shape[0], 1))])
+
+    def update_batch(self, b, obs, features=None):
+        """
+        Update every portfolio on its window price prediction
+        :param b: numpy array: shape (n_portfolios, n_pairs), last portfolio vectors
+        :param obs: pandas DataFrame: Environment observation
+        :param features: dict: Precomputed price_features of obs, optional
+        """
+        x = self.predict_batch(obs, features)
+        x_dev = x - x.mean(axis=1, keepdims=True)
+
+        xt = np.sum(b * x, axis=1)
+        lam = np.maximum(0., safe_div(xt - self.batch_param('eps'), np.linalg.norm(x_dev, axis=1) ** 2))
+
+        # limit lambda to avoid numerical problems
+        lam = np.minimum(100000, lam)
+
+        # update portfolios
+        b += lam[:, None] * x_dev
+
+        # project them onto simplex
+        return simplex_proj_batch(b)
+
+    def set_params(self, **kwargs):
+        self.eps = kwargs['eps']
+        self.window = int(kwargs['window'])
+
+
+class CWMR(APrioriAgent):
+    """ Confidence weighted mean reversion.
+    Reference:
+        B. Li, S. C. H. Hoi, P.L. Zhao, and V. Gopalkrishnan.
+        Confidence weighted mean reversion strategy for online portfolio selection, 2013.
+        http://jmlr.org/proceedings/papers/v15/li11b/li11b.pdf
+    """
+    batch_keys = ('eps', 'theta')
+
+    def __repr__(self):
+        return "CWMR"
+
+    def batch_group(self):
+        return self.var, self.reb
+
+    def __init__(self, eps=-0.5, confidence=0.95, var=0, rebalance=True, fiat="BTC", name="CWMR"):
+        """
+        :param eps: Mean reversion threshold (expected return on current day must be lower
+                    than this threshold). Recommended value is -0.5.
+        :param confidence: Confidence parameter for profitable mean reversion portfolio.
+                    Recommended value is 0.95.
+        """
+        super(CWMR, self).__init__(fiat=fiat, name=name)
+
+        # input check
+        if not (0 <= confidence <= 1):
+            raise ValueError('confidence must be from interval [0,1]')
+        if rebalance:
+            self.reb = -2
+        else:
+            self.reb = -1
+        self.eps = eps
+        self.theta = stats.norm.ppf(confidence)
+        self.var = var
+
+    def predict(self, obs, features=None):
+        """
+        Performs prediction given environment observation
+        :param features: dict: Precomputed price_features of obs, optional
+        """
+        if features is not None:
+            return features['relative']
+
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64)
+        price_relative = prices.apply(lambda x: safe_div(x[-1], x[-2])).values
+        price_relative = np.append(price_relative, [1.0])
+
+        return price_relative
+
+    def update(self, b, x):
+        mu, self.sigma = self.distribution_step(np.asarray(b, dtype=np.float64)[None], self.sigma[None], x,
+                                                np.array([self.theta]), np.array([self.eps]))
+        self.sigma = self.sigma[0]
+        return mu[0]
+
+    def distribution_step(self, mu, sigma, x, theta, eps):
+        """
+        Update portfolio distributions on one price relative, O(n ** 2) per portfolio
+        :param mu: numpy array: shape (n_portfolios, n_pairs), last portfolio vectors
+        :param sigma: numpy array: shape (n_portfolios, n_pairs, n_pairs), portfolio covariances
+        :param x: numpy array: shape (n_pairs,), price relative
+        :param theta: numpy array: shape (n_portfolios,), confidence quantiles
+        :param eps: numpy array: shape (n_portfolios,), mean reversion thresholds
+        :return: tuple: new portfolio vectors and covariances
+        """
+        m = x.shape[0]
+
+        # 4. Calculate the following variables
+        M = mu.dot(x)
+        sigma_x = sigma.dot(x)
+        V = sigma_x.dot(x)
+        row_sums = sigma.sum(axis=2)
+        x_upper = np.diagonal(sigma, axis1=1, axis2=2).dot(x) / np.trace(sigma, axis1=1, axis2=2)
+
+        # 5. Update the portfolio distribution
+        lam, shift = self.calculate_change(x, x_upper, row_sums.dot(x), M, V, theta, eps)
+        mu = mu - lam[:, None] * (sigma_x - x_upper[:, None] * row_sums) / M[:, None]
+
+        # The precision matrix gets shift added to every entry, inv(inv(sigma) + shift * ones).
+        # Sherman Morrison rank one update instead of two inversions
+        sigma = sigma - (shift / (1. + shift * row_sums.sum(axis=1)))[:, None, None] * \
+            row_sums[:, :, None] * row_sums[:, None, :]
+
+        # 6. Normalize mu and sigma
+        sigma = sigma / (m ** 2 * np.trace(sigma, axis1=1, axis2=2))[:, None, None]
+
+        return simplex_proj_batch(mu), sigma
+
+    def calculate_change(self, x, x_upper, x_sums, M, V, theta, eps):
+        """
+        Lagrange multipliers and precision shifts of the distribution update
+        :return: tuple: lambda and precision shift, shaped (n_portfolios,)
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if not self.var:
+                # lambda from equation 7
+                foo = (V - x_upper * x_sums) / M ** 2 + V * theta ** 2 / 2.
+                a = foo ** 2 - V ** 2 * theta ** 4 / 4
+                b = 2 * (eps - np.log(M)) * foo
+                c = (eps - np.log(M)) ** 2 - V * theta ** 2
+            else:
+                # First variant of a CWMR outlined in original article. It is
+                # only approximation to the posted problem.
+                foo = (V - x_upper * x_sums) / M ** 2
+                a = 2 * theta * V * foo
+                b = foo + 2 * theta * V * (eps - np.log(M))
+                c = eps - np.log(M) - theta * V
+
+            root = np.sqrt(b ** 2 - 4 * a * c)
+            lam = np.fmax(np.fmax(0, (-b + root) / (2. * a)), (-b - root) / (2. * a))
+
+        # bound it due to numerical problems
+        lam = np.minimum(lam, 1E+7)
+
+        if not self.var:
+            U_sqroot = 0.5 * (-lam * theta * V + np.sqrt(lam ** 2 * theta ** 2 * V ** 2 + 4 * V))
+            shift = theta * lam / U_sqroot * x[0] ** 2
+        else:
+            shift = 2 * lam * theta * x[0] ** 2
+
+        return lam, shift
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        n_pairs = obs.columns.levels[0].shape[0]
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=self.reb)
+            price_relative = self.predict(obs)
+            return self.update(prev_posit, price_relative)
+        else:
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.sigma = np.eye(n_pairs) / n_pairs ** 2
+            return array_normalize(action)
+
+    def init_batch(self, n_pairs):
+        self.sigma_batch = np.tile(np.eye(n_pairs) / n_pairs ** 2, (self.n_portfolios, 1, 1))
+
+    def update_batch(self, b, obs, features=None):
+        """
+        Update every portfolio distribution on one price relative
+        :param b: numpy array: shape (n_portfolios, n_pairs), last portfolio vectors
+        :param obs: pandas DataFrame: Environment observation
+        :param features: dict: Precomputed price_features of obs, optional
+        """
+        if 'confidence' in self.batch_params:
+            theta = stats.norm.ppf(self.batch_params['confidence'])
+        else:
+            theta = self.batch_param('theta')
+
+        mu, self.sigma_batch = self.distribution_step(b, self.sigma_batch, self.predict(obs, features), theta,
+                                                      self.batch_param('eps'))
+        return mu
+
+    def set_params(self, **kwargs):
+        self.eps = kwargs['eps']
+        self.theta = stats.norm.ppf(kwargs['confidence'])
+
+
+class STMR(APrioriAgent):
+    """
+    Short term mean reversion strategy for portfolio selection.
+
+    Original algo by José Olímpio Mendes
+    27/11/2017
+    """
+
+    def __repr__(self):
+        return "STMR"
+
+    def __init__(self, eps=0.02, eta=0.0, window=120, k=0.1, mpc=1, rc=1, fiat="BTC", name="STMR"):
+        """
+        :param sensitivity: float: Sensitivity parameter. Lower is more sensitive.
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.eps = eps
+        self.eta = eta
+        self.window = window - 1
+        self.k = k
+        self.mpc = mpc
+        self.rc = rc
+
+        self.init = False
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        """
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64)
+        price_relative = np.append(prices.apply(lambda x: safe_div(x[-2], x[-1]) - 1).values, [0.0])
+
+        return price_relative
+
+    def polar_returns(self, obs):
+        """
+        Calculate polar return
+        :param obs: pandas DataFrame
+        :return: return radius, return angles
+        """
+        # Find relation between price and previous price
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64).iloc[-self.window - 1:]
+        price_relative = np.hstack([np.mat(prices.rolling(2).apply(
+            lambda x: safe_div(x[-2], x[-1]) - 1).dropna().values), np.zeros((self.window, 1))])
+
+        # Find the radius and the angle decomposition on price relative vectors
+        radius = np.linalg.norm(price_relative, ord=1, axis=1)
+        angle = np.divide(price_relative, np.mat(radius).T)
+
+        # Select the 'window' greater values on the observation
+        index = np.argpartition(radius, -(int(self.window * self.k) + 1))[-(int(self.window * self.k) + 1):]
+        index = index[np.argsort(radius[index])]
+
+        # Return the radius and the angle for extreme found values
+        return radius[index][::-1], angle[index][::-1]
+
+    def estimate_alpha(self, radius):
+        """
+        Estimate pareto's distribution alpha
+        :param radius: polar return radius
+        :return: alpha
+        """
+        return safe_div((radius.shape[0] - 1), np.log(safe_div(radius[:-1], radius[-1])).sum())
+
+    def estimate_gamma(self, alpha, Z, w):
+        """
+        Estimate risk index gamma
+        :param self:
+        :param alpha:
+        :param Z:
+        :param w:
+        :return:
+        """
+        return (1 / (Z.shape[0] - 1)) * np.power(np.clip(w * Z[:-1].T, 0.0, np.inf), alpha).sum()
+
+    def loss(self, w, alpha, Z, x):
+        # minimize allocation risk
+        gamma = self.estimate_gamma(alpha, Z, w)
+        # if the experts mean returns are low and you have no options, you can choose fiat
+        return self.rc * gamma + w[-1] * ((x.mean()) * x.var()) ** 2
+
+    def update(self, b, x, alpha, Z):
+        """
+        Update portfolio weights to satisfy constraint b * x <= eps
+        and minimize distance to previous portfolio.
+        :param b: numpy array: Last portfolio vector
+        :param x: numpy array: Price movement prediction
+        """
+        x_mean = np.mean(x)
+        portvar = np.dot(b, x)
+
+        change = abs((portvar + x[np.argmax(abs(x - x_mean))]) / 2)
+
+        lam = np.clip(safe_div(change - self.eps, np.linalg.norm(x - x_mean) ** 2), 0.0, 1e6)
+
+        # update portfolio
+        b += lam * (x - x_mean)
+
+        # # project it onto simplex
+        b = simplex_proj(b) * (1 - self.eta) + self.eta * self.crp
+
+        if self.rc > 0:
+            # Extreme risk index
+            # simplex constraints
+            cons = [
+                {'type': 'eq', 'fun': lambda w: w.sum() - 1},  # Simplex region
+                {'type': 'ineq', 'fun': lambda w: w}  # Positive bound
+            ]
+
+            if self.mpc < 1:
+                # Maximum position concentration constraint
+                cons.append({'type': 'ineq', 'fun': lambda w: self.mpc - np.linalg.norm(w[:-1], ord=np.inf)})
+
+            # Minimize loss starting from adjusted portfolio
+            b = optimize.minimize(self.loss, b, args=(alpha, Z, x + 1), constraints=cons)['x']
+
+        # Return best portfolio
+        return np.clip(b, 0, 1)  # Truncate small errors
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.init:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = array_normalize(action)
+            self.init = True
+
+        if self.step:
+            b = self.get_portfolio_vector(obs)
+            x = self.predict(obs)
+            # return self.update(prev_posit, price_relative)
+            R, Z = self.polar_returns(obs)
+            alpha = self.estimate_alpha(R)
+            self.last_port = self.update(b, x, alpha, Z)
+            return self.last_port
+
+        else:
+            return self.crp
+
+    def set_params(self, **kwargs):
+        if 'eps' in kwargs:
+            self.eps = kwargs['eps']
+        if 'eta' in kwargs:
+            self.eta = kwargs['eta']
+
+
+class KAMAMR(STMR):
+    def __repr__(self):
+        return "KAMAMR"
+
+    def __init__(self, eps=0.02, window=3, rebalance=True, activation=simplex_proj, fiat="BTC", name="STMR"):
+        """
+        :param sensitivity: float: Sensitivity parameter. Lower is more sensitive.
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.eps = eps
+        self.window = window
+        self.activation = activation
+        if rebalance:
+            self.reb = -2
+        else:
+            self.reb = -1
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        """
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64)
+        mu = prices.apply(tl.KAMA, timeperiod=self.window, raw=True).iloc[-1].values
+
+        price_relative = np.append(safe_div(mu, prices.iloc[-1].values) - 1, [0.0])
+
+        return price_relative
+
+    def set_params(self, **kwargs):
+        self.eps = kwargs['eps']
+        self.window = int(kwargs['window'])
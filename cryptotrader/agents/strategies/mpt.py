@@ -0,0 +1,242 @@
+"""
+Modern Portfolio Theory strategies
+"""
+from ...utils import *
+
+from cryptotrader.models import apriori as models
+
+import pandas as pd
+import warnings
+from .base import APrioriAgent
+
+# Solver and indicator backends load on first use
+ta = tl = lazy_import('talib')
+opt = lazy_import('cvxopt')
+optsolvers = lazy_import('cvxopt.solvers')
+
+
+class MeanVariance(APrioriAgent):
+
+    def __repr__(self):
+        return "Modern Portfolio Theory"
+
+    def __init__(self, factor=models.price_relative, fiat="BTC", name='TangentPortfolio'):
+        """
+        :param window: Window parameter.
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.factor = factor
+        self.fiat = fiat
+        self.init = False
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        return self.factor(obs).iloc[-1]
+
+    def update(self, cov_mat, exp_rets):
+        raise NotImplementedError("You should overwrite this method in the child class.")
+
+    def rebalance(self, obs):
+        raise NotImplementedError("You should overwrite this method in the child class.")
+
+    def set_params(self, **kwargs):
+        self.target_return = kwargs['target_return']
+
+
+class TangencyPortfolio(MeanVariance):
+    """
+    Computes a tangency portfolio, i.e. a maximum Sharpe ratio portfolio.
+    """
+
+    def __repr__(self):
+        return "Tangency Portfolio"
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.init:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = array_normalize(action)
+            self.init = True
+
+        if self.step:
+            x = self.predict(obs)
+            price_relative = obs.xs('open', level=1, axis=1).apply(lambda x: ta.ROCR(x, timeperiod=1),
+                                                                   raw=True).fillna(1.0)
+            cov_mat = price_relative.cov()
+            return self.update(cov_mat, x)
+        else:
+            return self.crp
+
+    def update(self, cov_mat, exp_rets):
+        """
+         Note: As the Sharpe ratio is not invariant with respect
+         to leverage, it is not possible to construct non-trivial
+         market neutral tangency portfolios. This is because for
+         a positive initial Sharpe ratio the sharpe grows unbound
+         with increasing leverage.
+
+         Parameters
+         ----------
+         cov_mat: pandas.DataFrame
+             Covariance matrix of asset returns.
+         exp_rets: pandas.Series
+             Expected asset returns (often historical returns).
+         allow_short: bool, optional
+             If 'False' construct a long-only portfolio.
+             If 'True' allow shorting, i.e. negative weights.
+
+         Returns
+         -------
+         weights: pandas.Series
+             Optimal asset weights.
+         """
+        if not isinstance(cov_mat, pd.DataFrame):
+            raise ValueError("Covariance matrix is not a DataFrame")
+
+        if not isinstance(exp_rets, pd.Series):
+            raise ValueError("Expected returns is not a Series")
+
+        if not cov_mat.index.equals(exp_rets.index):
+            raise ValueError("Indices do not match")
+
+        n = len(cov_mat)
+
+        P = opt.matrix(cov_mat.values)
+        q = opt.matrix(0.0, (n, 1))
+
+        # Constraints Gx <= h
+        # exp_rets*x >= 1 and x >= 0
+        G = opt.matrix(np.vstack((-exp_rets.values,
+                                  -np.identity(n))))
+        h = opt.matrix(np.vstack((-1.0,
+                                  np.zeros((n, 1)))))
+
+        # Solve
+        optsolvers.options['show_progress'] = False
+        sol = optsolvers.qp(P, q, G, h)
+
+        if sol['status'] != 'optimal':
+            warnings.warn("Convergence problem")
+
+        weights = np.append(np.squeeze(sol['x']), [0.0])
+
+        # Rescale weights, so that sum(weights) = 1
+        weights /= weights.sum()
+        return weights
+
+
+class Markowitz(MeanVariance):
+    """
+    Markowitz portfolio optimization
+    """
+    def __repr__(self):
+        return "Markowitz Portfolio"
+
+    def __init__(self, factor=models.price_relative, target_return=0.0025, fiat="BTC", name='Markowitz'):
+        """
+        :param window: Window parameter.
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.target_return = target_return
+        self.factor = factor
+        self.fiat = fiat
+        self.init = False
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.init:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = array_normalize(action)
+            self.init = True
+
+        if self.step:
+            x = self.predict(obs)
+            # x[self.fiat] = 1 * (1 - x.std())
+            price_relative = obs.xs('open', level=1, axis=1).apply(lambda x: ta.ROCR(x, timeperiod=1),
+                                                                   raw=True).fillna(1.0)
+            # price_relative[self.fiat] = 1 * (1 - price_relative.std(axis=1))
+            cov_mat = price_relative.cov()
+            return self.update(cov_mat, x, self.target_return)
+        else:
+            return self.crp
+
+    def update(self, cov_mat, exp_rets, target_ret):
+        """
+        Computes a Markowitz portfolio.
+
+        Parameters
+        ----------
+        cov_mat: pandas.DataFrame
+            Covariance matrix of asset returns.
+        exp_rets: pandas.Series
+            Expected asset returns (often historical returns).
+        target_ret: float
+            Target return of portfolio.
+        allow_short: bool, optional
+            If 'False' construct a long-only portfolio.
+            If 'True' allow shorting, i.e. negative weights.
+        market_neutral: bool, optional
+            If 'False' sum of weights equals one.
+            If 'True' sum of weights equal zero, i.e. create a
+                market neutral portfolio (implies allow_short=True).
+
+        Returns
+        -------
+        weights: pandas.Series
+            Optimal asset weights.
+        """
+        if not isinstance(cov_mat, pd.DataFrame):
+            raise ValueError("Covariance matrix is not a DataFrame")
+
+        if not isinstance(exp_rets, pd.Series):
+            raise ValueError("Expected returns is not a Series")
+
+        if not isinstance(target_ret, float):
+            raise ValueError("Target return is not a float")
+
+        if not cov_mat.index.equals(exp_rets.index):
+            raise ValueError("Indices do not match")
+
+        n = len(cov_mat)
+
+        P = opt.matrix(cov_mat.values)
+        q = opt.matrix(0.0, (n, 1))
+
+        # Constraints Gx <= h
+        # exp_rets*x >= target_ret and x >= 0
+        G = opt.matrix(np.vstack((-exp_rets.values,
+                                  -np.identity(n))))
+        h = opt.matrix(np.vstack((-target_ret,
+                                  +np.zeros((n, 1)))))
+
+        # Constraints Ax = b
+        # sum(x) = 1
+        A = opt.matrix(1.0, (1, n))
+
+        b = opt.matrix(1.0)
+
+        # Solve
+        optsolvers.options['show_progress'] = False
+        sol = optsolvers.qp(P, q, G, h, A, b)
+
+        if sol['status'] != 'optimal':
+            warnings.warn("Convergence problem")
+
+        # Put weights into a labeled series
+        weights = np.append(np.squeeze(sol['x']), [0.0])
+        return weights
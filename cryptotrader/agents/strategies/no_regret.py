@@ -0,0 +1,640 @@
+"""
+No regret online portfolio strategies
+"""
+from ...utils import *
+
+from cryptotrader.models import apriori as models
+from cryptotrader.optimizers import gt
+from cryptotrader.models import risk
+from .base import APrioriAgent
+
+# Solver and indicator backends load on first use
+optimize = lazy_import('scipy.optimize')
+opt = lazy_import('cvxopt')
+
+
+class ONS(APrioriAgent):
+    """
+    Online Newton Step algorithm.
+    Reference:
+        A.Agarwal, E.Hazan, S.Kale, R.E.Schapire.
+        Algorithms for Portfolio Management based on the Newton Method, 2006.
+        http://machinelearning.wustl.edu/mlpapers/paper_files/icml2006_AgarwalHKS06.pdf
+        http://rob.schapire.net/papers/newton_portfolios.pdf
+    """
+
+    def __repr__(self):
+        return "ONS"
+
+    def __init__(self, delta=0.125, beta=1, eta=0., fiat="BTC", name="ONS"):
+        """
+        :param delta, beta, eta: Model parameters. See paper.
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.delta = delta
+        self.beta = beta
+        self.eta = eta
+
+    def predict(self, obs):
+        prices = obs.xs('open', level=1, axis=1).astype(np.float64)
+        price_relative = np.append(prices.apply(lambda x: safe_div(x[-1], x[-2])).values, [1.0])
+        return price_relative
+
+    def rebalance(self, obs):
+        if not self.init:
+            self.n_pairs = obs.columns.levels[0].shape[0]
+            self.A = np.mat(np.eye(self.n_pairs))
+            self.b = np.mat(np.zeros(self.n_pairs)).T
+            self.init = True
+
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=-1)
+            price_relative = self.predict(obs)
+            return self.update(prev_posit, price_relative)
+
+        else:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            return array_normalize(action)
+
+    def update(self, b, x):
+        # calculate gradient
+        grad = np.clip(np.mat(safe_div(x, np.dot(b, x))).T, -self.clip, self.clip)
+        # update A
+        self.A += grad * grad.T
+        # update b
+        self.b += (1 + safe_div(1., self.beta)) * grad
+
+        # projection of p induced by norm A
+        pp = self.projection_in_norm(self.delta * self.A.I * self.b, self.A)
+
+        return pp * (1 - self.eta) + np.ones(len(x)) / float(len(x)) * self.eta
+
+    def projection_in_norm(self, x, M):
+        """
+        Projection of x to simplex induced by matrix M. Uses quadratic programming.
+        """
+        m = M.shape[0]
+
+        # Constrains matrices
+        P = opt.matrix(2 * M)
+        q = opt.matrix(-2 * M * x)
+        G = opt.matrix(-np.eye(m))
+        h = opt.matrix(np.zeros((m, 1)))
+        A = opt.matrix(np.ones((1, m)))
+        b = opt.matrix(1.)
+
+        # Solve using quadratic programming
+        opt.solvers.options['show_progress'] = False
+        sol = opt.solvers.qp(P, q, G, h, A, b)
+        return np.squeeze(sol['x'])
+
+    def set_params(self, **kwargs):
+        self.delta = kwargs['delta']
+        self.beta = kwargs['beta']
+        self.eta = kwargs['eta']
+        if 'mr' in kwargs:
+            self.mr = bool(kwargs['mr'])
+
+
+class OGS(APrioriAgent):
+    """
+    Online gradient step with AdaGrad algorithm optimizer
+    """
+
+    def __repr__(self):
+        return "OGS"
+
+    def __init__(self, factor=models.price_relative, lr=1, eta=0., clip_grads=1e6, damping=0.99, mr=False, fiat="BTC", name="ONS"):
+        """
+        :param delta, beta, eta: Model parameters. See paper.
+        """
+        super().__init__(fiat=fiat, name=name)
+
+        self.lr = lr
+        self.damping = damping
+        self.factor = factor
+        self.eta = eta
+        self.clip = clip_grads
+        self.mr = mr
+
+        self.init = False
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        return np.append(self.factor(obs).iloc[-1].values, [1.0])
+
+    def rebalance(self, obs):
+        if not self.init:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = array_normalize(action)
+
+            # AdaGrad square gradient
+            self.gti = np.ones_like(self.crp)
+
+            self.init = True
+
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=-1)
+            price_relative = self.predict(obs)
+            return self.update(prev_posit, price_relative)
+        else:
+            return self.crp
+
+    def update(self, b, x):
+        # calculate gradient
+        grad = np.clip(safe_div(x, np.dot(b, x)), -self.clip, self.clip) - 1
+        self.gti = np.clip(self.gti * self.damping + grad ** 2, 0.0, 1e8)
+        adjusted_grad = safe_div(grad, self.gti)
+
+        # update b, we are using relative log return benchmark, so we want to maximize here
+        b += self.lr * adjusted_grad
+
+        # projection of p
+        pp = simplex_proj(b)
+
+        return pp * (1 - self.eta) + np.ones(len(x)) / float(len(x)) * self.eta
+
+    def set_params(self, **kwargs):
+        if 'lr'in kwargs:
+            self.lr = kwargs['lr']
+        if 'eta' in kwargs:
+            self.eta = kwargs['eta']
+        if 'mr' in kwargs:
+            self.mr = bool(kwargs['mr'])
+        if 'damping' in kwargs:
+            self.damping = kwargs['damping']
+
+
+class MW(APrioriAgent):
+    """
+    Multiplicative-Weights algorithm
+    """
+
+    def __repr__(self):
+        return "Multiplicative Weights"
+
+    def __init__(self, factor=models.price_relative, lr=1, fiat="BTC", name="MW"):
+        """
+        :param delta, beta, eta: Model parameters. See paper.
+        """
+        super().__init__(fiat=fiat, name=name)
+
+        self.lr = lr
+        self.factor = factor
+
+        self.init = False
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        return np.append(self.factor(obs).iloc[-1].values, [1.0])
+
+
+    def rebalance(self, obs):
+        if not self.init:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = array_normalize(action)
+
+            # AdaGrad square gradient
+            self.gti = np.ones_like(self.crp)
+
+            self.init = True
+
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=-1)
+            price_relative = self.predict(obs)
+            return self.update(prev_posit, price_relative)
+        else:
+            return self.crp
+
+    def update(self, b, x):
+        # update b, we are using relative log return benchmark, so we want to maximize here
+        b += self.lr * b * x
+
+        return simplex_proj(b)
+
+    def set_params(self, **kwargs):
+        if 'lr'in kwargs:
+            self.lr = kwargs['lr']
+
+
+class ORAMW(APrioriAgent):
+    """
+    Online Risk Averse Multiplicative Weights
+    This is an algorithm that uses multiplicative weights with gradient experts
+    and Extreme Risk Index for portfolio allocation
+    References:
+        Extreme Risk Index:
+        https://arxiv.org/pdf/1505.04045.pdf
+    """
+    def __repr__(self):
+        return "Online Risk Averse Multiplicative Weights"
+
+    def __init__(self, window=120, k=0.1, lr=0.5, mpc=1, fiat="BTC", name='ORAGS'):
+        super().__init__(fiat=fiat, name=name)
+        self.window = window - 1
+        self.k = k
+        self.mpc = mpc
+        self.opt = gt.MultiplicativeWeights(lr)
+
+        # Extreme risk index
+        self.cons = [
+            {'type': 'eq', 'fun': lambda w: w.sum() - 1}, # Simplex region
+            {'type': 'ineq', 'fun': lambda w: w}, # Positive bound
+            # Maximum position concentration constraint
+            {'type': 'ineq', 'fun': lambda w: self.mpc - np.linalg.norm(w[:-1], ord=np.inf)}
+        ]
+
+        self.crp = None
+        self.b = None
+        self.init = False
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        prices = obs.xs('open',level=1, axis=1)
+
+        factor = np.hstack([prices.rolling(2).apply(
+            lambda x: np.log(safe_div(x[-1], x[-2]))).dropna().values, np.zeros((self.window, 1))])
+
+        factor2 = np.hstack([prices.rolling(2).apply(
+            lambda x: np.log(safe_div(x[-2], x[-1]))).dropna().values, np.zeros((self.window, 1))])
+
+        return factor, factor2
+
+    def loss(self, w, R, Z, x):
+        # minimize allocation risk
+        return risk.ERI(R, Z, w) + w[-1] * np.exp(x).mean() * x.var()
+
+    def update(self, b, x, x2):
+
+        # Update portfolio with no regret
+        last_x = x[-1, :]
+        leader = np.zeros_like(last_x)
+        leader[np.argmax(last_x)] = -1
+
+        b = simplex_proj(self.opt.optimize(leader, b))
+
+        # Manage allocation risk
+        b = optimize.minimize(
+            self.loss,
+            b,
+            args=(*risk.polar_returns(x2, self.k), last_x),
+            constraints=self.cons,
+            options={'maxiter': 300},
+            tol=1e-6,
+            bounds=tuple((0,1) for _ in range(b.shape[0]))
+        )
+
+        # Log variables
+        self.log['lr'] = "%.4f" % self.opt.lr
+        self.log['mpc'] = "%.4f" % self.mpc
+        self.log['risk'] = "%.6f" % b['fun']
+
+        # Return best portfolio
+        return b['x']
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.init:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = array_normalize(action)
+            self.b = self.crp
+            # AdaGrad square gradient, started with ones for stability
+            self.init = True
+
+        if self.step:
+            # b = self.get_portfolio_vector(obs)
+            x, x2 = self.predict(obs)
+            self.b = self.update(self.b, x, x2)
+            return self.b
+
+        else:
+            return self.crp
+
+    def set_params(self, **kwargs):
+        if 'window' in kwargs:
+            self.window = int(kwargs['window'])
+        if 'k' in kwargs:
+            self.k = kwargs['k']
+        if 'lr' in kwargs:
+            self.opt.lr = kwargs['lr']
+        if 'mpc' in kwargs:
+            self.mpc = kwargs['mpc']
+
+
+class NRS(APrioriAgent):
+    """
+    Pursuit and Evade No-Regret System
+    """
+    def __repr__(self):
+        return "Pursuit and Evade No-Regret System"
+
+    def __init__(self, window=120, k=0.1, lr=0.5, gradlr=1e-2, beta=0.5,
+                 mpc=1, fiat="BTC", name='NRS'):
+        super().__init__(fiat=fiat, name=name)
+        self.window = window - 1
+        self.k = k
+        self.mpc = mpc
+        self.opt = gt.MultiplicativeWeights(lr)
+        self.pe = gt.PursuitAndEvade(gradlr)
+        self.beta = beta
+        self.lr = lr
+
+        # Extreme risk index
+        self.cons = [
+            {'type': 'eq', 'fun': lambda w: w.sum() - 1}, # Simplex region
+            {'type': 'ineq', 'fun': lambda w: w}, # Positive bound
+            {'type': 'ineq', 'fun': lambda w: self.mpc - np.linalg.norm(w, ord=np.inf)}
+            # Maximum position concentration constraint
+        ]
+
+        self.b = None
+        self.w = None
+        self.score = None
+        self.init = False
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        prices = obs.xs('open', level=1, axis=1)
+        log_returns = np.hstack([prices.rolling(2).apply(
+            lambda x: np.log(safe_div(x[-1], x[-2]))).dropna().values, np.zeros((self.window, 1))])
+        return log_returns
+
+    # Pareto Extreme Risk Index
+    @staticmethod
+    def estimate_alpha(R):
+        return safe_div((R.shape[0] - 1), np.log(safe_div(R[:-1], R[-1])).sum())
+
+    @staticmethod
+    def estimate_gamma(alpha, Z, w):
+        return (1 / (Z.shape[0] - 1)) * np.power(np.clip(w * Z[:-1].T, 0.0, np.inf), alpha).sum()
+
+    def loss_tf(self, w, alpha, Z, x):
+        # minimize allocation risk
+        return self.estimate_gamma(alpha, Z, w) + w[-1] * np.exp(x).mean() * x.var()
+
+    def loss_eri(self, w, alpha, Z, b):
+        # minimize allocation risk
+        return self.estimate_gamma(alpha, Z, w) + np.linalg.norm(b - w) ** 2
+
+    def update(self, b, x):
+        # Update portfolio with no regret
+        last_x = x[-1, :]
+        self.r_hat = self.beta * self.r_hat + (1 - self.beta) * last_x
+
+        # ERI params
+        R, Z = risk.polar_returns(-x, self.k)
+        alpha = self.estimate_alpha(R)
+
+        # Compute experts scores
+        for i in range(self.score.shape[0]):
+            self.score[i] = self.score[i] * self.beta + (1 - self.beta) * np.dot(last_x, self.w[i])
+
+        cons = self.cons + [{'type': 'eq', 'fun': lambda w:
+            np.dot(w, self.r_hat) - np.clip(0.001, 0.0, self.r_hat.max())}]
+
+        # Choose to follow or pursuit
+        best_w = self.w[np.argmax(self.score)]
+        if np.allclose(b, best_w, 1e-2, 1e-2):
+            action = 'follow'
+        else:
+            action = 'pursuit'
+
+        # Update experts
+        leader = np.zeros_like(last_x)
+        leader[np.argmax(last_x)] = -1
+
+        # self.opt1.lr = self.lr / np.exp((self.score[1] + self.score[0]))
+        self.w[0] = optimize.minimize(
+            self.loss_tf,
+            self.opt.optimize(leader, self.w[0]),
+            args=(alpha, Z, last_x),
+            constraints=self.cons,
+            options={'maxiter': 666},
+            tol=1e-7,
+            bounds=tuple((0,1) for _ in range(b.shape[0]))
+        )['x']
+
+        self.w[1] = optimize.minimize(
+            self.loss_eri,
+            self.w[1],
+            args=(alpha, Z, self.w[1]),
+            constraints=cons,
+            options={'maxiter': 666},
+            tol=1e-7,
+            bounds=tuple((0,1) for _ in range(b.shape[0]))
+        )['x']
+
+        if action == 'follow':
+            b = simplex_proj(self.w[np.argmax(self.score)])
+        elif action == 'pursuit':
+            b = simplex_proj(self.pe.optimize(self.w[np.argmax(self.score)], b))
+
+        # Log variables
+        self.log['score'] = "tf: %.4f, mr: %.4f" % (self.score[0], self.score[1])
+        self.log['ERI'] = "%.8f" % risk.ERI(*risk.polar_returns(-x, self.k), b)
+        self.log['TCVaR'] = "%.2f" % risk.TCVaR(*risk.fit_t(np.dot(x, b)))
+        self.log['alpha'] = "%.2f" % alpha
+        self.log['CC'] = "%.2f" % np.power(b, 2).sum() ** -1
+        self.log['action'] = action
+        self.log['lr'] = "%.2f" % self.opt.lr
+        self.log['beta'] = "%.2f" % self.beta
+        self.log['mpc'] = "%.2f" % self.mpc
+
+        return b
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.step:
+            n_pairs = obs.columns.levels[0].shape[0]
+            crp = np.ones(n_pairs)
+            crp[-1] = 0
+
+            self.crp = array_normalize(crp)
+            self.w = np.vstack([self.crp.reshape([1, -1]) for _ in range(2)])
+            self.b = self.crp
+            self.r_hat = np.zeros(n_pairs)
+            self.score = np.zeros(self.w.shape[0])
+            return self.crp
+
+        x = self.predict(obs)
+        self.b = self.update(self.b, x)
+        return self.b
+
+
+class AdaHedge(APrioriAgent):
+    """
+    AdaHedge
+    https://arxiv.org/pdf/1301.0534.pdf
+    """
+    def __repr__(self):
+        return "AdaHedge"
+
+    def __init__(self, window=3, eta=0.999, fiat="BTC", name='AdaHedge'):
+        super().__init__(fiat=fiat, name=name)
+        self.window = window - 1
+        self.opt = gt.HigherOrderMultiplicativeWeights(1, 8)
+        self.eta = eta
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        prices = obs.xs('open',level=1, axis=1)
+        factor = np.hstack([prices.rolling(2).apply(
+            lambda x: np.log(safe_div(x[-1], x[-2]))).dropna().values, np.zeros((self.window, 1))])
+
+        return factor
+
+    def update(self, b, x):
+        # Update portfolio with no regret
+        last_x = x[-1, :]
+        experts_losses = -last_x
+
+        h = np.dot(experts_losses, b)
+        m = (-1 / self.opt.lr) * np.log(np.dot(b, exp_approx(-self.opt.lr * experts_losses, order=8)))
+        delta = h - m
+        self.delta = self.eta * self.delta + delta
+
+        # Update learning rate
+        self.opt.lr = np.log(b.shape[0]) / self.delta
+
+        # Update weights
+        b = array_normalize(self.opt.optimize(experts_losses, b * self.eta + (1 - self.eta) * self.crp))
+
+        # Log variables
+        self.log['lr'] = "%.4f" % self.opt.lr
+        self.log['delta'] = "%.4f" % self.delta
+        self.log['eta'] = "%.4f" % self.eta
+
+        # Return updated portfolio
+        return b
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.step:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = self.b = array_normalize(action)
+
+            # AdaHedge accumulators
+            self.delta = 1
+
+            return self.crp
+
+        x = self.predict(obs)
+        self.b = self.update(self.b, x)
+        return self.b
+
+
+class Flipflop(APrioriAgent):
+    """
+    Flipflop
+    https://arxiv.org/pdf/1301.0534.pdf
+    """
+
+    def __repr__(self):
+        return "Flipflop"
+
+    def __init__(self, window=120, phi=1.1, alpha=0.1, fiat="BTC", name='Flipflop'):
+        super().__init__(fiat=fiat, name=name)
+        self.window = window - 1
+        self.opt = gt.HigherOrderMultiplicativeWeights(1, order=8)
+        self.scale = np.array([phi / alpha, alpha])
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        prices = obs.xs('open', level=1, axis=1)
+
+        factor = np.hstack([prices.rolling(2).apply(
+            lambda x: np.log(safe_div(x[-1], x[-2]))).dropna().values, np.zeros((self.window, 1))])
+
+        return factor
+
+    def update(self, b, x):
+        # Update portfolio with no regret
+        last_x = x[-1, :]
+        experts_loss = -last_x
+
+        # losses
+        h = np.dot(experts_loss, b)
+        m = (-1 / self.opt.lr) * np.log(np.dot(b, np.exp(-self.opt.lr * experts_loss)))
+        delta = h - m
+
+        # Accumulate delta
+        self.delta[self.regime] += delta
+
+        if self.delta[self.regime] > self.scale[self.regime] * self.delta[1 - self.regime]:
+            self.regime = 1 - self.regime
+
+        if self.regime == 0:
+            self.opt.lr = 1e3
+        else:
+            self.opt.lr = np.log(b.shape[0]) / self.delta[1]
+
+        b = simplex_proj(self.opt.optimize(experts_loss, b))
+
+        # Log variables
+        self.log['lr'] = "%.4f" % self.opt.lr
+        self.log['delta'] = "%s" % str(self.delta)
+
+        # Return best portfolio
+        return b
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.step:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = self.b = array_normalize(action)
+
+            # AdaHedge accumulators
+            self.delta = np.ones(2, dtype=np.float64) * 1e-3
+            self.regime = 0
+
+            return self.crp
+
+        x = self.predict(obs)
+        self.b = self.update(self.b, x)
+        return self.b
@@ -0,0 +1,127 @@
+"""
+Pattern trading strategies
+"""
+from ...utils import *
+from .base import APrioriAgent
+
+# Solver and indicator backends load on first use
+signal = lazy_import('scipy.signal')
+
+
+class HarmonicTrader(APrioriAgent):
+    """
+    Fibonacci harmonic pattern trader
+    """
+
+    def __repr__(self):
+        return "HarmonicTrader"
+
+    def __init__(self, peak_order=7, err_allowed=0.05, decay=0.99, activation=simplex_proj, fiat="BTC", name="Harmonic"):
+        """
+        Fibonacci trader init method
+        :param peak_order: Extreme finder movement magnitude threshold
+        :param err_allowed: Pattern error margin to be accepted
+        :param decay: float: Decay rate for portfolio selection. Between 0 and 1
+        :param fiat: Fiat symbol to use in trading
+        """
+        super().__init__(fiat, name=name)
+        self.err_allowed = err_allowed
+        self.peak_order = peak_order
+        self.alpha = [1., 1.]
+        self.decay = decay
+        self.activation = activation
+
+    def find_extreme(self, obs):
+        max_idx = signal.argrelextrema(obs.open.values, np.greater, order=self.peak_order)[0]
+        min_idx = signal.argrelextrema(obs.open.values, np.less, order=self.peak_order)[0]
+        extreme_idx = np.concatenate([max_idx, min_idx, [obs.shape[0] - 1]])
+        extreme_idx.sort()
+        return obs.open.iloc[extreme_idx]
+
+    def calc_intervals(self, extremes):
+        XA = extremes.iloc[-2] - extremes.iloc[-1]
+        AB = extremes.iloc[-3] - extremes.iloc[-2]
+        BC = extremes.iloc[-4] - extremes.iloc[-3]
+        CD = extremes.iloc[-5] - extremes.iloc[-4]
+
+        return XA, AB, BC, CD
+
+    def find_pattern(self, obs, c1, c2, c3):
+        try:
+            XA, AB, BC, CD = self.calc_intervals(self.find_extreme(obs))
+
+            # Gartley fibonacci pattern
+            AB_range = np.array([c1[0] - self.err_allowed, c1[1] + self.err_allowed]) * abs(XA)
+            BC_range = np.array([c2[0] - self.err_allowed, c2[1] + self.err_allowed]) * abs(AB)
+            CD_range = np.array([c3[0] - self.err_allowed, c3[1] + self.err_allowed]) * abs(BC)
+
+            if AB_range[0] < abs(AB) < AB_range[1] and \
+                                    BC_range[0] < abs(BC) < BC_range[1] and \
+                                    CD_range[0] < abs(CD) < CD_range[1]:
+                if XA > 0 and AB < 0 and BC > 0 and CD < 0:
+                    return 1
+                elif XA < 0 and AB > 0 and BC < 0 and CD > 0:
+                    return -1
+                else:
+                    return 0
+            else:
+                return 0
+        except IndexError:
+            return 0
+
+    def is_gartley(self, obs):
+        return self.find_pattern(obs, c1=(0.618, 0.618), c2=(0.382, 0.886), c3=(1.27, 1.618))
+
+    def is_butterfly(self, obs):
+        return self.find_pattern(obs, c1=(0.786, 0.786), c2=(0.382, 0.886), c3=(1.618, 2.618))
+
+    def is_bat(self, obs):
+        return self.find_pattern(obs, c1=(0.382, 0.5), c2=(0.382, 0.886), c3=(1.618, 2.618))
+
+    def is_crab(self, obs):
+        return self.find_pattern(obs, c1=(0.382, 0.618), c2=(0.382, 0.886), c3=(2.24, 3.618))
+
+    def predict(self, obs):
+        pairs = obs.columns.levels[0]
+        action = np.zeros(pairs.shape[0] - 1)
+        for i, pair in enumerate(pairs):
+            if pair is not self.fiat:
+                pattern = np.array([pattern(obs[pair]) for pattern in [self.is_gartley,
+                                                                       self.is_butterfly,
+                                                                       self.is_bat,
+                                                                       self.is_crab]]).sum()
+
+                action[i] = pattern
+
+        return action
+
+    def rebalance(self, obs):
+        if self.step:
+            pairs = obs.columns.levels[0]
+            prev_port = self.get_portfolio_vector(obs)
+            action = self.predict(obs)
+            port_vec = np.zeros(pairs.shape[0])
+            for i in range(pairs.shape[0] - 1):
+                if action[i] >= 0:
+                    port_vec[i] = max(0.,
+                                      (self.decay * prev_port[i] + (1 - self.decay)) + self.alpha[0] * action[
+                                          i])
+                else:
+                    port_vec[i] = max(0.,
+                                      (self.decay * prev_port[i] + (1 - self.decay)) + self.alpha[1] * action[
+                                          i])
+
+            port_vec[-1] = max(0, 1 - port_vec.sum())
+
+        else:
+            n_pairs = obs.columns.levels[0].shape[0]
+            port_vec = np.ones(n_pairs)
+            port_vec[-1] = 0
+
+        return self.activation(port_vec)
+
+    def set_params(self, **kwargs):
+        self.err_allowed = kwargs['err_allowed']
+        self.peak_order = int(kwargs['peak_order'])
+        self.decay = kwargs['decay']
+        self.alpha = [kwargs['alpha_up'], kwargs['alpha_down']]
@@ -0,0 +1,190 @@
+"""
+Portfolio optimization strategies
+"""
+from ...utils import *
+
+from cryptotrader.models import apriori as models
+from .base import APrioriAgent
+
+
+class TCO(APrioriAgent):
+    """
+    Transaction cost optimization for online portfolio selection
+
+    Reference:
+        B. Li and J. Wang
+        http://ink.library.smu.edu.sg/cgi/viewcontent.cgi?article=4761&context=sis_research
+    """
+    batch_keys = ('toff',)
+
+    def __repr__(self):
+        return "TCO"
+
+    def batch_group(self):
+        return self.factor, self.reb
+
+    def __init__(self, factor=models.price_relative, toff=0.1, optimize_factor=True, rebalance=True, fiat="BTC", name="TCO"):
+        """
+        :param window: integer: Lookback window size.
+        :param eps: float: Threshold value for updating portfolio.
+        """
+        super().__init__(fiat=fiat, name=name)
+        self.toff = toff
+        self.factor = factor
+        self.optimize_factor = optimize_factor
+        if rebalance:
+            self.reb = -2
+        else:
+            self.reb = -1
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        # price_predict = np.empty(obs.columns.levels[0].shape[0] - 1, dtype=np.float64)
+        # for key, symbol in enumerate([s for s in obs.columns.levels[0] if s is not self.fiat]):
+        #     price_predict[key] = np.float64(obs[symbol].open.iloc[-self.window:].mean() /
+        #                                     (obs.get_value(obs.index[-1], (symbol, 'open')) + self.epsilon))
+        prev_posit = self.get_portfolio_vector(obs, index=-1) + 1
+        factor_posit = self.factor(obs) + 1
+        return safe_div(factor_posit, prev_posit)
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=self.reb)
+            price_prediction = self.predict(obs)
+            return self.update(prev_posit, price_prediction)
+        else:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            return array_normalize(action)
+
+    def update(self, b, x):
+        """
+        Update portfolio weights to satisfy constraint b * x >= eps
+        and minimize distance to previous weights.
+        :param b: numpy array: Last portfolio vector
+        :param x: numpy array: Price movement prediction
+        """
+        vt = safe_div(x, np.dot(b, x))
+        vt_mean = np.mean(vt)
+        # update portfolio
+        b += np.sign(vt - vt_mean) * np.clip(abs(vt - vt_mean) - self.toff, 0.0, np.inf)
+
+        # project it onto simplex
+        return simplex_proj(b)
+
+    def update_batch(self, b, obs, features=None):
+        """
+        Update every portfolio, each factor prediction is taken relative to its own portfolio
+        :param b: numpy array: shape (n_portfolios, n_pairs), last portfolio vectors
+        :param obs: pandas DataFrame: Environment observation
+        :param features: dict: Precomputed price_features of obs, unused by the factor
+        """
+        x = safe_div(self.factor(obs) + 1, b + 1)
+        vt = safe_div(x, np.sum(b * x, axis=1, keepdims=True))
+        vt_dev = vt - vt.mean(axis=1, keepdims=True)
+
+        # update portfolios
+        b += np.sign(vt_dev) * np.clip(abs(vt_dev) - self.batch_param('toff')[:, None], 0.0, np.inf)
+
+        # project them onto simplex
+        return simplex_proj_batch(b)
+
+    def set_params(self, **kwargs):
+        self.toff = kwargs['toff']
+        if self.optimize_factor:
+            self.factor.set_params(**kwargs)
+
+
+class Anticor(APrioriAgent):
+    """ Anticor (anti-correlation) is a heuristic portfolio selection algorithm.
+    It adopts the consistency of positive lagged cross-correlation and negative
+    autocorrelation to adjust the portfolio. Eventhough it has no known bounds and
+    hence is not considered to be universal, it has very strong empirical results.
+    Reference:
+        A. Borodin, R. El-Yaniv, and V. Gogan.  Can we learn to beat the best stock, 2005.
+        http://www.cs.technion.ac.il/~rani/el-yaniv-papers/BorodinEG03.pdf
+    """
+
+    def __repr__(self):
+        return "Anticor"
+
+    def __init__(self, window=30, fiat="BTC"):
+        """
+        :param window: Window parameter.
+        """
+        super().__init__(fiat=fiat)
+        self.window = window
+
+    def predict(self, obs):
+        """
+
+        :param obs:
+        :return:
+        """
+        price_log1 = np.empty((self.window - 2, obs.columns.levels[0].shape[0] - 1), dtype='f')
+        price_log2 = np.empty((self.window - 2, obs.columns.levels[0].shape[0] - 1), dtype='f')
+        for key, symbol in enumerate([s for s in obs.columns.levels[0] if s is not self.fiat]):
+            price_log1[:, key] = obs[symbol].open.iloc[-2 * self.window + 1:-self.window].rolling(2).apply(
+                lambda x: np.log10(safe_div(x[-1], x[-2]))).dropna().values.T
+            price_log2[:, key] = obs[symbol].open.iloc[-self.window + 1:].rolling(2).apply(
+                lambda x: np.log10(safe_div(x[-1], x[-2]))).dropna().values.T
+        return price_log1, price_log2
+
+    def rebalance(self, obs):
+        if self.step:
+            prev_posit = self.get_portfolio_vector(obs, index=-1)[:-1]
+            factor = self.predict(obs)
+            return self.update(prev_posit, *factor)
+        else:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            return array_normalize(action)
+
+    @staticmethod
+    def zero_to_inf(vec):
+        return np.vectorize(lambda x: np.inf if np.allclose(x, [0.0]) else x)(vec)
+
+    def update(self, b, lx1, lx2):
+        mean2 = lx2.mean(axis=0)
+        std1 = self.zero_to_inf(lx1.std(axis=0))
+        std2 = self.zero_to_inf(lx2.std(axis=0))
+
+        corr = np.matmul(((lx1 - lx1.mean(axis=0)) / std1).T, (lx2 - mean2) / std2)
+        claim = np.zeros_like(corr)
+
+        for i in range(corr.shape[0]):
+            for j in range(corr.shape[1]):
+                if i == j: continue
+                else:
+                    if mean2[i] > mean2[j] and corr[i, j] > 0:
+                        # Correlation matrix
+                        claim[i, j] += corr[i, j]
+                        # autocorrelation
+                        if corr[i, i] < 0:
+                            claim[i, j] += abs(corr[i, i])
+                        if corr[j, j] < 0:
+                            claim[i, j] += abs(corr[j, j])
+
+        # calculate transfer
+        transfer = claim * 0.
+        for i in range(corr.shape[0]):
+            total_claim = sum(claim[i, :])
+            if total_claim != 0:
+                transfer[i, :] = b[i] * safe_div(claim[i, :], total_claim)
+
+        b += np.sum(transfer, axis=0) - np.sum(transfer, axis=1)
+
+        return np.append(simplex_proj(b), [0.0])
+
+    def set_params(self, **kwargs):
+        self.window = int(kwargs['window'])
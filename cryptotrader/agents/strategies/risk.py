@@ -0,0 +1,110 @@
+"""
+Risk optimization strategies
+"""
+from ...utils import *
+
+from cryptotrader.models import risk
+from .base import APrioriAgent
+
+# Solver and indicator backends load on first use
+optimize = lazy_import('scipy.optimize')
+
+
+class ERI(APrioriAgent):
+    """
+    This algorithm uses Extreme Risk Index to optimize a constant rebalance portfolio
+    References:
+        Extreme Risk Index:
+        https://arxiv.org/pdf/1505.04045.pdf
+    """
+    def __repr__(self):
+        return "Extreme Risk Index"
+
+    def __init__(self, window=300, k=0.1, mpc=0.3, beta=0.999, fiat="BTC", name='ERI'):
+        super().__init__(fiat=fiat, name=name)
+        self.window = window - 1
+        self.k = k
+        self.mpc = mpc
+        self.beta = beta
+
+        # Extreme risk index
+        self.cons = [
+            {'type': 'eq', 'fun': lambda w: w.sum() - 1}, # Simplex region
+            {'type': 'ineq', 'fun': lambda w: w}, # Positive bound
+            {'type': 'ineq', 'fun': lambda w: self.mpc - np.linalg.norm(w, ord=np.inf)}
+            # Maximum position concentration constraint
+        ]
+
+    def predict(self, obs):
+        """
+        Performs prediction given environment observation
+        :param obs: pandas DataFrame: Environment observation
+        """
+        prices = obs.xs('open', level=1, axis=1)
+
+        log_returns = np.hstack([prices.rolling(2).apply(
+            lambda x: np.log(safe_div(x[-1], x[-2]))).dropna().values, np.zeros((self.window, 1))])
+
+        return log_returns
+
+    # Pareto Extreme Risk Index
+    @staticmethod
+    def estimate_alpha(R):
+        return safe_div((R.shape[0] - 1), np.log(safe_div(R[:-1], R[-1])).sum())
+
+    @staticmethod
+    def estimate_gamma(alpha, Z, w):
+        return (1 / (Z.shape[0] - 1)) * np.power(np.clip(w * Z[:-1].T, 0.0, np.inf), alpha).sum()
+
+    def loss(self, w, alpha, Z, b):
+        return self.estimate_gamma(alpha, Z, w) + np.linalg.norm(b - w) ** 2
+
+    def update(self, b, x):
+        last_x = x[-1, :]
+
+        R, Z = risk.polar_returns(-x, self.k)
+        alpha = self.estimate_alpha(R)
+
+        self.r_hat = self.beta * self.r_hat + (1 - self.beta) * last_x
+
+        cons = self.cons + [{'type': 'eq', 'fun': lambda w:
+            np.dot(w, self.r_hat) - np.clip(0.001, 0.0, self.r_hat.max() / np.sqrt(2))}]
+
+        b = optimize.minimize(
+            self.loss,
+            b,
+            args=(alpha, Z, b),
+            constraints=cons,
+            options={'maxiter': 3333},
+            tol=1e-7,
+            bounds=tuple((0,1) for _ in range(b.shape[0]))
+        )
+
+        # Log variables
+        self.log['r_hat'] = "%.4f, %.4f, %.4f" % (self.r_hat.min(), self.r_hat.mean(), self.r_hat.max())
+        self.log['alpha'] = "%.2f" % alpha
+        self.log['gamma'] = "%.8f" % b['fun']
+        self.log['CC'] = "%.2f" % np.power(b['x'], 2).sum() ** -1
+        self.log['nit'] = "%d" % b['nit']
+        self.log['k'] = "%.2f" % self.k
+        self.log['mpc'] = "%.2f" % self.mpc
+        self.log['beta'] = "%.4f" % self.beta
+
+        return b['x'] # Truncate small errors
+
+    def rebalance(self, obs):
+        """
+        Performs portfolio rebalance within environment
+        :param obs: pandas DataFrame: Environment observation
+        :return: numpy array: Portfolio vector
+        """
+        if not self.step:
+            n_pairs = obs.columns.levels[0].shape[0]
+            action = np.ones(n_pairs)
+            action[-1] = 0
+            self.crp = self.b = array_normalize(action)
+            self.r_hat = np.zeros(n_pairs)
+            return self.crp
+
+        self.b = self.update(self.b, self.predict(obs))
+        return self.b
@@ -21,7 +21,8 @@ from ..utils import *
 from rl.util import *
 from rl.agents import DDPGAgent
 from rl.memory import SequentialMemory
-from rl.random import OrnsteinUhlenbeckProcess
+from .replay import ReplayStore
+from ..random_process import OrnsteinUhlenbeckProcess, BlockNoise
 from rl.callbacks import TestLogger, TrainEpisodeLogger, TrainIntervalLogger, Visualizer, CallbackList
 
 from keras.models import Model
@@ -688,6 +689,9 @@ class ArenaDDPGAgent(DDPGAgent):
                                                                                                       ))
 
     def save_memory_to_db(self, env, name):
+        if isinstance(self.memory, ReplayStore):
+            # Replay stores checkpoint to local memory mapped files
+            return self.memory.save(self.memory.path or './' + name + '_memory')
         try:
             env.logger.info(ArenaDDPGAgent.save_to_db, "Trying to save memory to database.")
 
@@ -705,6 +709,11 @@ class ArenaDDPGAgent(DDPGAgent):
             env.logger.error(ArenaDDPGAgent.save_to_db, env.parse_error(e))
 
     def load_memory_from_db(self, env, number=-1):
+        if isinstance(self.memory, ReplayStore):
+            path = self.memory.path or './' + self.name + '_memory'
+            self.memory = ReplayStore.load(path, self.memory.prices)
+            self.memory.env = env
+            return
         try:
             col_names = env.db.collection_names()
 
@@ -982,7 +991,9 @@ class ConvWorm(ArenaDDPGAgent):
         self.critic = Model(inputs=[action_input, observation_input], outputs=critic_out)
 
         self.memory = SequentialMemory(limit=10000, window_length=memory_len)
-        random_process = OrnsteinUhlenbeckProcess(size=self.env.action_space.shape[0], theta=theta, mu=mu, sigma=sigma)
+        # Exploration noise is drawn in blocks, reset on episode ends
+        random_process = BlockNoise(OrnsteinUhlenbeckProcess(size=self.env.action_space.shape[0], theta=theta, mu=mu,
+                                                             sigma=sigma))
         super().__init__(nb_actions=self.env.action_space.shape[0], actor=self.actor, batch_size=batch_size,
                                critic=self.critic, critic_action_input=action_input, memory=self.memory,
                                nb_steps_warmup_critic=nb_steps_warmup_critic,
@@ -1022,6 +1033,7 @@ class EIIE(ArenaDDPGAgent):
                  target_model_update=1e-2,
                  random_process=None,
                  mem_size=10000,
+                 memory=None,
                  name=None):
 
         self.env = env
@@ -1100,7 +1112,10 @@ class EIIE(ArenaDDPGAgent):
         self.actor = Model(inputs=observation_input, outputs=actor_out)
         self.critic = Model(inputs=[observation_input, action_input], outputs=critic_out)
 
-        self.memory = SequentialMemory(limit=mem_size, window_length=1)
+        # ReplayStore keeps one price tensor and per step indexes instead of whole observations
+        if memory is None:
+            memory = SequentialMemory(limit=mem_size, window_length=1)
+        self.memory = memory
         super().__init__(nb_actions=self.env.action_space.shape[0],
                          actor=self.actor,
                          critic=self.critic,
@@ -0,0 +1,215 @@
+"""
+Walk forward optimization of apriori strategies
+
+The data feed is split in train and test folds over time. Each fold optimizes the strategy on its
+training span with APrioriAgent.fit and trades the following test span with the parameters found,
+the test spans are stitched in one out of sample equity curve.
+Fold environments are shallow copies of the given environment restricted with set_window, they all
+read the same data feed, no price data is copied.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy, deepcopy
+
+from ..seeding import child_seed
+from ..utils import *
+from . import apriori
+
+import pandas as pd
+
+# train and test are (first, last) observation data indexes
+Fold = namedtuple('Fold', 'number, train, test')
+
+
+def make_folds(start, end, train_size, test_size, step=None, anchored=False):
+    """
+    Split a data span in consecutive train and test folds
+    :param start: int: First observation index
+    :param end: int: Last observation index
+    :param train_size: int: Training steps per fold
+    :param test_size: int: Test steps per fold
+    :param step: int: Steps between folds, defaults to test_size
+    :param anchored: bool: Training spans all start at start
+    :return: list: Fold tuples
+    """
+    step = step or test_size
+    assert step >= test_size, "Test folds can't overlap."
+
+    folds = []
+    first = start
+    while first + train_size + test_size <= end:
+        split = first + train_size
+        folds.append(Fold(len(folds), (start if anchored else first, split), (split, split + test_size)))
+        first += step
+
+    return folds
+
+
+def narrow_space(search_space, params, shrink):
+    """
+    Search space centered on known parameters
+    :param search_space: dict: optunity search space
+    :param params: dict: Parameters to center on, None values are ignored
+    :param shrink: float: Fraction of the original ranges to keep
+    :return: dict: New search space, ranges stay inside the original ones
+    """
+    space = {}
+    for key, value in search_space.items():
+        if isinstance(value, dict):
+            space[key] = {branch: narrow_space(sub, params, shrink) if isinstance(sub, dict) else sub
+                          for branch, sub in value.items()}
+        elif isinstance(value, (list, tuple)) and len(value) == 2 and params.get(key) is not None:
+            low, high = value
+            width = (high - low) * shrink / 2
+            center = min(max(params[key], low), high)
+            bounds = [max(low, center - width), min(high, center + width)]
+            if isinstance(low, int) and isinstance(high, int):
+                bounds = [int(np.floor(bounds[0])), int(np.ceil(bounds[1]))]
+            space[key] = bounds
+        else:
+            space[key] = value
+
+    return space
+
+
+class WalkForward(object):
+    """
+    Walk forward optimization engine.
+    With warm start every fold searches around the parameters of the previous one, so training runs
+    in order and test folds run in parallel with the next trainings. Without it folds are independent
+    and run in parallel end to end.
+    """
+    def __init__(self, agent, env, train_size, test_size, step=None, anchored=False, warm_start=True,
+                 shrink=0.5, max_workers=1):
+        """
+        :param agent: APrioriAgent: Strategy template, each fold runs a copy of it
+        :param env: BacktestEnvironment: Environment holding the data feed
+        :param train_size: int: Training steps per fold
+        :param test_size: int: Test steps per fold
+        :param step: int: Steps between folds, defaults to test_size
+        :param anchored: bool: Grow the training span from the data start instead of rolling it
+        :param warm_start: bool: Start each fold from the previous fold best parameters
+        :param shrink: float: Fraction of the search space ranges kept around warm start parameters
+        :param max_workers: int: Folds run at once
+        """
+        self.agent = agent
+        self.env = env
+        self.warm_start = warm_start
+        self.shrink = shrink
+        self.max_workers = max_workers
+
+        if not env.initialized:
+            env.setup()
+        start, end = env.episode_bounds()
+        self.folds = make_folds(start, end, train_size, test_size, step, anchored)
+        if not self.folds:
+            raise ValueError("Not enough data for one fold of %d training and %d test steps." %
+                             (train_size, test_size))
+
+    def fold_env(self, window, *keys):
+        """
+        Environment restricted to a fold span, sharing the data feed.
+        When the template env is seeded each fold env gets its own child stream
+        :param window: tuple: (first, last) observation indexes
+        :param keys: Child stream name
+        :return: BacktestEnvironment
+        """
+        env = copy(self.env)
+        env.set_window(*window)
+        env.training = False
+        if self.env.seed_value is not None:
+            env.seed(child_seed(self.env.seed_value, 'fold', *keys))
+        return env
+
+    def train(self, fold, params, nb_steps, batch_size, search_space, **kwargs):
+        """
+        Optimize a copy of the agent on the fold training span
+        :param fold: Fold: Fold to train on
+        :param params: dict: Warm start parameters, None for a cold start
+        :return: dict: Best parameters found
+        """
+        if not search_space:
+            return params or {}
+
+        agent = deepcopy(self.agent)
+        if params:
+            agent.set_params(**params)
+            search_space = narrow_space(search_space, params, self.shrink)
+
+        opt_params, _ = agent.fit(self.fold_env(fold.train, fold.number, 'train'), nb_steps, batch_size, search_space, **kwargs)
+        return opt_params
+
+    def test(self, fold, params):
+        """
+        Trade the fold test span with a fresh copy of the agent
+        :param fold: Fold: Fold to test on
+        :param params: dict: Agent parameters
+        :return: pandas Series: Portfolio value
+        """
+        agent = deepcopy(self.agent)
+        if params:
+            agent.set_params(**params)
+
+        env = self.fold_env(fold.test, fold.number, 'test')
+        agent.test(env, nb_episodes=1)
+        return env.portfolio_df['portval'].dropna().astype(np.float64)
+
+    def run_fold(self, fold, nb_steps, batch_size, search_space, **kwargs):
+        params = self.train(fold, None, nb_steps, batch_size, search_space, **kwargs)
+        return params, self.test(fold, params)
+
+    def run(self, nb_steps, batch_size, search_space=None, **kwargs):
+        """
+        Run every fold
+        :param nb_steps: int: Optimization evals per fold
+        :param batch_size: int: Episodes per optimization eval
+        :param search_space: dict: optunity search space, defaults to the strategy registry one
+        :param kwargs: APrioriAgent.fit keyword arguments
+        :return: tuple: Stitched out of sample equity curve starting at 1, pandas DataFrame fold report
+        """
+        if search_space is None:
+            search_space = apriori.spec(self.agent.__class__.__name__).search_space
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                if self.warm_start:
+                    params = None
+                    futures = []
+                    for fold in self.folds:
+                        params = self.train(fold, params, nb_steps, batch_size, search_space, **kwargs)
+                        futures.append((params, pool.submit(self.test, fold, params)))
+                    results = [(params, future.result()) for params, future in futures]
+                else:
+                    futures = [pool.submit(self.run_fold, fold, nb_steps, batch_size, search_space, **kwargs)
+                               for fold in self.folds]
+                    results = [future.result() for future in futures]
+
+        except Exception as e:
+            Logger.error(WalkForward.run, self.env.parse_error(e))
+            raise e
+
+        return self.stitch([curve for _, curve in results]), self.make_report(results)
+
+    @staticmethod
+    def stitch(curves):
+        """
+        Chain test fold portfolio values
+        :param curves: list: pandas Series of portfolio values, in fold order
+        :return: pandas Series: Equity curve starting at 1
+        """
+        pieces = []
+        level = 1.
+        for curve in curves:
+            curve = curve / curve.iloc[0] * level
+            pieces.append(curve if not pieces else curve.iloc[1:])
+            level = curve.iloc[-1]
+
+        equity = pd.concat(pieces)
+        return equity[~equity.index.duplicated(keep='last')]
+
+    def make_report(self, results):
+        return pd.DataFrame([{'train_start': fold.train[0], 'train_end': fold.train[1],
+                              'test_start': fold.test[0], 'test_end': fold.test[1],
+                              'params': params, 'test_return': curve.iloc[-1] / curve.iloc[0] - 1}
+                             for fold, (params, curve) in zip(self.folds, results)]).set_index(
+            pd.Index([fold.number for fold in self.folds], name='fold'))
@@ -76,11 +76,15 @@ class Agent(object):
         raise NotImplementedError()
 
     def test(self, env, nb_episodes=1, action_repetition=1, callbacks=None, visualize=False, start_step=0,
-             nb_max_episode_steps=None, nb_max_start_steps=0, start_step_policy=None, noise_abs=0.0, verbose=False):
+             nb_max_episode_steps=None, nb_max_start_steps=0, start_step_policy=None, noise_abs=0.0, verbose=False,
+             profiler=None):
         """
         Test agent on environment
+        :param profiler: StepProfiler instance: Time env and agent phases, summary at each episode end
         """
         self.test_rewards = []
+        if profiler is not None:
+            profiler.attach(env, self)
         try:
             for t in range(nb_episodes):
                 # Get env params
@@ -109,9 +113,10 @@ class Agent(object):
                 episode_reward = 0.0
                 while True:
                     try:
-                        # Data augmentation
+                        # Data augmentation, from the env random stream when it has one
                         if noise_abs:
-                            obs = obs.apply(lambda x: x + np.random.random(x.shape) * noise_abs * x, raw=True)
+                            rng = getattr(env, 'np_random', np.random)
+                            obs = obs.apply(lambda x: x + rng.random_sample(x.shape) * noise_abs * x, raw=True)
 
                         # Take actions
                         action = self.rebalance(obs)
@@ -151,6 +156,8 @@ class Agent(object):
 
                         if status['OOD'] or self.step == nb_max_episode_steps:
                             self.test_rewards.append(episode_reward)
+                            if profiler is not None:
+                                profiler.end_episode()
                             if verbose:
                                 print("\nReward mean: {:.08f}, Reward std: {:.08f}".format(np.mean(self.test_rewards),
                                                                                            np.std(self.test_rewards)))
@@ -181,6 +188,36 @@ class Agent(object):
             else:
                 return episode_reward / self.step, 0.0
 
+        finally:
+            if profiler is not None:
+                profiler.detach()
+
+    def test_steps(self, env, nb_steps, obs=None, start_step=0):
+        """
+        Run part of a test episode. Pass the returned observation back to resume it
+        :param env: BacktestEnvironment instance
+        :param nb_steps: int: Max steps to run
+        :param obs: pandas DataFrame: Last observation of a running episode, None starts a new one
+        :param start_step: int: Agent step counter on a new episode
+        :return: tuple: Last observation, reward sum of the steps run, episode done flag
+        """
+        if obs is None:
+            self.fiat = env._fiat
+            self.init = False
+            env.reset_status()
+            obs = env.reset()
+            self.step = start_step
+
+        reward = 0.0
+        for _ in range(nb_steps):
+            obs, r, done, status = env.step(self.rebalance(obs))
+            reward += r
+            self.step += 1
+            if done or status['OOD']:
+                return obs, reward, True
+
+        return obs, reward, False
+
     # Trade methods
     def trade(self, env, start_step=0, act_now=False, timeout=None, verbose=False, render=False, email=False, save_dir="./"):
         """
@@ -1,12 +1,17 @@
 from functools import wraps as _wraps
 from itertools import chain as _chain
+import asyncio
+import random
 import json
+from collections import deque
 from .utils import convert_to, Logger, dec_con
 from decimal import Decimal
+import numpy as np
 import pandas as pd
-from time import sleep
+from time import sleep, time
 from datetime import datetime, timezone, timedelta
 import zmq
+import zmq.asyncio
 import threading
 from multiprocessing import Process
 from .exceptions import *
@@ -16,6 +21,8 @@ debug = True
 
 # Base classes
 class ExchangeConnection(object):
+    # Whether methods can be called from several threads at once
+    threadsafe = False
 
     # Feed methods
     @property
@@ -50,17 +57,150 @@ class ExchangeConnection(object):
         return df.rename(columns={'quoteVolume': 'volume', 'volume': 'quoteVolume'})
 
 ## Feed daemon
+# Response cache
+class _Flight(object):
+    """
+    Upstream call shared by concurrent identical requests
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResponseCache(object):
+    """
+    Thread safe TTL cache with single flight request coalescing.
+    Concurrent misses on the same key wait on the first caller's upstream call instead of repeating it.
+    """
+    def __init__(self, max_size=4096, clock=time):
+        """
+        :param max_size: int: max number of cached entries
+        :param clock: callable: time source, in seconds
+        """
+        self.max_size = max_size
+        self.clock = clock
+        self._data = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, fetch, ttl):
+        """
+        Return cached value for key or fetch it
+        :param key: hashable: request key
+        :param fetch: callable: upstream call, invoked at most once per key at a time
+        :param ttl: float: seconds to keep the fetched value. Zero disables caching but not coalescing
+        :return: fetched or cached value
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.hits += 1
+                return entry[1]
+
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            if ttl > 0:
+                self._set(key, flight.result, ttl)
+            return flight.result
+
+        except Exception as e:
+            flight.error = e
+            raise e
+
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            if len(self._data) >= self.max_size:
+                self.purge()
+            self._data[key] = (self.clock() + ttl, value)
+
+    def purge(self):
+        """
+        Drop expired entries. If the cache is still full, drop the ones closest to expiring.
+        Must be called with the lock held.
+        """
+        now = self.clock()
+        for key in [k for k, v in self._data.items() if v[0] <= now]:
+            del self._data[key]
+
+        if len(self._data) >= self.max_size:
+            by_expiry = sorted(self._data, key=lambda k: self._data[k][0])
+            for key in by_expiry[:len(self._data) - self.max_size + 1]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        Cache statistics
+        :return: dict: hits, misses, coalesced requests, hit rate and size
+        """
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': (self.hits + self.coalesced) / total if total else 0.0,
+                'size': len(self._data)
+            }
+
+
 # Server
 class FeedDaemon(Process):
     """
     Data Feed server
     """
-    def __init__(self, api={}, addr='ipc:///tmp/feed.ipc', n_workers=8, email={}):
+    # Cache time to live in seconds per command. Chart data lives until the next candle opens,
+    # replies holding the candle in progress live as long as a ticker.
+    cache_ttl = {
+        'returnTicker': 0.5,
+        'returnOrderBook': 0.5,
+        'returnCurrencies': 60,
+        'returnChartData': 'period'
+    }
+
+    def __init__(self, api={}, addr='ipc:///tmp/feed.ipc', n_workers=8, email={}, cache_ttl=None,
+                 pub_addr=None, pairs={}, period=300, pub_delay=2):
         """
 
         :param api: dict: exchange name: api instance
         :param addr: str: client side address
         :param n_workers: int: n threads
+        :param cache_ttl: dict: command: ttl seconds, overrides FeedDaemon.cache_ttl. Uncached commands are never coalesced
+        :param pub_addr: str: market data broadcast address. None disables broadcasting
+        :param pairs: dict: exchange name: list of pairs to broadcast
+        :param period: int: broadcast candle period in seconds
+        :param pub_delay: float: seconds to wait after candle close before broadcasting it
         """
         super(FeedDaemon, self).__init__()
         self.api = api
@@ -69,6 +209,16 @@ class FeedDaemon(Process):
         self.n_workers = n_workers
         self.addr = addr
 
+        self.cache_ttl = dict(FeedDaemon.cache_ttl)
+        if cache_ttl:
+            self.cache_ttl.update(cache_ttl)
+        self.cache = ResponseCache()
+
+        self.pub_addr = pub_addr
+        self.pairs = pairs
+        self.period = period
+        self.pub_delay = pub_delay
+
         self.MINUTE, self.HOUR, self.DAY = 60, 60 * 60, 60 * 60 * 24
         self.WEEK, self.MONTH = self.DAY * 7, self.DAY * 30
         self.YEAR = self.DAY * 365
@@ -112,6 +262,9 @@ class FeedDaemon(Process):
                     )
                 return call
 
+            if req[1] == 'returnOrderBook':
+                return req[0], req[1], {'currencyPair': str(req[2]).upper(), 'depth': str(req[3])}
+
             if req[1] == 'returnTradeHistory':
                 args = {'currencyPair': str(req[2]).upper()}
                 if req[3] != 'None':
@@ -149,6 +302,46 @@ class FeedDaemon(Process):
                 return req[0], req[1], args
 
 
+    def get_ttl(self, call):
+        """
+        Cache time to live for a parsed call
+        :param call: tuple: handle_req output
+        :return: float: seconds, None if the call must not be cached
+        """
+        ttl = self.cache_ttl.get(call[1])
+        if ttl == 'period':
+            period = int(call[2]['period'])
+            now = datetime.utcnow().timestamp()
+            if 'end' in call[2] and float(call[2]['end']) >= now - now % period:
+                return self.cache_ttl.get('returnTicker')
+            return period - now % period
+        return ttl
+
+    @staticmethod
+    def cache_key(call):
+        """
+        Cache key of a parsed call. Chart requests are keyed on the candles they return,
+        start and end aligned to the period
+        :param call: tuple: handle_req output
+        :return: tuple: hashable key
+        """
+        if len(call) < 3:
+            return call
+        if call[1] == 'returnChartData':
+            args = call[2]
+            period = int(args['period'])
+            return (call[0], call[1], args['currencyPair'], period,
+                    int(np.ceil(float(args['start']) / period)) * period,
+                    int(float(args['end']) // period) * period)
+        return call[0], call[1], tuple(sorted(call[2].items()))
+
+    def fetch(self, call):
+        """
+        Forward a parsed call to the exchange api
+        """
+        self.api[call[0]].nonce = self.nonce
+        return self.api[call[0]].__call__(*call[1:])
+
     def worker(self):
         # Init socket
         sock = self.context.socket(zmq.REP)
@@ -167,8 +360,16 @@ class FeedDaemon(Process):
                 # Send request to api
                 if call:
                     try:
-                        self.api[call[0]].nonce = self.nonce
-                        rep = self.api[call[0]].__call__(*call[1:])
+                        if call[1] == 'returnCacheStats':
+                            rep = self.cache.stats()
+                        else:
+                            ttl = self.get_ttl(call)
+                            if ttl is None:
+                                rep = self.fetch(call)
+                            else:
+                                # Identical requests share one upstream call
+                                rep = self.cache.get(self.cache_key(call), lambda: self.fetch(call), ttl)
+
                     except ExchangeError as e:
                         rep = e.__str__()
                         Logger.error(FeedDaemon.worker, "Exchange error: %s\n%s" % (req, rep))
@@ -190,6 +391,60 @@ class FeedDaemon(Process):
                 sock.close()
                 raise e
 
+    def publisher(self):
+        """
+        Broadcast ticker snapshots, newly closed candles and the candles in progress once per period.
+        Messages are two frames: topic "exchange ticker", "exchange candle pair" or "exchange open pair",
+        and json payload.
+        """
+        sock = self.context.socket(zmq.PUB)
+        sock.bind(self.pub_addr)
+        last_date = {}
+
+        while True:
+            try:
+                # Wait for the next candle to close
+                now = datetime.utcnow().timestamp()
+                sleep(self.period - now % self.period + self.pub_delay)
+                now = datetime.utcnow().timestamp()
+
+                for exchange, pairs in self.pairs.items():
+                    call = (exchange, 'returnTicker')
+                    ticker = self.cache.get(self.cache_key(call), lambda: self.fetch(call), self.get_ttl(call))
+                    sock.send_multipart([("%s ticker" % exchange).encode(), json.dumps(ticker).encode()])
+
+                    for pair in pairs:
+                        start = last_date.get((exchange, pair), now - 2 * self.period)
+                        call = (exchange, 'returnChartData', {
+                            'currencyPair': pair,
+                            'period': str(self.period),
+                            'start': str(start),
+                            'end': str(now)
+                            })
+                        chart = self.cache.get(self.cache_key(call), lambda: self.fetch(call), self.get_ttl(call))
+                        if not isinstance(chart, list):
+                            Logger.error(FeedDaemon.publisher, "Bad returnChartData reply: %s" % str(chart))
+                            continue
+
+                        # Broadcast closed candles not sent yet
+                        for candle in chart:
+                            if candle['date'] + self.period <= now and \
+                                    candle['date'] > last_date.get((exchange, pair), 0):
+                                sock.send_multipart([("%s candle %s" % (exchange, pair)).encode(),
+                                                     json.dumps(candle).encode()])
+                                last_date[(exchange, pair)] = candle['date']
+                            elif candle['date'] + self.period > now:
+                                sock.send_multipart([("%s open %s" % (exchange, pair)).encode(),
+                                                     json.dumps(candle).encode()])
+
+            except (ExchangeError, DataFeedException) as e:
+                Logger.error(FeedDaemon.publisher, e.__str__())
+
+            except Exception as e:
+                send_email(self.email, "FeedDaemon Error", e)
+                sock.close()
+                raise e
+
     def run(self):
         try:
             Logger.info(FeedDaemon, "Starting Feed Daemon...")
@@ -207,6 +462,12 @@ class FeedDaemon(Process):
                 thread = threading.Thread(target=self.worker, args=())
                 thread.start()
 
+            # Launch market data broadcast
+            if self.pub_addr:
+                thread = threading.Thread(target=self.publisher, args=(), daemon=True)
+                thread.start()
+                Logger.info(FeedDaemon.run, "Broadcasting market data on %s" % self.pub_addr)
+
             Logger.info(FeedDaemon.run, "Feed Daemon running. Serving on %s" % self.addr)
 
             zmq.proxy(clients, workers)
@@ -223,6 +484,7 @@ class DataFeed(ExchangeConnection):
     """
     # TODO WRITE TESTS
     retryDelays = [2 ** i for i in range(8)]
+    threadsafe = True
 
     def __init__(self, exchange='', addr='ipc:///tmp/feed.ipc', timeout=30):
         """
@@ -241,14 +503,77 @@ class DataFeed(ExchangeConnection):
         self.exchange = exchange
         self.timeout = timeout * 1000
 
-        self.sock = self.context.socket(zmq.REQ)
-        self.sock.connect(addr)
+        # REQ sockets are not thread safe, so each thread gets its own
+        self._local = threading.local()
+        # thread id: REQ socket, so sockets of finished threads can be closed
+        self._socks = {}
 
-        self.poll = zmq.Poller()
-        self.poll.register(self.sock, zmq.POLLIN)
+        # Batch requests run on one AsyncDataFeed and event loop thread, started on first use
+        self._batch_lock = threading.Lock()
+        self._batch_loop = None
+        self._batch_thread = None
+        self._batch_feed = None
 
     def __del__(self):
-        self.sock.close()
+        if hasattr(self._local, 'sock'):
+            self._local.sock.close()
+        self.close_batch()
+
+    def batch_feed(self):
+        """
+        Start the batch event loop thread and its AsyncDataFeed if needed
+        :return: tuple: event loop, AsyncDataFeed
+        """
+        with self._batch_lock:
+            if self._batch_loop is None:
+                self._batch_loop = asyncio.new_event_loop()
+                self._batch_feed = AsyncDataFeed(self.exchange, self.addr, self.timeout / 1000)
+                self._batch_thread = threading.Thread(target=self._batch_loop.run_forever, daemon=True)
+                self._batch_thread.start()
+            return self._batch_loop, self._batch_feed
+
+    def close_batch(self):
+        """ Close the batch AsyncDataFeed and stop its event loop thread """
+        with self._batch_lock:
+            loop, self._batch_loop = getattr(self, '_batch_loop', None), None
+            if loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._batch_feed.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            self._batch_thread.join()
+            loop.close()
+            self._batch_thread = self._batch_feed = None
+
+    @property
+    def sock(self):
+        """ Calling thread REQ socket, connected on first use """
+        if not hasattr(self._local, 'sock'):
+            self.sock = self.context.socket(zmq.REQ)
+            self._local.sock.connect(self.addr)
+            self._local.poll = zmq.Poller()
+            self._local.poll.register(self._local.sock, zmq.POLLIN)
+        return self._local.sock
+
+    @sock.setter
+    def sock(self, sock):
+        self._local.sock = sock
+        self._socks[threading.get_ident()] = sock
+
+    def close_thread_socks(self, threads):
+        """
+        Close the REQ sockets of threads done with this feed
+        :param threads: iterable: Thread ids
+        """
+        for thread in threads:
+            sock = self._socks.pop(thread, None)
+            if sock is not None:
+                sock.close(linger=0)
+
+    @property
+    def poll(self):
+        if not hasattr(self._local, 'poll'):
+            self.sock
+        return self._local.poll
 
     # Retry decorator
     def retry(func):
@@ -414,6 +739,48 @@ class DataFeed(ExchangeConnection):
         except AssertionError:
             raise UnexpectedResponseException("Unexpected response from DataFeed.returnChartData")
 
+    @retry
+    def returnOrderBook(self, currencyPair='all', depth=20):
+        """
+        Return pair order book
+        :param currencyPair: str: Desired pair str
+        :param depth: int: Number of levels per side
+        :return: dict: asks and bids lists of [price, amount]
+        """
+        try:
+            rep = self.get_response("returnOrderBook %s %s" % (str(currencyPair), str(depth)))
+            assert isinstance(rep, dict)
+            return rep
+
+        except AssertionError:
+            raise UnexpectedResponseException("Unexpected response from DataFeed.returnOrderBook")
+
+    @retry
+    def returnCacheStats(self):
+        """
+        Return FeedDaemon response cache statistics
+        :return: dict: hits, misses, coalesced, hit_rate and size
+        """
+        try:
+            rep = self.get_response('returnCacheStats')
+            assert isinstance(rep, dict)
+            return rep
+
+        except AssertionError:
+            raise UnexpectedResponseException("Unexpected response from DataFeed.returnCacheStats")
+
+    def returnChartDataBatch(self, pairs, period, start=None, end=None):
+        """
+        Return OHLC data for several pairs, requested concurrently
+        :param pairs: list: Pair symbols
+        :param period: int: Candle period
+        :param start: str: UNIX timestamp to start from
+        :param end:  str: UNIX timestamp to end returned data
+        :return: dict: pair: records
+        """
+        loop, feed = self.batch_feed()
+        return asyncio.run_coroutine_threadsafe(feed.gatherChartData(pairs, period, start, end), loop).result()
+
     @retry
     def returnTradeHistory(self, currencyPair='all', start=None, end=None):
         try:
@@ -504,6 +871,387 @@ class DataFeed(ExchangeConnection):
             raise UnexpectedResponseException("Unexpected response from DataFeed.buy")
 
 
+class AsyncDataFeed(ExchangeConnection):
+    """
+    Asyncio FeedDaemon client. Requests are pipelined over a single DEALER socket and matched to
+    their replies by request id, so many requests can be in flight at once.
+    Use as an async context manager or call connect and close explicitly.
+    """
+    retryDelays = [2 ** i for i in range(8)]
+
+    def __init__(self, exchange='', addr='ipc:///tmp/feed.ipc', timeout=30, jitter=0.5):
+        """
+
+        :param exchange: str: FeedDaemon exchange to query
+        :param addr: str: Client socked address
+        :param timeout: int: Request timeout in seconds
+        :param jitter: float: Relative retry delay jitter, in [0, 1]
+        """
+        super(AsyncDataFeed, self).__init__()
+        self.addr = addr
+        self.exchange = exchange
+        self.timeout = timeout
+        self.jitter = jitter
+
+        self.context = zmq.asyncio.Context.instance()
+        self.sock = None
+        self._pending = {}
+        self._reader = None
+        self._req_id = 0
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def connect(self):
+        self.sock = self.context.socket(zmq.DEALER)
+        self.sock.connect(self.addr)
+        self._reader = asyncio.ensure_future(self._read_replies())
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self.sock is not None:
+            self.sock.close(linger=0)
+            self.sock = None
+        for fut in self._pending.values():
+            fut.cancel()
+        self._pending.clear()
+
+    async def _read_replies(self):
+        while True:
+            # Envelope is [request id, delimiter, reply]
+            frames = await self.sock.recv_multipart()
+            fut = self._pending.pop(frames[0], None)
+            # Replies to timed out requests are dropped
+            if fut is not None and not fut.done():
+                fut.set_result(json.loads(frames[-1].decode()))
+
+    # Retry decorator
+    def retry(func):
+        """ Async retry decorator with jittered exponential backoff """
+
+        @_wraps(func)
+        async def retrying(self, *args, **kwargs):
+            problems = []
+            for delay in _chain(self.retryDelays, [None]):
+                try:
+                    # attempt call
+                    return await func(self, *args, **kwargs)
+
+                # we need to try again
+                except DataFeedException as problem:
+                    problems.append(problem)
+                    if delay is None:
+                        Logger.debug(AsyncDataFeed, problems)
+                        raise MaxRetriesException('retryDelays exhausted ' + str(problem))
+                    else:
+                        # Jitter spreads retries of concurrent requests apart
+                        delay *= 1 + self.jitter * (2 * random.random() - 1)
+                        Logger.debug(AsyncDataFeed, problem)
+                        Logger.error(AsyncDataFeed, "No reply... -- delaying for %.2fs" % delay)
+                        await asyncio.sleep(delay)
+
+        return retrying
+
+    async def get_response(self, req):
+        if self.sock is None:
+            await self.connect()
+
+        req = self.exchange + ' ' + req
+        self._req_id += 1
+        req_id = str(self._req_id).encode()
+
+        fut = asyncio.get_event_loop().create_future()
+        self._pending[req_id] = fut
+        try:
+            await self.sock.send_multipart([req_id, b'', req.encode()])
+            return await asyncio.wait_for(fut, self.timeout)
+
+        except asyncio.TimeoutError:
+            Logger.error(AsyncDataFeed.get_response, "%s request timeout." % req)
+            raise RequestTimeoutException("%s request timedout" % req)
+
+        finally:
+            self._pending.pop(req_id, None)
+
+    async def _checked(self, call, types, name):
+        rep = await self.get_response(call)
+        if not isinstance(rep, types):
+            raise UnexpectedResponseException("Unexpected response from AsyncDataFeed.%s" % name)
+        return rep
+
+    @retry
+    async def returnTicker(self):
+        return await self._checked('returnTicker', dict, 'returnTicker')
+
+    @retry
+    async def returnBalances(self):
+        return await self._checked('returnBalances', dict, 'returnBalances')
+
+    @retry
+    async def returnFeeInfo(self):
+        return await self._checked('returnFeeInfo', dict, 'returnFeeInfo')
+
+    @retry
+    async def returnCurrencies(self):
+        return await self._checked('returnCurrencies', dict, 'returnCurrencies')
+
+    @retry
+    async def returnChartData(self, currencyPair, period, start=None, end=None):
+        """
+        Return pair OHLC data
+        :param currencyPair: str: Desired pair str
+        :param period: int: Candle period. Must be in [300, 900, 1800, 7200, 14400, 86400]
+        :param start: str: UNIX timestamp to start from
+        :param end:  str: UNIX timestamp to end returned data
+        :return: list: List containing desired asset data in "records" format
+        """
+        call = "returnChartData %s %s %s %s" % (str(currencyPair), str(period), str(start), str(end))
+        rep = await self.get_response(call)
+
+        if 'Invalid currency pair.' in rep:
+            symbols = currencyPair.split('_')
+            call = "returnChartData %s %s %s %s" % (symbols[1] + '_' + symbols[0], str(period), str(start), str(end))
+            rep = json.loads(
+                self.pair_reciprocal(pd.DataFrame.from_records(await self.get_response(call))).to_json(
+                    orient='records'))
+
+        try:
+            assert isinstance(rep, list), "returnChartData reply is not list"
+            assert int(rep[-1]['date']), "Bad returnChartData reply data"
+            assert float(rep[-1]['open']), "Bad returnChartData reply data"
+            assert float(rep[-1]['close']), "Bad returnChartData reply data"
+            return rep
+
+        except AssertionError:
+            raise UnexpectedResponseException("Unexpected response from AsyncDataFeed.returnChartData")
+
+    async def gatherChartData(self, pairs, period, start=None, end=None):
+        """
+        Request OHLC data for several pairs concurrently
+        :param pairs: list: Pair symbols
+        :return: dict: pair: records
+        """
+        reps = await asyncio.gather(*[self.returnChartData(pair, period, start, end) for pair in pairs])
+        return dict(zip(pairs, reps))
+
+    @retry
+    async def returnTradeHistory(self, currencyPair='all', start=None, end=None):
+        call = "returnTradeHistory %s %s %s" % (str(currencyPair), str(start), str(end))
+        return await self._checked(call, dict, 'returnTradeHistory')
+
+    @retry
+    async def sell(self, currencyPair, rate, amount, orderType=False):
+        call = "sell %s %s %s %s" % (str(currencyPair), str(rate), str(amount), str(orderType))
+        return await self._checked(call, (str, dict), 'sell')
+
+    @retry
+    async def buy(self, currencyPair, rate, amount, orderType=False):
+        call = "buy %s %s %s %s" % (str(currencyPair), str(rate), str(amount), str(orderType))
+        return await self._checked(call, (str, dict), 'buy')
+
+
+class SubscriberDataFeed(DataFeed):
+    """
+    DataFeed that listens to FeedDaemon market data broadcast and keeps a local rolling window of
+    closed candles, the candle in progress and the last ticker. The candle in progress follows the
+    ticker broadcasts. Requests covered by the local window are served from memory, everything else
+    goes through the daemon as usual.
+    """
+    def __init__(self, exchange='', addr='ipc:///tmp/feed.ipc', sub_addr='ipc:///tmp/feed_pub.ipc',
+                 pairs=[], period=300, window=500, ticker_ttl=None, timeout=30):
+        """
+
+        :param exchange: str: FeedDaemon exchange to query
+        :param addr: str: Client socked address
+        :param sub_addr: str: FeedDaemon broadcast address
+        :param pairs: list: Pair symbols to keep in memory
+        :param period: int: Candle period in seconds, must match the daemon broadcast period
+        :param window: int: Number of candles to keep per pair
+        :param ticker_ttl: float: Max ticker and candle in progress age in seconds before falling back to a
+                           request. Defaults to period
+        :param timeout: int:
+        """
+        super(SubscriberDataFeed, self).__init__(exchange, addr, timeout)
+        self.sub_addr = sub_addr
+        self.pairs = pairs
+        self.period = period
+        self.window = window
+        self.ticker_ttl = ticker_ttl if ticker_ttl is not None else period
+
+        self.ticker = {}
+        self.ticker_time = 0
+        self.candles = {pair: deque(maxlen=window) for pair in pairs}
+        # pair: (candle in progress, last update time)
+        self.open_bars = {}
+        self._lock = threading.Lock()
+
+        self._running = threading.Event()
+        self._running.set()
+        self._listener = threading.Thread(target=self.listen, args=(), daemon=True)
+        self._listener.start()
+
+    def __del__(self):
+        self._running.clear()
+        super(SubscriberDataFeed, self).__del__()
+
+    def close(self):
+        """ Stop listening to the broadcast """
+        self._running.clear()
+        self._listener.join()
+
+    def listen(self):
+        sock = self.context.socket(zmq.SUB)
+        sock.connect(self.sub_addr)
+        sock.setsockopt_string(zmq.SUBSCRIBE, self.exchange + ' ')
+
+        try:
+            while self._running.is_set():
+                if not sock.poll(100):
+                    continue
+                topic, payload = sock.recv_multipart()
+                self.on_message(topic.decode().split(' '), json.loads(payload.decode()))
+        finally:
+            sock.close(linger=0)
+
+    def on_message(self, topic, data):
+        """
+        Update local market data
+        :param topic: list: [exchange, kind, pair]
+        :param data: dict: ticker or candle
+        """
+        with self._lock:
+            if topic[1] == 'ticker':
+                self.ticker = data
+                self.ticker_time = time()
+
+                # Candles in progress close at the last traded price
+                for pair, (bar, _) in self.open_bars.items():
+                    if pair in data:
+                        price = float(data[pair]['last'])
+                        bar.update(close=price, high=max(float(bar.get('high', price)), price),
+                                   low=min(float(bar.get('low', price)), price))
+                        self.open_bars[pair] = (bar, self.ticker_time)
+
+            elif topic[1] == 'candle' and topic[2] in self.candles:
+                candles = self.candles[topic[2]]
+                if not candles or data['date'] > candles[-1]['date']:
+                    candles.append(data)
+                if topic[2] in self.open_bars and self.open_bars[topic[2]][0]['date'] <= data['date']:
+                    del self.open_bars[topic[2]]
+
+            elif topic[1] == 'open' and topic[2] in self.candles:
+                self.open_bars[topic[2]] = (dict(data), time())
+
+    def fill_window(self, pair):
+        """
+        Load a full window of candles from the daemon
+        :param pair: str: Pair symbol
+        """
+        now = datetime.utcnow().timestamp()
+        rep = DataFeed.returnChartData(self, pair, self.period, start=now - self.window * self.period, end=None)
+
+        with self._lock:
+            candles = self.candles[pair]
+            closed = [c for c in rep if c['date'] + self.period <= now]
+            # Keep candles received from the broadcast meanwhile
+            if candles:
+                closed = [c for c in closed if c['date'] < candles[0]['date']] + list(candles)
+            candles.clear()
+            candles.extend(closed)
+
+    def open_bar(self, pair, date):
+        """
+        Candle in progress, if the broadcast one opened at date and is fresh
+        :return: dict: Candle copy or None
+        """
+        bar, updated = self.open_bars.get(pair, (None, 0))
+        if bar is None or bar['date'] != date or time() - updated >= self.ticker_ttl:
+            return None
+        return dict(bar)
+
+    def covers(self, pair, period, start, end):
+        """
+        The window holds closed candles. It covers a request when at most the bars after its last
+        candle, the one in progress included, are missing. The candle in progress comes from the
+        broadcast when fresh, anything else from the REQ path
+        """
+        candles = self.candles.get(pair)
+        if not candles or int(period) != self.period:
+            return False
+        if end in (None, 'None'):
+            end = datetime.utcnow().timestamp()
+        if start not in (None, 'None') and float(start) < candles[0]['date']:
+            return False
+        return candles[-1]['date'] >= float(end) - 2 * self.period
+
+    def returnTicker(self):
+        with self._lock:
+            if self.ticker and time() - self.ticker_time < self.ticker_ttl:
+                return self.ticker
+        return super(SubscriberDataFeed, self).returnTicker()
+
+    def returnChartData(self, currencyPair, period, start=None, end=None):
+        """
+        Return pair OHLC data from the local window when possible
+        :param currencyPair: str: Desired pair str
+        :param period: int: Candle period in seconds
+        :param start: str: UNIX timestamp to start from
+        :param end:  str: UNIX timestamp to end returned data
+        :return: list: List containing desired asset data in "records" format
+        """
+        if currencyPair in self.candles and not self.candles[currencyPair] and int(period) == self.period:
+            self.fill_window(currencyPair)
+
+        with self._lock:
+            covered = self.covers(currencyPair, period, start, end)
+            if covered:
+                first = float(start) if start not in (None, 'None') else 0
+                last = float(end) if end not in (None, 'None') else datetime.utcnow().timestamp()
+                rep = [c for c in self.candles[currencyPair] if first <= c['date'] <= last]
+                last_closed = self.candles[currencyPair][-1]['date']
+                bar = self.open_bar(currencyPair, last_closed + self.period)
+
+        if not covered:
+            return super(SubscriberDataFeed, self).returnChartData(currencyPair, period, start, end)
+
+        # Bars after the window: the one in progress from the broadcast, the rest as the REQ path returns them
+        if last >= last_closed + self.period:
+            if bar is not None and last < last_closed + 2 * self.period:
+                rep.append(bar)
+            else:
+                tail = super(SubscriberDataFeed, self).returnChartData(currencyPair, period, last_closed + self.period,
+                                                                       end)
+                rep += [c for c in tail if c['date'] > last_closed]
+
+        return rep
+
+    def returnChartDataBatch(self, pairs, period, start=None, end=None):
+        # Serve what the local window covers, request the rest concurrently
+        reps = {}
+        for pair in pairs:
+            if pair in self.candles and not self.candles[pair] and int(period) == self.period:
+                self.fill_window(pair)
+            with self._lock:
+                covered = self.covers(pair, period, start, end)
+            if covered:
+                reps[pair] = self.returnChartData(pair, period, start, end)
+
+        missing = [pair for pair in pairs if pair not in reps]
+        if missing:
+            reps.update(super(SubscriberDataFeed, self).returnChartDataBatch(missing, period, start, end))
+        return reps
+
+
 # Test datafeeds
 class BacktestDataFeed(ExchangeConnection):
     """
@@ -712,6 +1460,203 @@ class PaperTradingDataFeed(ExchangeConnection):
                 raise error
 
 
+class SimulatedExchange(ExchangeConnection):
+    """
+    Local matching engine stand-in with the Poloniex order surface.
+    Replays BacktestDataFeed candles as synthetic order books, so the live execution path can be run offline.
+
+    At cursor index i the market sits at the bar open. The book has 'levels' price levels per side, spread
+    around the mid price, each holding an even share of a fraction of the bar quote volume. Orders walk
+    the book up to their limit rate and consume liquidity until the cursor moves, so repeated orders in
+    one bar fill deeper and partially. Latency moves the fill mid price from open toward close.
+    """
+    def __init__(self, feed, balance=None, levels=20, spread=0.001, tick=0.0005, depth=0.1, latency=0.,
+                 min_total=0.0001, index=0):
+        """
+        :param feed: BacktestDataFeed: Feed with loaded candle data
+        :param balance: dict: Initial balance, symbol: amount. Defaults to the feed balance
+        :param levels: int: Book levels per side
+        :param spread: float: Relative bid ask spread
+        :param tick: float: Relative price step between levels
+        :param depth: float: Fraction of the bar quote volume resting on each book side
+        :param latency: float: Order latency in seconds
+        :param min_total: float: Min order total in fiat units
+        :param index: int: Initial cursor
+        """
+        super(SimulatedExchange, self).__init__()
+        self.feed = feed
+        self.pairs = list(feed.pairs)
+        self.period = feed.period
+        self.tax = feed.returnFeeInfo()
+        self.levels = levels
+        self.spread = spread
+        self.tick = tick
+        self.depth = depth
+        self.latency = latency
+        self.min_total = min_total
+
+        # Candle tensor, shape (n_pairs, data_length, 5): open, high, low, close, quote volume
+        self.dates = feed.ohlc_data[self.pairs[0]]['date'].values.astype(np.int64)
+        data = []
+        for pair in self.pairs:
+            df = feed.ohlc_data[pair]
+            ohlc = df[['open', 'high', 'low', 'close']].values.astype(np.float64)
+            if 'quoteVolume' in df:
+                volume = df['quoteVolume'].values.astype(np.float64)
+            else:
+                volume = df['volume'].values.astype(np.float64) / ohlc[:, 3]
+            data.append(np.hstack([ohlc, volume.reshape(-1, 1)]))
+        self.data = np.stack(data)
+        self.pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+
+        # Relative level offsets from mid, best first
+        self.offsets = spread / 2 + tick * np.arange(levels)
+
+        balance = balance if balance is not None else feed.returnBalances()
+        self._balance = {symbol: float(amount) for symbol, amount in balance.items()}
+        self._order_number = 0
+        self.index = index
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._index = int(value)
+        # Liquidity taken on each side in the current bar
+        self.consumed = np.zeros((len(self.pairs), 2, self.levels))
+
+    def advance(self, n=1):
+        """ Move the cursor n bars ahead """
+        self.index = self._index + n
+
+    @property
+    def timestamp(self):
+        return int(self.dates[self._index])
+
+    def mid_prices(self, latency=0.):
+        """
+        Mid price of every pair at the cursor
+        :param latency: float: seconds after bar open
+        :return: numpy array: shape (n_pairs,)
+        """
+        bar = self.data[:, self._index]
+        drift = min(latency / (self.period * 60), 1.)
+        return bar[:, 0] + (bar[:, 3] - bar[:, 0]) * drift
+
+    def book_arrays(self, pair, latency=0.):
+        """
+        Synthetic book of pair at the cursor, net of consumed liquidity
+        :return: tuple: asks prices, asks amounts, bids prices, bids amounts
+        """
+        i = self.pair_index[pair]
+        mid = self.mid_prices(latency)[i]
+        level_amount = self.depth * self.data[i, self._index, 4] / self.levels
+        # Quoted prices have 8 decimals, match against the same
+        asks = np.round(mid * (1 + self.offsets), 8)
+        bids = np.round(mid * (1 - self.offsets), 8)
+        ask_amounts = np.maximum(level_amount - self.consumed[i, 0], 0.)
+        bid_amounts = np.maximum(level_amount - self.consumed[i, 1], 0.)
+        return asks, ask_amounts, bids, bid_amounts
+
+    # Data methods
+    def returnBalances(self):
+        return {symbol: "%.8f" % amount for symbol, amount in self._balance.items()}
+
+    def returnFeeInfo(self):
+        return self.tax
+
+    def returnCurrencies(self):
+        # Offline feeds have no exchange api, the pairs symbols make the universe
+        if self.feed.tapi is None and not self.feed.load_dir:
+            return {symbol: {} for pair in self.pairs for symbol in pair.split('_')}
+        return self.feed.returnCurrencies()
+
+    def returnTicker(self):
+        ticker = {}
+        for pair, mid in zip(self.pairs, self.mid_prices()):
+            ticker[pair] = {'last': "%.8f" % mid,
+                            'lowestAsk': "%.8f" % (mid * (1 + self.offsets[0])),
+                            'highestBid': "%.8f" % (mid * (1 - self.offsets[0])),
+                            'isFrozen': '0'}
+        return ticker
+
+    def returnOrderBook(self, currencyPair='all', depth=20):
+        if currencyPair == 'all':
+            return {pair: self.returnOrderBook(pair, depth) for pair in self.pairs}
+        if currencyPair not in self.pair_index:
+            raise ExchangeError("Invalid currency pair.")
+
+        asks, ask_amounts, bids, bid_amounts = self.book_arrays(currencyPair)
+        return {'asks': [["%.8f" % p, float("%.8f" % a)] for p, a in zip(asks[:depth], ask_amounts[:depth]) if a > 0],
+                'bids': [["%.8f" % p, float("%.8f" % a)] for p, a in zip(bids[:depth], bid_amounts[:depth]) if a > 0],
+                'isFrozen': '0',
+                'seq': self._index}
+
+    def returnChartData(self, currencyPair, period, start=None, end=None):
+        # No look ahead, bars up to the current one
+        end = self.timestamp if end in (None, 'None') else min(int(float(end)), self.timestamp)
+        return self.feed.returnChartData(currencyPair, period, start=start, end=end)
+
+    # Trade execution methods
+    def match(self, side, currencyPair, rate, amount):
+        """
+        Walk the book up to rate
+        :return: tuple: level prices and filled amounts
+        """
+        if currencyPair not in self.pair_index:
+            raise ExchangeError("Invalid currency pair.")
+
+        rate, amount = float(rate), float(amount)
+        if rate * amount < self.min_total:
+            raise ExchangeError("Total must be at least %s." % self.min_total)
+
+        asks, ask_amounts, bids, bid_amounts = self.book_arrays(currencyPair, self.latency)
+        if side == 'buy':
+            prices, available = asks, ask_amounts * (asks <= rate)
+        else:
+            prices, available = bids, bid_amounts * (bids >= rate)
+
+        # Fill best levels first
+        before = np.concatenate([[0.], np.cumsum(available)[:-1]])
+        fills = np.clip(amount - before, 0., available)
+        return prices, fills
+
+    def order(self, side, currencyPair, rate, amount):
+        prices, fills = self.match(side, currencyPair, rate, amount)
+        base, symbol = currencyPair.split('_')
+        fee = float(self.tax['takerFee'])
+        filled, total = fills.sum(), np.dot(prices, fills)
+
+        if side == 'buy':
+            if total > self._balance.get(base, 0.):
+                raise ExchangeError("Not enough %s." % base)
+            self._balance[base] -= total
+            self._balance[symbol] = self._balance.get(symbol, 0.) + filled * (1 - fee)
+        else:
+            if filled > self._balance.get(symbol, 0.) + 1e-12:
+                raise ExchangeError("Not enough %s." % symbol)
+            self._balance[symbol] -= filled
+            self._balance[base] = self._balance.get(base, 0.) + total * (1 - fee)
+
+        self.consumed[self.pair_index[currencyPair], 0 if side == 'buy' else 1] += fills
+        self._order_number += 1
+
+        trades = [{'amount': "%.8f" % a, 'date': self.timestamp, 'rate': "%.8f" % p, 'total': "%.8f" % (p * a),
+                   'tradeID': str(self._order_number), 'type': side} for p, a in zip(prices, fills) if a > 0]
+        return {'orderNumber': str(self._order_number),
+                'resultingTrades': trades,
+                'amountUnfilled': "%.8f" % max(float(amount) - filled, 0.)}
+
+    def buy(self, currencyPair, rate, amount, orderType=False):
+        # Unfilled amounts never rest on the book, every order behaves as immediate or cancel
+        return self.order('buy', currencyPair, rate, amount)
+
+    def sell(self, currencyPair, rate, amount, orderType=False):
+        return self.order('sell', currencyPair, rate, amount)
+
+
 # Live datafeeds
 class PoloniexConnection(DataFeed):
     def __init__(self, period, pairs=[], exchange='', addr='ipc:///tmp/feed.ipc', timeout=20):
@@ -0,0 +1,231 @@
+"""
+Order book aware order execution for live trading
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import get_ident
+from time import time
+
+from ..utils import Logger, convert_to, dec_con, dec_zero, dec_qua, safe_div
+from ..exchange_api.poloniex import ExchangeError
+
+# Exchange replies meaning the order is too small to go through
+DUST_MSGS = ['Total must be at least', 'Amount must be at least']
+
+
+def book_vwap(levels, amount):
+    """
+    Walk one side of the order book to fill amount
+    :param levels: list: [price, amount] levels, best first
+    :param amount: Decimal: Amount to fill
+    :return: tuple: (volume weighted price, worst price touched, fillable amount)
+    """
+    amount = convert_to.decimal(amount)
+    filled = cost = dec_zero
+    price = dec_zero
+    for level_price, level_amount in levels:
+        if filled >= amount:
+            break
+        price = convert_to.decimal(level_price)
+        take = min(convert_to.decimal(level_amount), amount - filled)
+        cost = dec_con.add(cost, dec_con.multiply(price, take))
+        filled = dec_con.add(filled, take)
+
+    return safe_div(cost, filled), price, filled
+
+
+class ExecutionEngine(object):
+    """
+    Executes rebalance orders against the order book.
+    Each order pulls the book once, is split in child slices priced at the level that fills
+    them and is submitted as immediate or cancel orders until filled or the deadline passes.
+    Independent pairs are executed concurrently when the data feed is thread safe, on a worker pool
+    kept until close.
+    """
+    def __init__(self, tapi, fiat, slices=4, deadline=30, depth=20, max_workers=8, clock=time):
+        """
+        :param tapi: ExchangeConnection: exchange data feed
+        :param fiat: str: Quote symbol
+        :param slices: int: Number of child orders per order
+        :param deadline: float: Seconds to fill each order
+        :param depth: int: Order book depth to pull
+        :param max_workers: int: Max pairs executed at once
+        :param clock: callable: time source
+        """
+        self.tapi = tapi
+        self.fiat = fiat
+        self.slices = slices
+        self.deadline = deadline
+        self.depth = depth
+        self.max_workers = max_workers if getattr(tapi, 'threadsafe', False) else 1
+        self.clock = clock
+        self.pool = None
+        self.threads = set()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker pool and close the data feed sockets its threads opened
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+            close_socks = getattr(self.tapi, 'close_thread_socks', None)
+            if close_socks is not None:
+                close_socks(self.threads)
+            self.threads = set()
+
+    def plan(self, side, amount, book):
+        """
+        Split an order in child slices priced against the book
+        :param side: str: 'buy' or 'sell'
+        :param amount: Decimal: Order amount
+        :param book: dict: returnOrderBook reply
+        :return: list: (limit price, amount) child orders
+        """
+        levels = book['asks'] if side == 'buy' else book['bids']
+        amount = convert_to.decimal(amount)
+        step = safe_div(amount, convert_to.decimal(self.slices)).quantize(dec_qua)
+
+        orders = []
+        placed = dec_zero
+        for i in range(self.slices):
+            size = step if i < self.slices - 1 else amount - placed
+            if size <= dec_zero:
+                continue
+            placed = dec_con.add(placed, size)
+            # Limit at the worst level needed to fill everything up to this slice
+            _, limit, fillable = book_vwap(levels, placed)
+            if fillable <= dec_zero:
+                break
+            orders.append((limit, size))
+        return orders
+
+    def submit(self, side, pair, price, amount):
+        """
+        Send one immediate or cancel order
+        :return: dict or str: exchange reply
+        """
+        try:
+            order = self.tapi.buy if side == 'buy' else self.tapi.sell
+            return order(pair, str(price), str(amount.quantize(dec_qua)), orderType="immediateOrCancel")
+        except ExchangeError as error:
+            return error.__str__()
+
+    def available(self, side, symbol, price):
+        """ Max amount the balance allows to trade """
+        balance = self.tapi.returnBalances()
+        if side == 'sell':
+            return convert_to.decimal(balance[symbol])
+        return safe_div(convert_to.decimal(balance[self.fiat]), price)
+
+    def execute(self, side, symbol, amount):
+        """
+        Fill an order before the deadline
+        :param side: str: 'buy' or 'sell'
+        :param symbol: str: Asset symbol
+        :param amount: Decimal: Asset amount
+        :return: dict: execution report
+        """
+        pair = self.fiat + '_' + symbol
+        start = self.clock()
+        report = {'pair': pair, 'side': side, 'amount': convert_to.decimal(amount), 'filled': dec_zero,
+                  'cost': dec_zero, 'orders': 0, 'books': 0, 'done': False, 'notEnough': False}
+        remaining = report['amount']
+
+        while remaining >= dec_qua and self.clock() - start < self.deadline:
+            before = remaining
+            book = self.tapi.returnOrderBook(pair, self.depth)
+            report['books'] += 1
+
+            orders = self.plan(side, remaining, book)
+            if not orders:
+                break
+
+            for price, size in orders:
+                if self.clock() - start >= self.deadline:
+                    break
+                size = min(size, remaining)
+                response = self.submit(side, pair, price, size)
+                report['orders'] += 1
+                Logger.debug(ExecutionEngine.execute, "%s %s %s at %s: %s" % (side, pair, size, price, response))
+
+                if isinstance(response, dict) and 'amountUnfilled' in response:
+                    filled = dec_con.subtract(size, convert_to.decimal(response['amountUnfilled']))
+                    remaining = dec_con.subtract(remaining, filled)
+                    report['filled'] = dec_con.add(report['filled'], filled)
+                    report['cost'] = dec_con.add(report['cost'], self.fills_cost(response, filled, price))
+
+                elif any(msg in str(response) for msg in DUST_MSGS):
+                    # Leftover too small to trade
+                    remaining = dec_zero
+
+                elif 'Not enough' in str(response):
+                    report['notEnough'] = True
+                    remaining = min(remaining, self.available(side, symbol, price).quantize(dec_qua))
+
+                if remaining < dec_qua:
+                    break
+
+            # Book did not fill us, let the next step try again
+            if remaining == before:
+                break
+
+        report['done'] = remaining < dec_qua
+        report['price'] = safe_div(report['cost'], report['filled'])
+        report['elapsed'] = self.clock() - start
+        return report
+
+    @staticmethod
+    def fills_cost(response, filled, price):
+        """
+        Quote amount paid or received by an order
+        :param response: dict: Exchange order reply
+        :param filled: Decimal: Amount filled
+        :param price: Decimal: Order limit price, used when the reply lists no trades
+        :return: Decimal: Sum of amount * rate over the resulting trades
+        """
+        trades = response.get('resultingTrades')
+        if not trades:
+            return dec_con.multiply(filled, price)
+        cost = dec_zero
+        for trade in trades:
+            cost = dec_con.add(cost, dec_con.multiply(convert_to.decimal(trade['amount']),
+                                                      convert_to.decimal(trade['rate'])))
+        return cost
+
+    def run(self, order):
+        # Worker side of execute_many, threads are remembered to close their sockets
+        self.threads.add(get_ident())
+        return self.execute(*order)
+
+    def execute_many(self, orders):
+        """
+        Execute orders on different pairs concurrently
+        :param orders: list: (side, symbol, amount) tuples
+        :return: list: execution reports, in orders order
+        """
+        if not orders:
+            return []
+        if self.max_workers <= 1 or len(orders) == 1:
+            return [self.execute(*order) for order in orders]
+
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.max_workers)
+        return list(self.pool.map(self.run, orders))
+
+    def rebalance(self, symbols, balance_change):
+        """
+        Sell then buy the balance change
+        :param symbols: list: Asset symbols, in balance_change order
+        :param balance_change: numpy array: Desired change in asset amounts
+        :return: list: execution reports
+        """
+        sells = [('sell', symbol, abs(change.quantize(dec_qua)))
+                 for symbol, change in zip(symbols, balance_change) if change < dec_zero]
+        buys = [('buy', symbol, abs(change.quantize(dec_qua)))
+                for symbol, change in zip(symbols, balance_change) if change > dec_zero]
+
+        # Buys need the fiat freed by the sells
+        return self.execute_many(sells) + self.execute_many(buys)
@@ -8,6 +8,7 @@ from ..spaces import *
 from .utils import *
 from ..utils import *
 from ..core import Env
+from ..seeding import np_random
 
 import os
 import smtplib
@@ -16,14 +17,14 @@ from datetime import datetime, timedelta, timezone
 from decimal import localcontext, ROUND_UP, Decimal
 from time import sleep
 import pandas as pd
-import empyrical as ec
-import optunity as ot
-from bokeh.layouts import column
-from bokeh.palettes import inferno
-from bokeh.plotting import figure, show
-from bokeh.models import HoverTool, Legend, Span, Label
 
 from ..exchange_api.poloniex import ExchangeError
+from .execution import ExecutionEngine
+from .vector import VecTradingEnvironment, FEATURES, rebalance
+
+# Analysis and optimization backends load on first use
+ec = lazy_import('empyrical')
+ot = lazy_import('optunity')
 
 
 # Environments
@@ -422,11 +423,26 @@ class TradingEnvironment(Env):
     #     return out
 
     # Low frequency getter
-    def get_ohlc(self, symbol, index):
+    def get_chart_data(self, index):
+        """
+        Request OHLC records for all pairs at once, if the data feed supports it
+        :param index: datetime.datetime: Time span for data retrieval
+        :return: dict: pair: records. Empty if the feed has no batch request
+        """
+        if not hasattr(self.tapi, 'returnChartDataBatch'):
+            return {}
+
+        return self.tapi.returnChartDataBatch(self.pairs,
+                                              period=self.period * 60,
+                                              start=datetime.timestamp(index[0]),
+                                              end=datetime.timestamp(index[-1]))
+
+    def get_ohlc(self, symbol, index, records=None):
         """
         Return OHLC data for desired pair
         :param symbol: str: Pair symbol
         :param index: datetime.datetime: Time span for data retrieval
+        :param records: list: Already fetched chart data for symbol
         :return: pandas DataFrame: OHLC symbol data
         """
         # Get range
@@ -434,11 +450,12 @@ class TradingEnvironment(Env):
         end = index[-1]
 
         # Call for data
-        ohlc_df = pd.DataFrame.from_records(self.tapi.returnChartData(symbol,
-                                                                        period=self.period * 60,
-                                                                        start=datetime.timestamp(start),
-                                                                        end=datetime.timestamp(end)),
-                                                                        nrows=index.shape[0])
+        if records is None:
+            records = self.tapi.returnChartData(symbol,
+                                                period=self.period * 60,
+                                                start=datetime.timestamp(start),
+                                                end=datetime.timestamp(end))
+        ohlc_df = pd.DataFrame.from_records(records, nrows=index.shape[0])
         # TODO 1 FIND A BETTER WAY
         # TODO: FIX TIMESTAMP
 
@@ -503,9 +520,10 @@ class TradingEnvironment(Env):
                     port_vec.at[port_vec.index[-1], list(last_balance.keys())] = list(last_balance.values())
 
                     # Get pairs history
+                    chart_data = self.get_chart_data(index)
                     for pair in self.pairs:
                         keys.append(pair)
-                        history = self.get_ohlc(pair, index)
+                        history = self.get_ohlc(pair, index, chart_data.get(pair))
 
                         history = pd.concat([history, port_vec[pair.split('_')[1]]], axis=1)
                         obs_list.append(history)
@@ -527,9 +545,10 @@ class TradingEnvironment(Env):
                     return obs.apply(convert_to.decimal, raw=True)
                 else:
                     # Get history
+                    chart_data = self.get_chart_data(index)
                     for pair in self.pairs:
                         keys.append(pair)
-                        history = self.get_ohlc(pair, index)
+                        history = self.get_ohlc(pair, index, chart_data.get(pair))
                         obs_list.append(history)
 
                     # Concatenate
@@ -999,6 +1018,11 @@ class TradingEnvironment(Env):
         return self.results
 
     def plot_results(self, window=14, benchmark='crp', subset=None):
+        from bokeh.layouts import column
+        from bokeh.palettes import inferno
+        from bokeh.plotting import figure, show
+        from bokeh.models import HoverTool, Legend, Span, Label
+
         def config_fig(fig):
             fig.background_fill_color = "black"
             fig.background_fill_alpha = 0.1
@@ -1378,6 +1402,9 @@ class BacktestEnvironment(TradingEnvironment):
     """
     Backtest environment for financial strategies history testing
     """
+    # Training start points are drawn from the global numpy stream until the env is seeded
+    seed_value = None
+
     def __init__(self, period, obs_steps, tapi, fiat, name):
         assert isinstance(tapi, BacktestDataFeed), "Backtest tapi must be a instance of BacktestDataFeed."
         super().__init__(period, obs_steps, tapi, fiat, name)
@@ -1385,22 +1412,107 @@ class BacktestEnvironment(TradingEnvironment):
         self.data_length = None
         self.training = False
         self.initialized = False
+        self.window = None
+        self.np_random = np.random
+        self.schedule = None
+        self.schedule_pos = 0
+
+    def seed(self, seed=None):
+        """
+        Use an own random stream for training start points and agents noise
+        :param seed: int: Stream seed, see cryptotrader.seeding.child_seed to derive worker seeds
+        :return: list: Seed used
+        """
+        self.np_random, seed = np_random(seed)
+        self.seed_value = seed
+        return [seed]
+
+    def episode_schedule(self, n, seed=None):
+        """
+        Precompute training episode start points
+        :param n: int: Number of episodes
+        :param seed: int: Schedule seed, None draws from the env stream
+        :return: numpy array: Data indexes of the first observation of each episode
+        """
+        rng = self.np_random if seed is None else np_random(seed)[0]
+        if not self.initialized:
+            self.setup()
+        start, end = self.episode_bounds()
+        return rng.randint(start, end, size=n).astype(np.int64)
+
+    def set_schedule(self, starts=None):
+        """
+        Make training resets follow precomputed start points, random draws resume once they run out
+        :param starts: array like: Start points, as returned by episode_schedule. None clears the schedule
+        """
+        self.schedule = None if starts is None else np.asarray(starts, dtype=np.int64)
+        self.schedule_pos = 0
+
+    def random_state(self):
+        """
+        Episode sampling state, put it back with set_random_state
+        :return: tuple: Stream, seed, schedule and schedule position
+        """
+        return self.np_random, self.seed_value, self.schedule, self.schedule_pos
+
+    def set_random_state(self, state):
+        self.np_random, self.seed_value, self.schedule, self.schedule_pos = state
+
+    def next_start(self):
+        """
+        :return: int: Data index of the next training episode first observation
+        """
+        if self.schedule is not None and self.schedule_pos < self.schedule.shape[0]:
+            self.schedule_pos += 1
+            return int(self.schedule[self.schedule_pos - 1])
+        start, end = self.episode_bounds()
+        return int(self.np_random.randint(start, end))
 
     @property
     def timestamp(self):
         return datetime.fromtimestamp(self.tapi.ohlc_data[self.tapi.pairs[0]].index[self.index]).astimezone(timezone.utc)
 
+    def set_window(self, start=None, end=None):
+        """
+        Restrict episodes to a span of the data feed, nothing is copied
+        :param start: int: Data index of the first observation, must be greater than obs_steps
+        :param end: int: Data index of the last observation. Episodes take end - start steps
+        """
+        if start is None and end is None:
+            self.window = None
+            return
+
+        if not self.initialized:
+            self.setup()
+
+        start = self.obs_steps + 1 if start is None else int(start)
+        end = self.data_length - 1 if end is None else int(end)
+        assert self.obs_steps < start < end < self.data_length, "Bad window bounds."
+        self.window = (start, end)
+
+    def episode_bounds(self):
+        """
+        :return: tuple: Data indexes of the first and last observations of an episode
+        """
+        if self.window:
+            return self.window
+        return self.obs_steps + 1, self.data_length - 1
+
     def get_hindsight(self):
         """
         Stay away from look ahead bias!
-        :return: pandas dataframe: Full history dataframe
+        :return: pandas dataframe: Full history dataframe, the window span if set
         """
         # Save env obs_steps
         obs_steps = self.obs_steps
 
         # Change it so you can recover all the data
-        self.obs_steps = self.data_length
-        self.index = self.obs_steps - 1
+        if self.window:
+            self.obs_steps = self.window[1] - self.window[0] + 1
+            self.index = self.window[1]
+        else:
+            self.obs_steps = self.data_length
+            self.index = self.obs_steps - 1
 
         # Pull the entire data set
         hindsight = self.get_observation()
@@ -1609,9 +1721,9 @@ class BacktestEnvironment(TradingEnvironment):
 
             # Get start point
             if self.training:
-                self.index = np.random.random_integers(self.obs_steps, self.data_length - 3)
+                self.index = self.next_start() - 1
             else:
-                self.index = self.obs_steps
+                self.index = self.episode_bounds()[0] - 1
 
             # Reset log dfs
             self.obs_df = pd.DataFrame()
@@ -1654,7 +1766,7 @@ class BacktestEnvironment(TradingEnvironment):
             self.simulate_trade(action, timestamp)
 
             # Check for end condition
-            if self.index >= self.data_length - 2:
+            if self.index >= self.episode_bounds()[1] - 1:
                 done = True
                 self.status["OOD"] += 1
             else:
@@ -1688,83 +1800,93 @@ class BacktestEnvironment(TradingEnvironment):
 
 
 class TrainingEnvironment(BacktestEnvironment):
-    def __init__(self, period, obs_steps, tapi, fiat, name):
+    """
+    Float32 backtest environment for high throughput training.
+    Prices are preloaded in one array, the portfolio lives in a numpy vector updated in place
+    and observations are array slices in the get_observation(True) column layout.
+    Nothing is logged to the portfolio and action dataframes.
+    """
+    def __init__(self, period, obs_steps, tapi, fiat, name, seed=None):
+        self.seed_value = seed
+        self.training = True
+        self.vec = None
         super(TrainingEnvironment, self).__init__(period, obs_steps, tapi, fiat, name)
+        self.training = True
+        if seed is not None:
+            self.np_random, _ = np_random(seed)
+        # Setup already ran on base init
+        self.data_length = self.vec.data_length
+        self.initialized = True
 
     @property
     def timestamp(self):
-        return datetime.fromtimestamp(self.data.index[self.index]).astimezone(timezone.utc)
-
-    def get_history(self, start=None, end=None, portfolio_vector=False):
-        while True:
-            try:
-                obs_list = []
-                keys = []
+        return datetime.fromtimestamp(self.dates[self.index]).astimezone(timezone.utc)
 
-                # Make desired index
-                end = self.timestamp
-                start = end - timedelta(minutes=self.period * self.obs_steps)
-                index = pd.date_range(start=start,
-                                      end=end,
-                                      freq="%dT" % self.period).ceil("%dT" % self.period)[-self.obs_steps:]
+    @property
+    def holdings(self):
+        """ Asset amounts, fiat last """
+        return self.vec.holdings[0]
 
-                # Get portfolio observation
-                port_vec = self.get_sampled_portfolio(index)
+    @property
+    def balance(self):
+        return {symbol: float(amount) for symbol, amount in zip(self.symbols, self.holdings)}
 
-                if port_vec.shape[0] == 0:
-                    port_vec = self.get_sampled_portfolio().iloc[-1:]
-                    port_vec.index = [index[0]]
+    @balance.setter
+    def balance(self, values):
+        for i, symbol in enumerate(self.symbols):
+            if symbol in values:
+                self.holdings[i] = float(values[symbol])
+        self.vec.amounts[0] = self.holdings
 
-                # Get pairs history
-                for pair in self.pairs:
-                    keys.append(pair)
-                    history = self.get_ohlc(pair, index)
+    def get_history(self, start=None, end=None, portfolio_vector=False):
+        obs = self.vec.to_columns(self.vec.observe())[0]
+        if portfolio_vector:
+            return obs
+        # Drop amount columns
+        n_features = len(FEATURES)
+        return obs[:, [i for i in range(obs.shape[1] - 1) if i % n_features != n_features - 1]]
 
-                    history = pd.concat([history, port_vec[pair.split('_')[1]]], axis=1)
-                    obs_list.append(history)
+    def get_observation(self, portfolio_vector=False):
+        """
+        Return observation array with prices and asset amounts
+        :param portfolio_vector: bool: whether to include or not asset amounts
+        :return: numpy array: shape (obs_steps, columns)
+        """
+        self.obs_df = self.get_history(portfolio_vector=portfolio_vector)
+        return self.obs_df
 
-                # Get fiat history
-                keys.append(self._fiat)
-                obs_list.append(port_vec[self._fiat])
+    def get_open_price(self, symbol, timestamp=None):
+        return self.vec.prices[self.index, self.symbols.index(symbol), 0]
 
-                # Concatenate dataframes
-                obs = pd.concat(obs_list, keys=keys, axis=1)
+    def calc_total_portval(self, timestamp=None):
+        return self.vec.portval[0]
 
-                # Fill missing portfolio observations
-                cols_to_bfill = [col for col in zip(self.pairs, self.symbols)] + [(self._fiat, self._fiat)]
-                obs = obs.fillna(obs[cols_to_bfill].ffill().bfill())
+    def calc_portfolio_vector(self):
+        prices = np.append(self.vec.prices[self.index, :, 0], [1.])
+        return self.holdings * prices / self.calc_total_portval()
 
-                return obs.apply(convert_to.decimal, raw=True)
+    def seed(self, seed=None):
+        seeds = super(TrainingEnvironment, self).seed(seed)
+        if self.vec is not None:
+            self.vec.seed(self.seed_value)
+        return seeds
 
-            except Exception as e:
-                Logger.error(TrainingEnvironment.get_history, self.parse_error(e))
-                raise e
+    def set_schedule(self, starts=None):
+        super(TrainingEnvironment, self).set_schedule(starts)
+        self.vec.set_schedule(starts)
 
-    def get_observation(self, portfolio_vector=False):
-        """
-        Return observation df with prices and asset amounts
-        :param portfolio_vector: bool: whether to include or not asset amounts
-        :return: pandas DataFrame:
-        """
-        try:
-            self.obs_df = self.get_history(portfolio_vector=portfolio_vector)
-            return self.obs_df
+    def random_state(self):
+        return super(TrainingEnvironment, self).random_state(), \
+               (self.vec.np_random, self.vec.schedule, self.vec.schedule_pos)
 
-        except Exception as e:
-            Logger.error(TrainingEnvironment.get_observation, self.parse_error(e))
-            raise e
+    def set_random_state(self, state):
+        super(TrainingEnvironment, self).set_random_state(state[0])
+        self.vec.np_random, self.vec.schedule, self.vec.schedule_pos = state[1]
 
     def setup(self):
         # Reset index
         self.data_length = self.tapi.data_length
-
-        # Get data set
-        obs_steps = self.obs_steps
-        self.obs_steps = self.data_length
-        self.index = self.obs_steps - 1
-        self.data = super().get_observation().astype('f')
-        self.obs_steps = obs_steps
-        self.index = self.obs_steps
+        self.dates = self.tapi.ohlc_data[self.pairs[0]].index.values[:self.data_length]
 
         # Set spaces
         self.set_observation_space()
@@ -1772,7 +1894,7 @@ class TrainingEnvironment(BacktestEnvironment):
 
         # Get fee values
         for symbol in self.symbols:
-            self.tax[symbol] =float(self.get_fee(symbol))
+            self.tax[symbol] = float(self.get_fee(symbol))
 
         # Start balance
         self.init_balance = self.get_balance()
@@ -1780,84 +1902,47 @@ class TrainingEnvironment(BacktestEnvironment):
         # Set flag
         self.initialized = True
 
+        # Preload data set and portfolio state
+        self.vec = VecTradingEnvironment(self, 1, training=self.training, seed=self.seed_value,
+                                         dtype=np.float32, auto_reset=False)
+
     def reset(self):
         # If need setup, do it
         if not self.initialized:
             self.setup()
 
-        # choose new start point
-        self.index = np.random.random_integers(self.obs_steps, self.data_length - 3)
-
-        # Clean data frames
-        self.obs_df = pd.DataFrame()
-        self.portfolio_df = pd.DataFrame()
-
-        # Reset balance
-        self.balance = self.init_balance = self.get_balance()
-
-        # Get new index
-        self.index += 1
-
-        # Observe environment
-        obs = self.get_observation(True)
-
-        # Reset portfolio value
-        self.portval = {'portval': self.calc_total_portval(self.obs_df.index[-1]),
-                        'timestamp': self.portfolio_df.index[-1]}
-
-        # Init state
-        self.action_df = pd.DataFrame([list(self.calc_portfolio_vector()) + [False]],
-                                      columns=self.symbols + ['online'],
-                                      index=[self.portfolio_df.index[0]])
+        self.vec.training = self.training
+        self.vec.benchmark[:] = np.float32(self.benchmark)
+        self.vec.reset()
+        self.index = int(self.vec.index[0])
 
-        # Return first observation
-        return obs.astype('f')
+        return self.get_observation(True)
 
-    def simulate_trade(self, action, timestamp):
-        raise NotImplementedError('HERE NOW')
+    def simulate_trade(self, action, timestamp=None):
+        """
+        Rebalance the portfolio at the current open prices
+        :param action: np.array: Desired portfolio vector
+        :param timestamp: unused, kept for interface compatibility
+        :return: bool
+        """
+        action = self.vec.normalize(np.reshape(action, (1, -1)))
+        rebalance(self.vec.holdings, self.vec.prices[self.vec.index, :, 0], action, self.vec.fees)
+        self.vec.amounts[:, -1] = self.vec.holdings
+        return True
 
     def step(self, action):
         try:
-            # Get step timestamp
-            timestamp = self.timestamp
+            _, reward, done, _ = self.vec.step(np.reshape(action, (1, -1)))
+            self.index = int(self.vec.index[0])
 
-            # Save portval for reward calculation
-            previous_portval = self.calc_total_portval()
-
-            # Simulate portifolio rebalance
-            self.simulate_trade(action, timestamp)
-
-            # Check for end condition
-            if self.index >= self.data_length - 2:
-                done = True
+            if done[0]:
                 self.status["OOD"] += 1
-            else:
-                done = False
-
-            # Get new index
-            self.index += 1
-
-            # Get new observation
-            new_obs = self.get_observation(True)
-
-            # Get reward for action took
-            reward = self.get_reward(previous_portval)
 
             # Return new observation, reward, done flag and status for debugging
-            return new_obs.astype(np.float64), np.float64(reward), done, self.status
-
-        except KeyboardInterrupt:
-            self.status["OOD"] += 1
-            # return self.get_observation(True).astype(np.float64), np.float64(0), False, self.status
-            raise KeyboardInterrupt
+            return self.get_observation(True), np.float32(reward[0]), bool(done[0]), self.status
 
         except Exception as e:
             Logger.error(TrainingEnvironment.step, self.parse_error(e))
-            if hasattr(self, 'email'):
-                self.send_email("TradingEnvironment Error: %s at %s" % (e,
-                                datetime.strftime(self.timestamp, "%Y-%m-%d %H:%M:%S")),
-                                self.parse_error(e))
-            print("step action:", action)
             raise e
 
 
@@ -1937,6 +2022,53 @@ class PaperTradingEnvironment(TradingEnvironment):
         return new_obs, np.float64(reward), done, self.status
 
 
+class MarketSnapshot(object):
+    """
+    Ticker, balances and fees of one step, each fetched at most once until invalidated
+    """
+    def __init__(self, tapi):
+        """
+        :param tapi: ExchangeConnection: data feed to fetch from
+        """
+        self.tapi = tapi
+        self._ticker = None
+        self._balances = None
+        self._fees = None
+        # Exchange calls done, for monitoring
+        self.requests = 0
+
+    @property
+    def ticker(self):
+        if self._ticker is None:
+            self._ticker = self.tapi.returnTicker()
+            self.requests += 1
+        return self._ticker
+
+    @property
+    def balances(self):
+        if self._balances is None:
+            self._balances = self.tapi.returnBalances()
+            self.requests += 1
+        return self._balances
+
+    @property
+    def fees(self):
+        if self._fees is None:
+            self._fees = self.tapi.returnFeeInfo()
+            self.requests += 1
+        return self._fees
+
+    def invalidate(self, fees=False):
+        """
+        Drop market data so it is fetched again on next read
+        :param fees: bool: drop fees as well
+        """
+        self._ticker = None
+        self._balances = None
+        if fees:
+            self._fees = None
+
+
 class LiveTradingEnvironment(TradingEnvironment):
     """
     Live trading environment for financial strategies execution
@@ -1944,9 +2076,56 @@ class LiveTradingEnvironment(TradingEnvironment):
     """
     def __init__(self, period, obs_steps, tapi, fiat, name):
         assert isinstance(tapi, ExchangeConnection), "tapi must be an ExchangeConnection instance."
+        # Order book execution engine, built on setup unless set before
+        self.execution = None
+        # Market data shared by every valuation within a step
+        self.snapshot = MarketSnapshot(tapi)
         super().__init__(period, obs_steps, tapi, fiat, name)
 
-    # Data feed methods
+    def get_balance(self):
+        """
+        Get balance from the step market snapshot
+        :return: dict: Dict containing Decimal values for portfolio allocation
+        """
+        try:
+            balance = self.snapshot.balances
+
+            filtered_balance = {}
+            for symbol in self.symbols:
+                filtered_balance[symbol] = convert_to.decimal(balance[symbol])
+
+            return filtered_balance
+
+        except Exception as e:
+            try:
+                Logger.error(LiveTradingEnvironment.get_balance, self.parse_error(e, balance))
+            except Exception:
+                Logger.error(LiveTradingEnvironment.get_balance, self.parse_error(e))
+            raise e
+
+    def get_fresh_balance(self):
+        """
+        Fetch balance from exchange, refreshing the snapshot
+        :return: dict: Dict containing Decimal values for portfolio allocation
+        """
+        self.snapshot.invalidate()
+        return self.get_balance()
+
+    def get_fee(self, symbol, fee_type='takerFee'):
+        """
+        Return transaction fee value for desired symbol from the market snapshot
+        :param symbol: str: Pair name
+        :param fee_type: str: Take or Maker fee
+        :return: Decimal:
+        """
+        try:
+            assert fee_type in ['takerFee', 'makerFee'], "fee_type must be whether 'takerFee' or 'makerFee'."
+            return dec_con.create_decimal(self.snapshot.fees[fee_type])
+
+        except Exception as e:
+            Logger.error(LiveTradingEnvironment.get_fee, self.parse_error(e))
+            raise e
+
     def get_balance_array(self):
         """
         Return ordered balance array
@@ -1967,7 +2146,7 @@ class LiveTradingEnvironment(TradingEnvironment):
         portval = dec_zero
         balance = self.get_balance()
         if not ticker:
-            ticker = self.tapi.returnTicker()
+            ticker = self.snapshot.ticker
         for pair in self.pairs:
             portval = balance[pair.split('_')[1]].fma(convert_to.decimal(ticker[pair]['last']),
                                                       portval)
@@ -1984,7 +2163,7 @@ class LiveTradingEnvironment(TradingEnvironment):
         portfolio = np.empty(len(self.symbols), dtype=np.dtype(Decimal))
         portval = self.calc_total_portval(ticker)
         if not ticker:
-            ticker = self.tapi.returnTicker()
+            ticker = self.snapshot.ticker
         balance = self.get_balance()
         for i, pair in enumerate(self.pairs):
             portfolio[i] = safe_div(dec_con.multiply(balance[pair.split('_')[1]],
@@ -2003,7 +2182,7 @@ class LiveTradingEnvironment(TradingEnvironment):
         desired_balance = np.empty(len(self.symbols), dtype=np.dtype(Decimal))
         portval = fiat = self.calc_total_portval(ticker)
         if not ticker:
-            ticker = self.tapi.returnTicker()
+            ticker = self.snapshot.ticker
         for i, pair in enumerate(self.pairs):
             desired_balance[i] = safe_div(dec_con.multiply(portval , action[i]),
                                           dec_con.create_decimal(ticker[pair]['last']))
@@ -2048,12 +2227,12 @@ class LiveTradingEnvironment(TradingEnvironment):
                         return True
 
                     elif 'Not enough %s.' % symbol == response:
-                        amount = self.get_balance()[symbol]
+                        amount = self.get_fresh_balance()[symbol]
                         if dec_con.create_decimal(amount) < dec_con.create_decimal('1E-8'):
                             return True
 
                     elif 'Order execution timed out.' == response:
-                        amount = self.get_balance()[symbol]
+                        amount = self.get_fresh_balance()[symbol]
 
                 except ExchangeError as error:
                     Logger.error(LiveTradingEnvironment.immediate_sell, self.parse_error(error))
@@ -2065,12 +2244,12 @@ class LiveTradingEnvironment(TradingEnvironment):
                         return True
 
                     elif 'Not enough %s.' % symbol == error.__str__():
-                        amount = self.get_balance()[symbol]
+                        amount = self.get_fresh_balance()[symbol]
                         if dec_con.create_decimal(amount) < dec_con.create_decimal('1E-8'):
                             return True
 
                     elif 'Order execution timed out.' == error.__str__():
-                        amount = self.get_balance()[symbol]
+                        amount = self.get_fresh_balance()[symbol]
 
                     else:
                         raise error
@@ -2098,7 +2277,7 @@ class LiveTradingEnvironment(TradingEnvironment):
                                                                                           "%Y-%m-%d %H:%M:%S")),
                             self.parse_error(error))
 
-            raise e
+            raise error
 
     def immediate_buy(self, symbol, amount):
         """
@@ -2139,12 +2318,12 @@ class LiveTradingEnvironment(TradingEnvironment):
                         self.status['NotEnoughFiat'] += 1
 
                         price = convert_to.decimal(self.tapi.returnTicker()[pair]['lowestAsk'])
-                        fiat_units = self.get_balance()[self._fiat]
+                        fiat_units = self.get_fresh_balance()[self._fiat]
 
                         amount = str(safe_div(fiat_units, price).quantize(dec_eps))
 
                     elif 'Order execution timed out.' == response:
-                        amount = self.get_balance()[symbol]
+                        amount = self.get_fresh_balance()[symbol]
 
                 except ExchangeError as error:
                     Logger.error(LiveTradingEnvironment.immediate_buy,
@@ -2161,7 +2340,7 @@ class LiveTradingEnvironment(TradingEnvironment):
                             self.status['NotEnoughFiat'] += 1
 
                             price = convert_to.decimal(self.tapi.returnTicker()[pair]['lowestAsk'])
-                            fiat_units = self.get_balance()[self._fiat]
+                            fiat_units = self.get_fresh_balance()[self._fiat]
 
                             amount = str(safe_div(fiat_units, price))
 
@@ -2170,7 +2349,7 @@ class LiveTradingEnvironment(TradingEnvironment):
                             return True
 
                     elif 'Order execution timed out.' == error.__str__():
-                        amount = self.get_balance()[symbol]
+                        amount = self.get_fresh_balance()[symbol]
 
                     else:
                         raise error
@@ -2199,13 +2378,35 @@ class LiveTradingEnvironment(TradingEnvironment):
             raise error
 
     # Online Trading methods
-    def rebalance_sell(self, balance_change, order_type="immediate"):
+    def execute_orders(self, side, balance_change):
         """
-        Execute rebalance sell orders sequentially
+        Execute rebalance orders of one side with the execution engine
+        :param side: str: 'buy' or 'sell'
         :param balance_change: numpy array: Balance change
-        :param order_type: str: Order type to use
         :return: bool: True if executed successfully
         """
+        orders = [(side, self.symbols[i], abs(change.quantize(dec_qua))) for i, change in enumerate(balance_change)
+                  if (change > dec_zero if side == 'buy' else change < dec_zero)]
+
+        reports = self.execution.execute_many(orders)
+        for report in reports:
+            Logger.info(LiveTradingEnvironment.execute_orders, report)
+            if side == 'buy' and report['notEnough']:
+                self.status['NotEnoughFiat'] += 1
+
+        return all(report['done'] for report in reports)
+
+    def rebalance_sell(self, balance_change, order_type="book"):
+        """
+        Execute rebalance sell orders
+        :param balance_change: numpy array: Balance change
+        :param order_type: str: Order type to use. "book" for order book execution, "immediate" for sequential
+        immediate or cancel orders at the top of the book
+        :return: bool: True if executed successfully
+        """
+        if order_type == "book":
+            return self.execute_orders('sell', balance_change)
+
         done = True
         for i, change in enumerate(balance_change):
             if change < dec_zero:
@@ -2231,13 +2432,17 @@ class LiveTradingEnvironment(TradingEnvironment):
 
         return done
 
-    def rebalance_buy(self, balance_change, order_type="immediate"):
+    def rebalance_buy(self, balance_change, order_type="book"):
         """
-        Execute rebalance buy orders sequentially
+        Execute rebalance buy orders
         :param balance_change: numpy array: Balance change
-        :param order_type: str: Order type to use
+        :param order_type: str: Order type to use. "book" for order book execution, "immediate" for sequential
+        immediate or cancel orders at the top of the book
         :return: bool: True if executed successfully
         """
+        if order_type == "book":
+            return self.execute_orders('buy', balance_change)
+
         done = True
         for i, change in enumerate(balance_change):
             if change > dec_zero:
@@ -2276,7 +2481,7 @@ class LiveTradingEnvironment(TradingEnvironment):
             action = self.assert_action(action)
 
             # Calculate position change given last portftolio and action vector
-            ticker = self.tapi.returnTicker()
+            ticker = self.snapshot.ticker
             balance_change = dec_vec_sub(self.calc_desired_balance_array(action, ticker), self.get_balance_array())[:-1]
 
             # Sell assets first
@@ -2289,8 +2494,11 @@ class LiveTradingEnvironment(TradingEnvironment):
             if resp_1 and resp_2:
                 done = True
 
+            # Orders changed balances and moved prices
+            self.snapshot.invalidate()
+
             # Get new ticker
-            ticker = self.tapi.returnTicker()
+            ticker = self.snapshot.ticker
 
             # Log executed action and final balance
             self.log_action_vector(self.timestamp, self.calc_portfolio_vector(ticker), done)
@@ -2332,6 +2540,10 @@ class LiveTradingEnvironment(TradingEnvironment):
         for symbol in self.symbols:
             self.tax[symbol] = convert_to.decimal(self.get_fee(symbol))
 
+        # Order execution
+        if self.execution is None:
+            self.execution = ExecutionEngine(self.tapi, self._fiat)
+
         # Start balance
         # self.init_balance = self.get_balance()
 
@@ -2341,6 +2553,7 @@ class LiveTradingEnvironment(TradingEnvironment):
     def reset(self):
         self.obs_df = pd.DataFrame()
         self.portfolio_df = pd.DataFrame()
+        self.snapshot.invalidate()
 
         # self.set_observation_space()
         # self.set_action_space()
@@ -2368,6 +2581,9 @@ class LiveTradingEnvironment(TradingEnvironment):
         # Log desired action
         self.log_action_vector(timestamp, action, False)
 
+        # Fresh market data for this step
+        self.snapshot.invalidate()
+
         # Save portval for reward calculation
         previous_portval = self.calc_total_portval()
 
@@ -2382,6 +2598,7 @@ class LiveTradingEnvironment(TradingEnvironment):
             pass
 
         # Observe environment
+        self.snapshot.invalidate()
         new_obs = self.get_observation(True).astype(np.float64)
 
         # Get reward for previous action
@@ -4,11 +4,21 @@ import numpy as np
 import pandas as pd
 from time import time
 
-from ..random_process import ConstrainedOrnsteinUhlenbeckProcess
-from ..utils import convert_to
-from bokeh.layouts import column
-from bokeh.palettes import inferno
-from bokeh.plotting import figure, show
+from ..seeding import np_random
+from ..utils import convert_to, lazy_import
+
+signal = lazy_import('scipy.signal')
+
+# Price noise components of the toy market: theta, mu, sigma, sigma_min, n_steps_annealing
+# ConstrainedOrnsteinUhlenbeckProcess only keeps theta, generate_signal always ran mu=0, sigma=1, dt=1e-2
+PRICE_COMPONENTS = ((15.0, 0.0, 1.0, None, 5 * 80000),
+                    (10.0, 0.0, 1.0, None, 4 * 80000),
+                    (5.0, 0.0, 1.0, None, 3 * 80000),
+                    (1.0, 0.0, 1.0, None, 80000),
+                    (0.5, 0.0, 1.0, None, 80000))
+
+# Log volume component
+VOLUME_COMPONENT = (0.5, 0.0, 1.0, None, 100000)
 
 
 def make_balance(crypto, fiat, pairs):
@@ -20,88 +30,138 @@ def make_balance(crypto, fiat, pairs):
     return balance
 
 
-def generate_signal(period=1000):
-    price = [np.ones(1) * 5000]
-    volume = [np.zeros(1) + .1]
-
-    price_noise_process_1 = ConstrainedOrnsteinUhlenbeckProcess(size=(1,),
-                                                                theta=15.0,
-                                                                mu=1.0,
-                                                                sigma=100.0,
-                                                                n_steps_annealing=5 * 80000,
-                                                                sigma_min=50.0,
-                                                                )
-    price_noise_process_2 = ConstrainedOrnsteinUhlenbeckProcess(size=(1,),
-                                                                theta=10.0,
-                                                                mu=0.5,
-                                                                sigma=70.0,
-                                                                n_steps_annealing=4 * 80000,
-                                                                sigma_min=50.0,
-                                                                )
-    price_noise_process_3 = ConstrainedOrnsteinUhlenbeckProcess(size=(1,),
-                                                                theta=5.0,
-                                                                mu=0.1,
-                                                                sigma=20.0,
-                                                                n_steps_annealing=3 * 80000,
-                                                                sigma_min=10.0,
-                                                                )
-    price_noise_process_4 = ConstrainedOrnsteinUhlenbeckProcess(size=(1,),
-                                                                theta=1.0,
-                                                                mu=0.1,
-                                                                sigma=10.0,
-                                                                n_steps_annealing=80000,
-                                                                sigma_min=10.0,
-                                                                )
-    price_noise_process_5 = ConstrainedOrnsteinUhlenbeckProcess(size=(1,),
-                                                                theta=0.5,
-                                                                mu=0.1,
-                                                                sigma=3.0,
-                                                                n_steps_annealing=80000,
-                                                                sigma_min=3.0,
-                                                                )
-
-    volume_process = ConstrainedOrnsteinUhlenbeckProcess(size=(1,),
-                                                         theta=0.5,
-                                                         mu=0.0001,
-                                                         sigma=1.,
-                                                         n_steps_annealing=100000,
-                                                         sigma_min=0.1,
-                                                         a_min=0.000001,
-                                                         )
-
-    price_process = SinusoidalProcess(period, 1, 100)
-
-    for i in range(79999):
-        weights = np.random.random(6)
-        price.append(price[-1] + \
-                     price_process.sample() * weights[0]  +\
-                     price_noise_process_1.sample() * weights[1] + \
-                     price_noise_process_2.sample() * weights[2] + \
-                     price_noise_process_3.sample() * weights[3] + \
-                     price_noise_process_4.sample() * weights[4] + \
-                     price_noise_process_5.sample() * weights[5])
-        volume.append(volume[-1] + volume_process.sample() / volume[-1])
-    price = np.clip(np.array(price).reshape([-1, 1]), a_min=1.0, a_max=np.inf) + 1
-    volume = np.array(volume)
-    return price.reshape([-1, 1]), volume.reshape([-1, 1])
-
-
-def make_toy_dfs(n_assets, freq=30):
-    prices = []
-    volumes = []
-    for i in range(n_assets):
-        data = generate_signal(1500 + 133 * i)
-        prices.append(data[0])
-        volumes.append(data[1])
+def annealed_sigma(sigma, sigma_min, n_steps_annealing, n_steps, start=0):
+    """
+    AnnealedGaussianProcess.current_sigma for a block of steps
+    :param sigma: float: Initial sigma
+    :param sigma_min: float: Final sigma, None for constant sigma
+    :param n_steps_annealing: int: Steps to go from sigma to sigma_min
+    :param n_steps: int: Block length
+    :param start: int: Steps already taken
+    :return: numpy array: shape (n_steps,)
+    """
+    if sigma_min is None:
+        return np.full(n_steps, float(sigma))
+    m = -float(sigma - sigma_min) / float(n_steps_annealing)
+    return np.maximum(sigma_min, m * np.arange(start, start + n_steps, dtype=np.float64) + sigma)
+
+
+def ou_filter(shocks, theta, mu, dt, x0=0.):
+    """
+    Ornstein Uhlenbeck recursion x[t] = x[t-1] + theta * (mu - x[t-1]) * dt + shocks[t] as one linear filter
+    :param shocks: numpy array: shape (n_steps, ...), scaled noise
+    :param theta: float: Mean reversion rate
+    :param mu: float: Long run mean
+    :param dt: float: Time step
+    :param x0: float or numpy array: State before the first step
+    :return: numpy array: process values, same shape as shocks
+    """
+    a = 1. - theta * dt
+    zi = a * np.broadcast_to(np.asarray(x0, dtype=np.float64), shocks.shape[1:])[None]
+    x, _ = signal.lfilter([1.], [1., -a], shocks + theta * mu * dt, axis=0, zi=zi)
+    return x
+
+
+def regime_path(n_steps, n_regimes, switch_prob, random_state):
+    """
+    Markov regime chain, leaving the current regime with switch_prob for any other one, uniformly
+    :return: numpy array: int regime per step
+    """
+    if n_regimes < 2 or switch_prob <= 0:
+        return np.zeros(n_steps, dtype=np.int64)
+    jumps = (random_state.random_sample(n_steps) < switch_prob) * random_state.randint(1, n_regimes, n_steps)
+    return np.cumsum(jumps) % n_regimes
+
+
+def generate_market(n_steps, n_assets, periods=1000, price0=5000., volume0=0.1, dt=1e-2,
+                    components=PRICE_COMPONENTS, volume_component=VOLUME_COMPONENT, corr=None,
+                    regimes=(1.,), switch_prob=0., seed=None):
+    """
+    Vectorised toy market. Each price moves by a randomly weighted sum of a sinusoid and annealed
+    Ornstein Uhlenbeck components, like generate_signal did one sample at a time.
+    All assets and steps are simulated at once, each asset draws from its own seeded stream.
+    :param n_steps: int: Number of bars
+    :param n_assets: int: Number of assets
+    :param periods: int or list: Sinusoid period per asset
+    :param price0: float: Initial price
+    :param volume0: float: Volume level
+    :param dt: float: OU time step
+    :param components: tuple: Price noise (theta, mu, sigma, sigma_min, n_steps_annealing) components
+    :param volume_component: tuple: Log volume OU component, same layout
+    :param corr: numpy array: Shocks correlation matrix between assets, None for independent assets
+    :param regimes: tuple: Noise scale of each market regime
+    :param switch_prob: float: Probability of leaving the current regime on each step
+    :param seed: int: Seed, asset i draws from seed + i + 1 and the regime chain from seed
+    :return: tuple: prices, volumes and regimes. Prices and volumes shaped (n_steps, n_assets)
+    """
+    streams = [np_random(None if seed is None else seed + i + 1)[0] for i in range(n_assets)]
+    market, _ = np_random(seed)
+
+    chol = None
+    if corr is not None:
+        chol = np.linalg.cholesky(np.asarray(corr, dtype=np.float64))
+
+    def shocks():
+        eps = np.stack([stream.standard_normal(n_steps) for stream in streams], axis=1)
+        return eps.dot(chol.T) if chol is not None else eps
+
+    regime = regime_path(n_steps, len(regimes), switch_prob, market)
+    scale = np.asarray(regimes, dtype=np.float64)[regime][:, None]
+
+    # Sinusoid, as SinusoidalProcess samples it from x0 = 2 * pi / period
+    periods = np.broadcast_to(np.asarray(periods, dtype=np.float64), (n_assets,))
+    steps = np.arange(2, n_steps + 1, dtype=np.float64)[:, None]
+    weights = np.stack([stream.random_sample(n_steps) for stream in streams], axis=1)
+    increments = np.zeros((n_steps, n_assets))
+    increments[1:] = np.sin(2 * np.pi * steps / periods) * weights[1:]
+
+    for theta, mu, sigma, sigma_min, n_annealing in components:
+        sigma = annealed_sigma(sigma, sigma_min, n_annealing, n_steps)[:, None] * scale
+        x = ou_filter(sigma * np.sqrt(dt) * shocks(), theta, mu, dt)
+        weights = np.stack([stream.random_sample(n_steps) for stream in streams], axis=1)
+        increments[1:] += x[:-1] * weights[1:]
+
+    prices = np.clip(price0 + np.cumsum(increments, axis=0), 1.0, np.inf) + 1
+
+    theta, mu, sigma, sigma_min, n_annealing = volume_component
+    sigma = annealed_sigma(sigma, sigma_min, n_annealing, n_steps)[:, None] * scale
+    volumes = volume0 * np.exp(ou_filter(sigma * np.sqrt(dt) * shocks(), theta, mu, dt))
+
+    return prices, volumes, regime
+
+
+def generate_signal(period=1000, n_steps=80000, seed=None):
+    """
+    Single asset toy price and volume series
+    :return: tuple: prices and volumes, shaped (n_steps, 1)
+    """
+    prices, volumes, _ = generate_market(n_steps, 1, period, seed=seed)
+    return prices, volumes
+
+
+def make_toy_dfs(n_assets, freq=30, n_steps=80000, seed=None, plot=True, **kwargs):
+    """
+    Toy OHLCV dataframes, one per asset
+    :param n_assets: int: Number of assets
+    :param freq: int: Candle length in minutes
+    :param n_steps: int: Number of one minute trades per asset
+    :param seed: int: Market seed
+    :param plot: bool: Plot the dataframes
+    :param kwargs: generate_market options
+    :return: list: pandas DataFrames
+    """
+    periods = [1500 + 133 * i for i in range(n_assets)]
+    prices, volumes, _ = generate_market(n_steps, n_assets, periods, seed=seed, **kwargs)
 
     dfs = []
-    index = pd.DatetimeIndex(start='2017-01-01 00:00:00', end='2017-04-30 00:00:00', freq='1min')[-80000:]
+    index = pd.date_range(end='2017-04-30 00:00:00', periods=n_steps, freq='1min')
     for i in range(n_assets):
-        data = np.hstack([prices[i].reshape([-1, 1]), volumes[i].reshape([-1, 1])])
+        data = np.hstack([prices[:, i:i + 1], volumes[:, i:i + 1]])
         dfs.append(sample_trades(pd.DataFrame(data, columns=['trade_px', 'trade_volume'], index=index), freq=str(freq)+'min'))
 
-    for df in dfs:
-        df.plot(figsize=(18, 3))
+    if plot:
+        for df in dfs:
+            df.plot(figsize=(18, 3))
 
     return dfs
 
@@ -190,6 +250,9 @@ def get_dfs_from_db(conn, exchange, start=None, end=None, freq='1min'):
 
 
 def plot_candles(df, results=False):
+        from bokeh.layouts import column
+        from bokeh.plotting import figure, show
+
         def config_fig(fig):
             fig.background_fill_color = "black"
             fig.background_fill_alpha = 0.5
@@ -473,32 +536,3 @@ def get_historical(file, freq, start=None, end=None):
 
     return out.applymap(convert_to.decimal)
 
-
-class SinusoidalProcess(object):
-    def __init__(self, period, size, blocksize, x0=None):
-        self.period = period
-        self.size = size
-        self.blocksize = blocksize
-        if x0 == None:
-            self.x0 = 2 * np.pi / self.period
-        else:
-            self.x0 = x0
-        self.x = self.x0 + 2 * np.pi / self.period
-
-    def sample(self, observation=None):
-        out = []
-        for i in range(self.size):
-            out.append(np.sin(self.x + i))
-        self.x += 2 * np.pi / self.period
-        return np.hstack(out)
-
-    def sample_block(self, observation=None):
-        block = []
-        for _ in range(self.blocksize):
-            out = []
-            for i in range(self.size):
-                out.append(np.sin(self.x + i))
-            self.x += 2 * np.pi / self.period
-            out = np.hstack(out)
-            block.append(out)
-        return np.vstack(block)
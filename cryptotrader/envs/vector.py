@@ -0,0 +1,330 @@
+"""
+Vectorised backtest environment
+
+Steps many independent episodes at once over one shared price tensor.
+Accounting mirrors TradingEnvironment.simulate_trade and get_reward in float arithmetic.
+"""
+from queue import Queue, Full
+from threading import Thread, Event
+
+import numpy as np
+
+from ..seeding import np_random
+
+# Observation features per asset
+FEATURES = ('open', 'high', 'low', 'close', 'volume', 'amount')
+
+
+def price_tensor(tapi, pairs, dtype=np.float32):
+    """
+    Stack backtest data feed candles in one array
+    :param tapi: BacktestDataFeed: Feed with loaded data
+    :param pairs: list: Pairs in asset order
+    :param dtype: numpy dtype
+    :return: numpy array: shape (data_length, n_pairs, 5), open high low close volume
+    """
+    length = tapi.data_length
+    return np.stack([tapi.ohlc_data[pair][['open', 'high', 'low', 'close', 'volume']].values[:length].astype(np.float64)
+                     for pair in pairs], axis=1).astype(dtype)
+
+
+def window_columns(windows, amounts):
+    """
+    Lay price windows and held amounts out as get_observation(True) columns
+    :param windows: numpy array: shape (B, steps, n_pairs, 5)
+    :param amounts: numpy array: shape (B, steps, n_pairs + 1) or broadcastable to it, fiat last
+    :return: numpy array: shape (B, steps, n_pairs * features + 1)
+    """
+    batch_size, steps, n_pairs, _ = windows.shape
+    amounts = np.broadcast_to(amounts, (batch_size, steps, n_pairs + 1))
+    pairs = np.empty((batch_size, steps, n_pairs, len(FEATURES)), dtype=windows.dtype)
+    pairs[..., :5] = windows
+    pairs[..., 5] = amounts[..., :-1]
+    return np.concatenate([pairs.reshape(batch_size, steps, -1), amounts[..., -1:]], axis=-1)
+
+
+def rebalance(holdings, prices, action, fees):
+    """
+    Batched float simulate_trade. Sells first at the open price, then buys with what is left.
+    :param holdings: numpy array: shape (B, n_pairs + 1), asset amounts with fiat last. Updated in place
+    :param prices: numpy array: shape (B, n_pairs), open prices
+    :param action: numpy array: shape (B, n_pairs + 1), normalized portfolio vectors
+    :param fees: numpy array: shape (n_pairs,), taker fees
+    :return: numpy array: holdings
+    """
+    crypto = holdings[:, :-1]
+    fiat = holdings[:, -1]
+
+    portval = (crypto * prices).sum(axis=1) + fiat
+    change = action[:, :-1] - crypto * prices / portval[:, None]
+
+    # Sell assets first
+    sell = change < 0
+    sold = portval[:, None] * -change * sell
+    fiat += (sold * (1 - fees)).sum(axis=1)
+    crypto[sell] = (portval[:, None] * action[:, :-1] / prices)[sell]
+
+    # Then buy, in asset order, clipping at the fiat left
+    portval = (crypto * prices).sum(axis=1) + fiat
+    for i in range(crypto.shape[1]):
+        buy = change[:, i] > 0
+        if not buy.any():
+            continue
+        fiat -= np.where(buy, portval * change[:, i], 0)
+        short = buy & (fiat < 0)
+        portval[short] += fiat[short]
+        fiat[short] = 0
+        fee = portval * change[:, i] * fees[i]
+        crypto[buy, i] = ((portval * action[:, i] - fee) / prices[:, i])[buy]
+
+    return holdings
+
+
+class VecTradingEnvironment(object):
+    """
+    B independent episode cursors over one shared price tensor.
+    Observations are float arrays shaped (B, obs_steps, n_pairs + 1, features), fiat last,
+    with ones as fiat prices and the asset amounts as last feature.
+    Finished episodes are reset on the spot, unless auto_reset is off.
+    """
+    def __init__(self, env, n_envs, training=True, seed=None, dtype=np.float32, auto_reset=True):
+        """
+        :param env: BacktestEnvironment: Template env, gives pairs, data, fees, initial balance and benchmark
+        :param n_envs: int: Number of episodes stepped together
+        :param training: bool: Random episode starts
+        :param seed: int: Start points seed
+        :param dtype: numpy dtype: Observation and accounting dtype
+        :param auto_reset: bool: Restart finished episodes within step
+        """
+        if not env.initialized:
+            env.setup()
+
+        self.n_envs = n_envs
+        self.training = training
+        self.auto_reset = auto_reset
+        self.dtype = np.dtype(dtype)
+        self.obs_steps = env.obs_steps
+        self.data_length = env.data_length
+        self.pairs = list(env.pairs)
+        self.symbols = list(env.symbols)
+
+        self.prices = price_tensor(env.tapi, self.pairs, self.dtype)
+        self.fees = np.array([float(env.tax[symbol]) for symbol in self.symbols[:-1]], dtype=self.dtype)
+        self.init_balance = np.array([float(env.init_balance[symbol]) for symbol in self.symbols], dtype=self.dtype)
+        self.benchmark = np.array(env.benchmark, dtype=self.dtype)
+
+        self.offsets = np.arange(-self.obs_steps + 1, 1)
+        self.index = np.zeros(n_envs, dtype=np.int64)
+        self.holdings = np.zeros((n_envs, len(self.symbols)), dtype=self.dtype)
+        # Rolling window of amounts held at each observed bar
+        self.amounts = np.zeros((n_envs, self.obs_steps, len(self.symbols)), dtype=self.dtype)
+        self.schedule = None
+        self.schedule_pos = 0
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        self.np_random, seed = np_random(seed)
+        return [seed]
+
+    @property
+    def portval(self):
+        """ Portfolio values at the current bar open """
+        prices = self.prices[self.index, :, 0]
+        return (self.holdings[:, :-1] * prices).sum(axis=1) + self.holdings[:, -1]
+
+    def set_schedule(self, starts=None):
+        """
+        Make training episodes start at precomputed points, in order, random draws resume once they run out
+        :param starts: array like: Data indexes of the first observations, see BacktestEnvironment.episode_schedule
+        """
+        self.schedule = None if starts is None else np.asarray(starts, dtype=np.int64)
+        self.schedule_pos = 0
+
+    def start_points(self, n):
+        if self.training:
+            starts = np.empty(0, dtype=np.int64)
+            if self.schedule is not None:
+                starts = self.schedule[self.schedule_pos:self.schedule_pos + n]
+                self.schedule_pos += starts.shape[0]
+            return np.append(starts, self.np_random.randint(self.obs_steps + 1, self.data_length - 1,
+                                                            size=n - starts.shape[0])).astype(np.int64)
+        return np.full(n, self.obs_steps + 1, dtype=np.int64)
+
+    def reset_envs(self, mask):
+        """
+        Start new episodes on masked envs
+        :param mask: numpy array: bool, shape (B,)
+        """
+        n = int(mask.sum())
+        if n:
+            self.index[mask] = self.start_points(n)
+            self.holdings[mask] = self.init_balance
+            self.amounts[mask] = self.init_balance
+
+    def reset(self):
+        """
+        Start all episodes
+        :return: numpy array: observations
+        """
+        self.reset_envs(np.ones(self.n_envs, dtype=bool))
+        return self.observe()
+
+    def observe(self):
+        """
+        Observation windows ending at the current bars
+        :return: numpy array: shape (B, obs_steps, n_pairs + 1, features)
+        """
+        obs = np.ones((self.n_envs, self.obs_steps, len(self.symbols), len(FEATURES)), dtype=self.dtype)
+        obs[:, :, :-1, :5] = self.prices[self.index[:, None] + self.offsets]
+        obs[:, :, -1, 4] = 0
+        obs[:, :, :, 5] = self.amounts
+        return obs
+
+    def normalize(self, actions):
+        actions = np.clip(np.asarray(actions, dtype=self.dtype).reshape(self.n_envs, -1), 0, None)
+        total = actions.sum(axis=1, keepdims=True)
+        actions = np.where(total > 0, actions / np.where(total > 0, total, 1), 0)
+        # Nothing asked, hold fiat
+        actions[total[:, 0] <= 0, -1] = 1
+        return actions
+
+    def step(self, actions):
+        """
+        Rebalance every env and move one bar ahead
+        :param actions: numpy array: shape (B, n_pairs + 1), desired portfolio vectors
+        :return: tuple: observations, rewards, dones, info
+        """
+        actions = self.normalize(actions)
+        prev_portval = self.portval
+
+        rebalance(self.holdings, self.prices[self.index, :, 0], actions, self.fees)
+        self.amounts[:, -1] = self.holdings
+
+        done = self.index >= self.data_length - 2
+        self.index += 1
+
+        # Reward, log return over the benchmark return
+        pr = np.ones((self.n_envs, len(self.symbols)), dtype=self.dtype)
+        pr[:, :-1] = self.prices[self.index, :, 0] / self.prices[self.index - 1, :, 0]
+        portval = self.portval
+        rewards = np.log(portval / prev_portval) - np.log(pr.dot(self.benchmark))
+
+        # Forward fill amounts
+        self.amounts[:, :-1] = self.amounts[:, 1:]
+        self.amounts[:, -1] = self.amounts[:, -2]
+
+        info = {'portval': portval, 'index': self.index.copy()}
+        if self.auto_reset:
+            self.reset_envs(done)
+
+        return self.observe(), rewards.astype(self.dtype), done, info
+
+    def to_columns(self, obs):
+        """
+        Flatten observations to the get_observation(True) column layout
+        :param obs: numpy array: shape (B, obs_steps, n_pairs + 1, features)
+        :return: numpy array: shape (B, obs_steps, n_pairs * features + 1)
+        """
+        pairs = obs[:, :, :-1, :].reshape(obs.shape[0], obs.shape[1], -1)
+        return np.concatenate([pairs, obs[:, :, -1, -1:]], axis=-1)
+
+
+class WindowSampler(object):
+    """
+    Random supervised batches gathered from the price tensor by fancy indexing.
+    Each sample is an observation window in the get_observation(True) column layout, holding the
+    initial balance, and its target is the last bar close over open return of every pair.
+    Batches can be built ahead in a background thread while the network trains.
+    """
+    def __init__(self, prices, init_balance, obs_steps, target_type='regression', seed=None, prefetch=0):
+        """
+        :param prices: numpy array: shape (data_length, n_pairs, 5), see price_tensor
+        :param init_balance: numpy array: Asset amounts, fiat last
+        :param obs_steps: int: Window length, last row is the target bar
+        :param target_type: str: 'regression' or 'classification'
+        :param seed: int: Index sampling seed
+        :param prefetch: int: Batches built ahead, 0 to build them on call
+        """
+        if target_type not in ('regression', 'regressor', 'classification', 'classifier'):
+            raise TypeError("Bad target_type params.")
+
+        self.prices = prices
+        self.init_balance = np.asarray(init_balance, dtype=np.float32)
+        self.obs_steps = obs_steps
+        self.target_type = target_type
+        self.offsets = np.arange(-obs_steps + 1, 1)
+        self.np_random, _ = np_random(seed)
+
+        self.prefetch = prefetch
+        self.queue = None
+        self.thread = None
+        self.batch_size = None
+        self.stop_event = Event()
+
+    @classmethod
+    def from_env(cls, env, **kwargs):
+        """
+        Sampler over a backtest env data
+        :param env: BacktestEnvironment
+        """
+        if not env.initialized:
+            env.setup()
+        if getattr(env, 'vec', None) is not None:
+            prices = env.vec.prices
+        else:
+            prices = price_tensor(env.tapi, env.pairs)
+        init_balance = [float(env.init_balance[symbol]) for symbol in env.symbols]
+        return cls(prices, init_balance, env.obs_steps, **kwargs)
+
+    def make_batch(self, batch_size):
+        """
+        Build one batch
+        :param batch_size: int
+        :return: tuple: obs shaped (B, 1, obs_steps - 1, columns), targets shaped (B, 1, n_pairs, 1)
+        """
+        index = self.np_random.randint(self.obs_steps, self.prices.shape[0], size=batch_size)
+        windows = self.prices[index[:, None] + self.offsets]
+        obs = window_columns(windows[:, :-1], self.init_balance)
+
+        last = windows[:, -1]
+        target = last[:, :, 3] / (last[:, :, 0] + 1e-8) - 1.
+        if self.target_type in ('classification', 'classifier'):
+            target = np.sign(target)
+
+        return obs[:, None], target.astype(np.float32)[:, None, :, None]
+
+    def worker(self, batch_size):
+        while not self.stop_event.is_set():
+            batch = self.make_batch(batch_size)
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put(batch, timeout=0.1)
+                    break
+                except Full:
+                    continue
+
+    def sample(self, batch_size):
+        """
+        Next batch, from the prefetch queue when enabled
+        :param batch_size: int
+        :return: tuple: obs, targets
+        """
+        if not self.prefetch:
+            return self.make_batch(batch_size)
+
+        if self.thread is not None and batch_size != self.batch_size:
+            self.close()
+        if self.thread is None:
+            self.batch_size = batch_size
+            self.queue = Queue(self.prefetch)
+            self.thread = Thread(target=self.worker, args=(batch_size,), daemon=True)
+            self.thread.start()
+        return self.queue.get()
+
+    def close(self):
+        """ Stop the prefetch thread """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.stop_event.clear()
@@ -17,74 +17,143 @@
 #    with this program; if not, write to the Free Software Foundation, Inc.,
 #    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import asyncio
 import logging
 from time import time, sleep
-from threading import Semaphore, Timer
+from threading import Lock
 from collections import deque
 from ..utils import Logger
 
 # logger
 # logger = logging.getLogger(__name__)
 
-class Coach(object):
+
+class RateLimiter(object):
     """
-    Coaches the api wrapper, makes sure it doesn't get all hyped up on Mt.Dew
-    Poloniex default call limit is 6 calls per 1 sec.
+    Generic cell rate algorithm (GCRA) limiter.
+    Each call reserves its slot under a short lock and then sleeps outside of it,
+    so callers are served in arrival order without any helper thread.
     """
 
-    def __init__(self, timeFrame=1.1, callLimit=6):
+    def __init__(self, callLimit=6, timeFrame=1.1, burst=None, clock=time, sleep=sleep, history=1000):
         """
-        timeFrame = float time in secs [default = 1.0]
         callLimit = int max amount of calls per 'timeFrame' [default = 6]
+        timeFrame = float time in secs [default = 1.1]
+        burst = int max calls allowed at once [default = 1]. With burst 1
+            calls are evenly spaced and no 'timeFrame' window ever holds more
+            than 'callLimit' calls; larger bursts trade that guarantee for latency
+        clock = callable returning the current time in secs
+        sleep = callable used to wait, for blocking calls
+        history = int amount of waits kept for latency percentiles
         """
-        self.timeFrame = timeFrame
-        self.semaphore = Semaphore(callLimit)
+        self.interval = timeFrame / callLimit
+        self.burst = burst or 1
+        self.tolerance = self.interval * (self.burst - 1)
+        self.clock = clock
+        self.sleep = sleep
 
-    def wait(self):
-        """ Makes sure our api calls don't go past the api call limit """
-        self.semaphore.acquire()  # blocking call
-        # delayed release
-        timer = Timer(self.timeFrame, self.semaphore.release)
-        # allows the timer to be canceled on exit
-        timer.setDaemon(True)
-        timer.start()
+        # theoretical arrival time
+        self._tat = 0.
+        self._lock = Lock()
+
+        # queueing latency metrics
+        self.calls = 0
+        self.delayed = 0
+        self.totalWait = 0.
+        self.maxWait = 0.
+        self.waits = deque(maxlen=history)
+
+    def reserve(self, cost=1):
+        """ Reserves 'cost' call units, returns the time in secs to wait before calling """
+        with self._lock:
+            now = self.clock()
+            tat = max(self._tat, now)
+            delay = tat - self.tolerance - now
+            # the call is charged after it is allowed, so heavy calls delay the next ones
+            self._tat = tat + cost * self.interval
+            # ignore float rounding leftovers
+            delay = delay if delay > 1e-9 else 0.
+
+            self.calls += 1
+            self.waits.append(delay)
+            if delay > 0:
+                self.delayed += 1
+                self.totalWait += delay
+                self.maxWait = max(self.maxWait, delay)
+        return delay
+
+    def wait(self, cost=1):
+        """ Blocks until the call is allowed """
+        delay = self.reserve(cost)
+        if delay > 0:
+            self.sleep(delay)
+        return delay
 
+    async def acquire(self, cost=1):
+        """ Waits asynchronously until the call is allowed """
+        delay = self.reserve(cost)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
 
-class Coach2(object):
+    def stats(self):
+        """ Returns queueing latency metrics """
+        with self._lock:
+            waits = sorted(self.waits)
+            return {
+                'calls': self.calls,
+                'delayed': self.delayed,
+                'meanWait': self.totalWait / self.calls if self.calls else 0.,
+                'maxWait': self.maxWait,
+                'p95Wait': waits[int(0.95 * (len(waits) - 1))] if waits else 0.
+            }
+
+
+class Coach(object):
     """
     Coaches the api wrapper, makes sure it doesn't get all hyped up on Mt.Dew
     Poloniex default call limit is 6 calls per 1 sec.
     """
 
-    def __init__(self, timeFrame=1.1, callLimit=6):
+    def __init__(self, timeFrame=1.1, callLimit=6, privateTimeFrame=None, privateCallLimit=None,
+                 costs=None, clock=time, sleep=sleep):
         """
-        timeFrame = float time in secs [default = 1.0]
+        timeFrame = float time in secs [default = 1.1]
         callLimit = int max amount of calls per 'timeFrame' [default = 6]
+        privateTimeFrame, privateCallLimit = separate budget for private
+            calls, if given. Otherwise public and private calls share one
+        costs = dict command: call units it takes from the budget [default = 1]
+        clock, sleep = time source and wait function, replaceable for tests
         """
         self.timeFrame = timeFrame
-        self.timeBook = deque(list(), callLimit)
-
-    @property
-    def timeOverTimeframe(self):
-        elapsed = self.timeBook[-1] - self.timeBook[0]
-        Logger.debug(Coach2.timeOverTimeframe, "Elapsed : %f" % elapsed)
-        return elapsed
-
-    def maybeSleep(self):
-        if len(self.timeBook) == 1:
-            Logger.debug(Coach2.timeOverTimeframe, "First API call. No need to sleep.")
-            return
-
-        requiredElapsed = self.timeOverTimeframe - self.timeFrame
-        if requiredElapsed < 0:
-            requiredElapsed *= -1
-            Logger.debug(Coach2.timeOverTimeframe, "...waiting... %f" % requiredElapsed)
-            sleep(requiredElapsed)
-
-    def wait(self):
+        self.costs = costs or {}
+        self.public = RateLimiter(callLimit, timeFrame, clock=clock, sleep=sleep)
+        if privateCallLimit or privateTimeFrame:
+            self.private = RateLimiter(privateCallLimit or callLimit, privateTimeFrame or timeFrame,
+                                       clock=clock, sleep=sleep)
+        else:
+            self.private = self.public
+
+    def limiter(self, private=False):
+        return self.private if private else self.public
+
+    def wait(self, command=None, private=False):
         """ Makes sure our api calls don't go past the api call limit """
-        self.timeBook.append(time())
-        self.maybeSleep()
+        return self.limiter(private).wait(self.costs.get(command, 1))
+
+    async def acquire(self, command=None, private=False):
+        """ Async version of wait """
+        return await self.limiter(private).acquire(self.costs.get(command, 1))
+
+    def stats(self):
+        """ Returns queueing latency metrics per budget """
+        if self.private is self.public:
+            return {'all': self.public.stats()}
+        return {'public': self.public.stats(), 'private': self.private.stats()}
+
+
+# Kept for backwards compatibility
+Coach2 = Coach
 
 
 if __name__ == '__main__':
@@ -94,4 +163,5 @@ if __name__ == '__main__':
     for i in range(50):
         Logger.debug(Coach, i)
         sleep(random.uniform(0.1, 0.01))
-        coach.wait()
\ No newline at end of file
+        coach.wait()
+    Logger.debug(Coach, coach.stats())
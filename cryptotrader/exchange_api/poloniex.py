@@ -39,8 +39,14 @@ from itertools import chain as _chain
 from json import loads as _loads
 from time import sleep
 
-from requests import get as _get
-from requests import post as _post
+from requests import Session as _Session
+from requests.adapters import HTTPAdapter as _HTTPAdapter
+
+# Optional fast json decoder, used with jsonNums='fast'
+try:
+    from orjson import loads as _fast_loads
+except ImportError:
+    _fast_loads = None
 
 from ..exceptions import *
 # local
@@ -102,14 +108,21 @@ class Poloniex(object):
 
     def __init__(
             self, key=False, secret=False,
-            timeout=None, coach=None, jsonNums=False):
+            timeout=None, coach=None, jsonNums=False,
+            session=None, pool_size=10, compress=True,
+            url='https://poloniex.com'):
         """
         key = str api key supplied by Poloniex
         secret = str secret hash supplied by Poloniex
         timeout = int time in sec to wait for an api response
             (otherwise 'requests.exceptions.Timeout' is raised)
         coach = bool to indicate if the api coach should be used
-        jsonNums = datatype to use when parsing json ints and floats
+        jsonNums = datatype to use when parsing json ints and floats,
+            'fast' to decode native ints and floats with orjson, if installed
+        session = requests.Session to share, a pooled keep-alive one is created if None
+        pool_size = int max kept alive connections of the created session
+        compress = bool to ask for gzip compressed responses
+        url = str api base url
         # Time Placeholders: (MONTH == 30*DAYS)
         self.MINUTE, self.HOUR, self.DAY, self.WEEK, self.MONTH, self.YEAR
         """
@@ -123,11 +136,31 @@ class Poloniex(object):
         self.jsonNums = jsonNums
         # grab keys, set timeout
         self.key, self.secret, self.timeout = key, secret, timeout
+        # api endpoints
+        self.public_url = url + '/public?'
+        self.private_url = url + '/tradingApi'
+        # http session, keeps connections alive between calls
+        self.session = session
+        if not self.session:
+            self.session = self.make_session(pool_size, compress)
         # set time labels
         self.MINUTE, self.HOUR, self.DAY = 60, 60 * 60, 60 * 60 * 24
         self.WEEK, self.MONTH = self.DAY * 7, self.DAY * 30
         self.YEAR = self.DAY * 365
 
+    @staticmethod
+    def make_session(pool_size=10, compress=True):
+        """ Returns a requests.Session with a connection pool of
+        <pool_size> kept alive connections """
+        session = _Session()
+        adapter = _HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Connection': 'keep-alive',
+            'Accept-Encoding': 'gzip, deflate' if compress else 'identity'})
+        return session
+
     # -----------------Meat and Potatos---------------------------------------
     def _retry(func):
         """ retry decorator """
@@ -172,48 +205,50 @@ class Poloniex(object):
 
         # private?
         if cmdType == 'Private':
-            payload['url'] = 'https://poloniex.com/tradingApi'
+            payload['url'] = self.private_url
 
             # wait for coach
             if self.coach:
-                self.coach.wait()
+                self.coach.wait(command, private=True)
 
             # set nonce
             args['nonce'] = self.nonce
 
-            # add args to payload
-            payload['data'] = args
+            # encode once, the same body is signed and sent
+            body = _urlencode(args).encode('utf-8')
+            payload['data'] = body
 
             # sign data with our Secret
             sign = _new(
                 self.secret.encode('utf-8'),
-                _urlencode(args).encode('utf-8'),
+                body,
                 _sha512)
 
             # add headers to payload
             payload['headers'] = {'Sign': sign.hexdigest(),
-                                  'Key': self.key}
+                                  'Key': self.key,
+                                  'Content-Type': 'application/x-www-form-urlencoded'}
 
             # send the call
-            ret = _post(**payload)
+            ret = self.session.post(**payload)
 
             # return data
-            return self._handleReturned(ret.text)
+            return self._handleReturned(ret.content)
 
         # public?
         if cmdType == 'Public':
             # encode url
-            payload['url'] = 'https://poloniex.com/public?' + _urlencode(args)
+            payload['url'] = self.public_url + _urlencode(args)
 
             # wait for coach
             if self.coach:
-                self.coach.wait()
+                self.coach.wait(command)
 
             # send the call
-            ret = _get(**payload)
+            ret = self.session.get(**payload)
 
             # return data
-            return self._handleReturned(ret.text)
+            return self._handleReturned(ret.content)
 
     @property
     def nonce(self):
@@ -240,10 +275,13 @@ class Poloniex(object):
         raise ExchangeError("Invalid Command!: %s" % command)
 
     def _handleReturned(self, data):
-        """ Handles returned data from poloniex"""
+        """ Handles returned data from poloniex, raw bytes or str"""
         try:
             if not self.jsonNums:
                 out = _loads(data, parse_float=str)
+            elif self.jsonNums == 'fast':
+                # native ints and floats
+                out = _fast_loads(data) if _fast_loads else _loads(data)
             else:
                 out = _loads(data,
                              parse_float=self.jsonNums,
@@ -298,18 +336,18 @@ class Poloniex(object):
         trades between a range specified in UNIX timestamps by the "start" and
         "end" parameters. """
         if self.coach:
-            self.coach.wait()
+            self.coach.wait('marketTradeHist')
         args = {'command': 'returnTradeHistory',
                 'currencyPair': str(currencyPair).upper()}
         if start:
             args['start'] = start
         if end:
             args['end'] = end
-        ret = _get(
-            'https://poloniex.com/public?' + _urlencode(args),
+        ret = self.session.get(
+            self.public_url + _urlencode(args),
             timeout=self.timeout)
         # decode json
-        return self._handleReturned(ret.text)
+        return self._handleReturned(ret.content)
 
     def returnChartData(self, currencyPair, period=False,
                         start=False, end=False):
@@ -1,7 +1,8 @@
 import numpy as np
 import pandas as pd
-import talib as ta
-from cryptotrader.utils import safe_div
+from cryptotrader.utils import safe_div, lazy_import
+
+ta = lazy_import('talib')
 
 
 def price_relative(obs, period=1):
@@ -8,7 +8,8 @@ from chainer import initializer
 from chainer.initializers import Normal
 
 from time import time
-import pandas as pd
+
+from ..envs.vector import WindowSampler
 
 eps = 1e-8
 
@@ -185,46 +186,29 @@ class EIIE(chainer.Chain):
 
 
 # Train functions
-def get_target(obs, target_type):
-    n_cols = int(obs.shape[-1])
-    n_pairs = int((n_cols - 1) / 6)
-    target = np.zeros((1, n_pairs))
-    for i, j in enumerate([i for i in range(n_cols - 1) if i % 6 == 0]):
-        target[0, i] = np.expand_dims(obs[j + 3] / (obs[j] + 1e-8) - 1., -1)
-    if target_type == 'regression' or 'regressor':
-        return target
-    elif target_type == 'classifier' or 'classification':
-        return np.sign(target)
-    else:
-        raise TypeError("Bad target_type params.")
-
-
 def make_train_batch(env, batch_size, target_type):
-    obs_batch = []
-    target_batch = []
-    for i in range(batch_size):
-        # Choose some random index
-        env.index = np.random.randint(high=env.data_length, low=env.obs_steps)
-        # Give us some cash
-        env.portfolio_df = pd.DataFrame()
-        env.balance = env.init_balance
-        # Get obs and target and append it to their batches
-        obs = env.get_observation(True).astype(np.float32).values
-        xp = chainer.cuda.get_array_module(obs)
-        obs_batch.append(obs[:-1])
-        target_batch.append(get_target(obs[-1], target_type))
-
-    obs_batch = batch_states(obs_batch, xp, phi)
-    target_batch = np.swapaxes(batch_states(target_batch, xp, phi), 3, 2)
-
-    return obs_batch, target_batch
+    """
+    Random supervised batch from env data
+    :param env: BacktestEnvironment: Env whose data is sampled. Its sampler is built on first call
+    :param batch_size: int: Number of samples
+    :param target_type: str: 'regression' or 'classification'
+    :return: tuple: obs batch, target batch
+    """
+    sampler = getattr(env, 'sampler', None)
+    if sampler is None or sampler.target_type != target_type:
+        sampler = env.sampler = WindowSampler.from_env(env, target_type=target_type)
+
+    return sampler.sample(batch_size)
 
 
 def train_nn(nn, env, test_env, optimizer, batch_size, lr_decay_period, train_epochs,
-             test_interval, test_epochs, target_type, save_dir, name, prev_score=None):
+             test_interval, test_epochs, target_type, save_dir, name, prev_score=None, prefetch=2):
     ## Training loop
     t0 = 1e-8
 
+    # Build next train batches while the network trains
+    env.sampler = WindowSampler.from_env(env, target_type=target_type, prefetch=prefetch)
+
     if prev_score:
         assert isinstance(prev_score, float) or isinstance(prev_score, int), 'prev_score must be int or float.'
         best_score = prev_score
@@ -305,4 +289,6 @@ def train_nn(nn, env, test_env, optimizer, batch_size, lr_decay_period, train_ep
 
         except KeyboardInterrupt:
             print("\nInterrupted by the user. Best score:", best_score)
-            break
\ No newline at end of file
+            break
+
+    env.sampler.close()
\ No newline at end of file
@@ -1,14 +1,15 @@
 import numpy as np
-from scipy.stats import norm, t
-from cryptotrader.utils import safe_div
+from cryptotrader.utils import safe_div, lazy_import
+
+stats = lazy_import('scipy.stats')
 
 def fit_normal(ret):
-    mu_norm, sig_norm = norm.fit(ret)
+    mu_norm, sig_norm = stats.norm.fit(ret)
     return mu_norm, sig_norm
 
 
 def fit_t(ret):
-    parm = t.fit(ret)
+    parm = stats.t.fit(ret)
     nu, mu_t, sig_t = parm
     nu = np.round(nu)
     return mu_t, sig_t, nu
@@ -44,13 +45,13 @@ def ERI(R, Z, w):
 
 # Normal CVaR
 def CVaR(mu, sig, alpha=0.01):
-    return alpha ** -1 * norm.pdf(norm.ppf(alpha)) * sig - mu
+    return alpha ** -1 * stats.norm.pdf(stats.norm.ppf(alpha)) * sig - mu
 
 
 # Student T CVaR
 def TCVaR(mu, sig, nu, h=1, alpha=0.01):
-    xanu = t.ppf(alpha, nu)
-    return -1 / alpha * (1 - nu) ** (-1) * (nu - 2 + xanu ** 2) * t.pdf(xanu, nu) * sig - h * mu
+    xanu = stats.t.ppf(alpha, nu)
+    return -1 / alpha * (1 - nu) ** (-1) * (nu - 2 + xanu ** 2) * stats.t.pdf(xanu, nu) * sig - h * mu
 
 
 """
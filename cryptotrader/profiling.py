@@ -0,0 +1,264 @@
+"""
+Step level profiling of environments and agents
+
+A StepProfiler wraps the phases of one env and agent pair on the instances themselves, so nothing
+runs when no profiler is attached. Inclusive wall times are kept per phase, with counters for
+exchange API calls and DataFrame constructions, and a summary table is built at each episode end.
+An optional cProfile or pyinstrument capture covers the first steps after attach.
+"""
+import cProfile
+import io
+import pstats
+from functools import wraps
+from threading import Lock, get_ident
+from time import perf_counter
+
+from .utils import lazy_import
+
+import pandas as pd
+
+pyinstrument = lazy_import('pyinstrument')
+
+# Env and agent methods timed, nested phases are inclusive
+ENV_PHASES = ('step', 'get_observation', 'get_history', 'get_ohlc', 'simulate_trade', 'get_reward')
+AGENT_PHASES = ('rebalance',)
+# Data feed methods counted as API calls
+API_CALLS = ('returnChartData', 'returnChartDataBatch', 'returnBalances', 'returnFeeInfo', 'returnCurrencies',
+             'returnTicker', 'returnOrderBook', 'returnTradeHistory', 'buy', 'sell')
+
+# DataFrame.__init__ is patched once for every attached profiler, each counts the frames built by its thread
+frames_lock = Lock()
+frame_counters = {}
+frame_init = None
+
+
+def counted_init(frame, *args, **kwargs):
+    for profiler in frame_counters.get(get_ident(), ()):
+        profiler.frames += 1
+    frame_init(frame, *args, **kwargs)
+
+
+def start_frame_count(profiler):
+    """
+    Count the DataFrames the calling thread builds into profiler.frames
+    :return: int: Thread id
+    """
+    global frame_init
+    thread = get_ident()
+    with frames_lock:
+        if not frame_counters:
+            frame_init = pd.DataFrame.__init__
+            pd.DataFrame.__init__ = wraps(frame_init)(counted_init)
+        frame_counters[thread] = frame_counters.get(thread, ()) + (profiler,)
+    return thread
+
+
+def stop_frame_count(profiler, thread):
+    with frames_lock:
+        profilers = tuple(p for p in frame_counters.get(thread, ()) if p is not profiler)
+        if profilers:
+            frame_counters[thread] = profilers
+        else:
+            frame_counters.pop(thread, None)
+        if not frame_counters:
+            pd.DataFrame.__init__ = frame_init
+
+
+class StepProfiler(object):
+    """
+    Timers around env and agent phases.
+    Pass it to Agent.test or use attach and detach around any loop.
+    """
+    def __init__(self, count_frames=True, capture=None, capture_steps=100, verbose=True):
+        """
+        :param count_frames: bool: Count DataFrame constructions while attached
+        :param capture: str: None, 'cprofile' or 'pyinstrument'
+        :param capture_steps: int: Env steps covered by the capture
+        :param verbose: bool: Print the summary table at episode end
+        """
+        if capture not in (None, 'cprofile', 'pyinstrument'):
+            raise TypeError("Bad capture param.")
+
+        self.count_frames = count_frames
+        self.capture = capture
+        self.capture_steps = capture_steps
+        self.verbose = verbose
+
+        self.patched = []
+        self.frame_thread = None
+        self.capturer = None
+        self.capture_report = None
+        self.captured_steps = 0
+        self.episodes = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.times = {}
+        self.calls = {}
+        self.api_calls = {}
+        self.frames = 0
+        self.steps = 0
+
+    # Instrumentation
+    def wrap(self, obj, name, phase):
+        method = getattr(obj, name, None)
+        if method is None or not callable(method):
+            return
+
+        times = self.times
+        calls = self.calls
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            t0 = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                times[phase] = times.get(phase, 0.) + perf_counter() - t0
+                calls[phase] = calls.get(phase, 0) + 1
+
+        self.patch(obj, name, timed)
+
+    def count(self, obj, name):
+        method = getattr(obj, name, None)
+        if method is None or not callable(method):
+            return
+
+        api_calls = self.api_calls
+
+        @wraps(method)
+        def counted(*args, **kwargs):
+            api_calls[name] = api_calls.get(name, 0) + 1
+            return method(*args, **kwargs)
+
+        self.patch(obj, name, counted)
+
+    def patch(self, obj, name, func):
+        # Keep any instance attribute to restore it, class methods come back on delattr
+        self.patched.append((obj, name, obj.__dict__.get(name)))
+        setattr(obj, name, func)
+
+    def attach(self, env, agent=None):
+        """
+        Start timing an env and agent pair
+        :param env: TradingEnvironment instance
+        :param agent: Agent instance
+        """
+        if self.patched:
+            self.detach()
+
+        self.reset_stats()
+        # Bind counters after the reset so wrappers and tables share them
+        for phase in ENV_PHASES:
+            self.wrap(env, phase, phase)
+        if agent is not None:
+            for phase in AGENT_PHASES:
+                self.wrap(agent, phase, 'agent.' + phase)
+        for name in API_CALLS:
+            self.count(env.tapi, name)
+
+        # Step counter drives the capture window
+        step = env.step
+
+        @wraps(step)
+        def counted_step(*args, **kwargs):
+            try:
+                return step(*args, **kwargs)
+            finally:
+                self.steps += 1
+                self.captured_steps += 1
+                if self.capturer is not None and self.captured_steps >= self.capture_steps:
+                    self.stop_capture()
+
+        setattr(env, 'step', counted_step)
+
+        if self.count_frames:
+            self.frame_thread = start_frame_count(self)
+
+        if self.capture is not None:
+            self.start_capture()
+
+    def detach(self):
+        """
+        Remove every wrapper
+        """
+        if self.capturer is not None:
+            self.stop_capture()
+
+        if self.frame_thread is not None:
+            stop_frame_count(self, self.frame_thread)
+            self.frame_thread = None
+
+        for obj, name, previous in reversed(self.patched):
+            if previous is None:
+                obj.__dict__.pop(name, None)
+            else:
+                setattr(obj, name, previous)
+        self.patched = []
+
+    def start_capture(self):
+        self.captured_steps = 0
+        if self.capture == 'cprofile':
+            self.capturer = cProfile.Profile()
+            self.capturer.enable()
+        else:
+            self.capturer = pyinstrument.Profiler()
+            self.capturer.start()
+
+    def stop_capture(self):
+        if self.capture == 'cprofile':
+            self.capturer.disable()
+            out = io.StringIO()
+            pstats.Stats(self.capturer, stream=out).sort_stats('cumulative').print_stats(30)
+            self.capture_report = out.getvalue()
+        else:
+            self.capturer.stop()
+            self.capture_report = self.capturer.output_text()
+        self.capturer = None
+
+    # Reports
+    def summary(self):
+        """
+        Timing breakdown
+        :return: pandas DataFrame: calls, total seconds, ms per call and share of the step and rebalance time
+        """
+        loop_time = self.times.get('step', 0.) + self.times.get('agent.rebalance', 0.)
+        rows = [(phase, self.calls[phase], self.times[phase], 1e3 * self.times[phase] / self.calls[phase],
+                 100 * self.times[phase] / loop_time if loop_time else 0.)
+                for phase in list(ENV_PHASES) + ['agent.' + phase for phase in AGENT_PHASES] if phase in self.calls]
+        summary = pd.DataFrame.from_records(rows, columns=['phase', 'calls', 'total_s', 'per_call_ms', 'loop_pct'])
+        return summary.set_index('phase')
+
+    def counters(self):
+        """
+        :return: dict: Steps, DataFrames constructed and API calls by method
+        """
+        counters = {'steps': self.steps, 'frames': self.frames}
+        counters.update({'api.' + name: value for name, value in self.api_calls.items()})
+        return counters
+
+    def end_episode(self):
+        """
+        Store and optionally print the episode summary, then start a new one
+        :return: pandas DataFrame: Episode summary
+        """
+        # Read the frame counter first, the summary DataFrames are not counted
+        frames = self.frames
+        summary = self.summary()
+        counters = self.counters()
+        counters['frames'] = frames
+        self.episodes.append((summary, counters))
+
+        if self.verbose:
+            print("\n" + summary.to_string(float_format=lambda x: "%.4f" % x))
+            print(", ".join("%s: %d" % item for item in counters.items()))
+            if counters['steps']:
+                print("Frames per step: %.2f, API calls per step: %.2f" %
+                      (frames / counters['steps'], sum(self.api_calls.values()) / counters['steps']))
+
+        self.times.clear()
+        self.calls.clear()
+        self.api_calls.clear()
+        self.frames = 0
+        self.steps = 0
+        return summary
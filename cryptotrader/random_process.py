@@ -2,7 +2,9 @@ from __future__ import division
 
 import numpy as np
 
-from .utils import array_normalize
+from .utils import array_normalize, lazy_import
+
+signal = lazy_import('scipy.signal')
 
 np.random.seed(42)
 np_random = np.random.RandomState()
@@ -24,6 +26,77 @@ class RandomProcess(object):
     def reset_states(self):
         pass
 
+    def sample_block(self, n):
+        """
+        Next n samples at once
+        :param n: int: Number of steps
+        :return: numpy array: shape (n, size)
+        """
+        return np.stack([self.sample() for _ in range(n)])
+
+
+class BlockNoise(RandomProcess):
+    """
+    Serves a process samples one at a time out of blocks drawn with sample_block
+    """
+    def __init__(self, process, block_size=256):
+        """
+        :param process: RandomProcess: Process to draw from
+        :param block_size: int: Steps drawn per block
+        """
+        self.process = process
+        self.block_size = block_size
+        self.block = None
+        self.cursor = 0
+
+    @property
+    def size(self):
+        return self.process.size
+
+    def sample(self, observation=None):
+        if self.block is None or self.cursor >= self.block.shape[0]:
+            self.block = self.process.sample_block(self.block_size)
+            self.cursor = 0
+        sample = self.block[self.cursor]
+        self.cursor += 1
+        return sample
+
+    def reset_states(self):
+        # Samples left were drawn from the previous state
+        self.block = None
+        self.process.reset_states()
+
+
+class SinusoidalProcess(RandomProcess):
+    def __init__(self, period, size, blocksize, x0=None):
+        self.period = period
+        self.size = size
+        self.blocksize = blocksize
+        if x0 is None:
+            self.x0 = 2 * np.pi / self.period
+        else:
+            self.x0 = x0
+        self.reset_states()
+
+    def reset_states(self):
+        self.x = self.x0 + 2 * np.pi / self.period
+
+    def sample(self, observation=None):
+        out = np.sin(self.x + np.arange(self.size))
+        self.x += 2 * np.pi / self.period
+        return out
+
+    def sample_block(self, n=None):
+        """
+        Next n samples at once
+        :param n: int: Number of steps, defaults to blocksize
+        :return: numpy array: shape (n, size)
+        """
+        n = self.blocksize if n is None else n
+        x = self.x + 2 * np.pi / self.period * np.arange(n)
+        self.x += 2 * np.pi / self.period * n
+        return np.sin(x[:, None] + np.arange(self.size))
+
 
 class AnnealedGaussianProcess(RandomProcess):
     def __init__(self, mu, sigma, sigma_min, n_steps_annealing):
@@ -45,6 +118,22 @@ class AnnealedGaussianProcess(RandomProcess):
         sigma = max(self.sigma_min, self.m * float(self.n_steps) + self.c)
         return sigma
 
+    def block_shape(self, n):
+        """
+        Shape of n samples, size may be an int or a tuple
+        :return: tuple: (n,) + sample shape
+        """
+        return (n,) + tuple(np.atleast_1d(self.size))
+
+    def sigma_block(self, n):
+        """
+        current_sigma of the next n steps
+        :return: numpy array: shape (n, 1, ...), broadcasting against a block
+        """
+        steps = np.arange(self.n_steps, self.n_steps + n, dtype=np.float64)
+        sigma = np.maximum(self.sigma_min, self.m * steps + self.c)
+        return sigma.reshape((n,) + (1,) * (len(self.block_shape(n)) - 1))
+
 
 class GaussianWhiteNoiseProcess(AnnealedGaussianProcess):
     def __init__(self, mu=0., sigma=1., sigma_min=None, n_steps_annealing=1000, size=1):
@@ -56,6 +145,11 @@ class GaussianWhiteNoiseProcess(AnnealedGaussianProcess):
         self.n_steps += 1
         return sample
 
+    def sample_block(self, n):
+        block = self.mu + self.sigma_block(n) * np.random.normal(size=self.block_shape(n))
+        self.n_steps += n
+        return block
+
 
 # Based on http://math.stackexchange.com/questions/1287634/implementing-ornstein-uhlenbeck-in-matlab
 class OrnsteinUhlenbeckProcess(AnnealedGaussianProcess):
@@ -74,6 +168,23 @@ class OrnsteinUhlenbeckProcess(AnnealedGaussianProcess):
         self.n_steps += 1
         return x
 
+    def filter_block(self, n):
+        """
+        Next n process states, the recursion runs as one linear filter
+        :return: numpy array: shape (n,) + size
+        """
+        shape = self.block_shape(n)
+        shocks = self.sigma_block(n) * np.sqrt(self.dt) * np.random.normal(size=shape)
+        a = 1. - self.theta * self.dt
+        zi = a * np.broadcast_to(np.asarray(self.x_prev, dtype=np.float64), shape[1:])[None]
+        x, _ = signal.lfilter([1.], [1., -a], shocks + self.theta * self.mu * self.dt, axis=0, zi=zi)
+        self.x_prev = x[-1]
+        self.n_steps += n
+        return x
+
+    def sample_block(self, n):
+        return self.filter_block(n)
+
     def reset_states(self):
         self.x_prev = self.x0 if self.x0 is not None else np.zeros(self.size)
 
@@ -97,4 +208,15 @@ class ConstrainedOrnsteinUhlenbeckProcess(OrnsteinUhlenbeckProcess):
         if self.max_norm:
             x = self.max_norm * array_normalize(x)
 
+        return np.clip(x, *self.constrains)
+
+    def sample_block(self, n):
+        x = self.filter_block(n)
+
+        if self.max_norm:
+            # Float array_normalize per row, the last column takes the rounding
+            x = x / x.sum(axis=1, keepdims=True)
+            x[:, -1] += 1. - x.sum(axis=1)
+            x = self.max_norm * x
+
         return np.clip(x, *self.constrains)
\ No newline at end of file
@@ -1,7 +1,9 @@
 import hashlib
 import os
+import random as _random
 import struct
 import sys
+import threading
 
 import numpy as np
 
@@ -31,6 +33,56 @@ def np_random(seed=None):
     rng.seed(_int_list_from_bigint(hash_seed(seed)))
     return rng, seed
 
+def child_seed(seed, *keys):
+    """Seed of an independent child stream, ex: child_seed(seed, 'worker', 3, 'episode', 10).
+
+    Children of the same parent seed and keys are always the same, so parallel workers
+    can rebuild their streams without sharing a generator.
+
+    Args:
+        seed (Optional[int]): Parent seed. None gives None, an operating system seeded child.
+        keys: Hashable values naming the child.
+    """
+    if seed is None:
+        return None
+    keys = tuple(int(key) if isinstance(key, (integer_types, np.integer)) else key for key in keys)
+    hash = hashlib.sha512(repr((int(seed),) + keys).encode('utf8')).digest()
+    return _bigint_from_bytes(hash[:8])
+
+def spawn(seed, n, *keys):
+    """Seeds of n child streams, ex: one per worker.
+
+    Args:
+        seed (Optional[int]): Parent seed.
+        n (int): Number of children.
+        keys: Hashable values prefixing the child index.
+    """
+    return [child_seed(seed, *(keys + (i,))) for i in range(n)]
+
+class ThreadRandom(object):
+    """Stand in for the random module, ex: for libraries that only draw from it.
+
+    Threads that set their own random.Random draw from it, the others from the random module,
+    so parallel workers can run seeded without touching the process wide stream.
+    """
+    def __init__(self):
+        self.local = threading.local()
+
+    def use(self, rng):
+        """Set the calling thread stream.
+
+        Args:
+            rng (Optional[random.Random]): None falls back to the random module.
+
+        Returns the previous stream of the thread.
+        """
+        previous = getattr(self.local, 'rng', None)
+        self.local.rng = rng
+        return previous
+
+    def __getattr__(self, name):
+        return getattr(getattr(self.local, 'rng', None) or _random, name)
+
 def hash_seed(seed=None, max_bytes=8):
     """Any given evaluation is likely to have many PRNG's active at
     once. (Most commonly, because the environment is running in
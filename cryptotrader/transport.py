@@ -0,0 +1,168 @@
+"""
+Zero copy numpy array transport over zmq sockets
+
+Arrays travel as one multipart message: a json header frame describing every array
+followed by one raw frame per array. On the receiving side arrays are read-only views
+over the zmq frame buffers, so the payload is never copied and the frames live as long
+as any array referencing them.
+"""
+
+import json
+from time import time
+
+import numpy as np
+import zmq
+
+
+# Dtype serialization
+def encode_dtype(dtype):
+    """
+    Serialize a numpy dtype to a json friendly object
+    :param dtype: numpy dtype
+    :return: str for plain dtypes, list of fields for structured ones
+    """
+    dtype = np.dtype(dtype)
+    if dtype.fields is None:
+        return dtype.str
+    return dtype.descr
+
+
+def _descr_to_tuples(descr):
+    out = []
+    for field in descr:
+        field = list(field)
+        if isinstance(field[1], list):
+            field[1] = _descr_to_tuples(field[1])
+        if len(field) > 2:
+            field[2] = tuple(field[2])
+        out.append(tuple(field))
+    return out
+
+
+def decode_dtype(spec):
+    """
+    Rebuild a numpy dtype from encode_dtype output
+    :param spec: str or list: serialized dtype
+    :return: numpy dtype
+    """
+    if isinstance(spec, list):
+        return np.dtype(_descr_to_tuples(spec))
+    return np.dtype(spec)
+
+
+# Multipart array messages
+def _pack_header(arrays, extra=None):
+    md = dict(arrays=[dict(dtype=encode_dtype(A.dtype), shape=A.shape) for A in arrays])
+    if extra is not None:
+        md['extra'] = extra
+    return json.dumps(md).encode()
+
+
+def send_arrays(socket, arrays, flags=0, copy=False, track=False, block=True, extra=None):
+    """
+    Send a sequence of numpy arrays as a single multipart message
+    :param socket: zmq socket
+    :param arrays: iterable of numpy arrays
+    :param flags: zmq flags
+    :param copy: bool: let zmq copy the payload
+    :param track: bool: return a MessageTracker for the payload
+    :param block: bool: if False, return False instead of blocking
+    :param extra: json serializable object sent along with the header
+    :return: MessageTracker if track else None, False if would block
+    """
+    # Non contiguous arrays have no single buffer to hand to zmq
+    arrays = [np.ascontiguousarray(A) for A in arrays]
+    frames = [_pack_header(arrays, extra)] + arrays
+
+    if not block:
+        flags |= zmq.NOBLOCK
+    try:
+        return socket.send_multipart(frames, flags=flags, copy=copy, track=track)
+    except zmq.Again:
+        if block:
+            raise
+        return False
+
+
+def _unpack(frames, with_extra=False):
+    header = frames[0]
+    if isinstance(header, zmq.Frame):
+        header = header.bytes
+    md = json.loads(header.decode())
+
+    arrays = []
+    for spec, frame in zip(md['arrays'], frames[1:]):
+        buf = frame.buffer if isinstance(frame, zmq.Frame) else frame
+        # frombuffer keeps the memoryview, and through it the frame, alive
+        A = np.frombuffer(buf, dtype=decode_dtype(spec['dtype'])).reshape(spec['shape'])
+        A.flags.writeable = False
+        arrays.append(A)
+
+    if with_extra:
+        return arrays, md.get('extra')
+    return arrays
+
+
+def recv_arrays(socket, flags=0, copy=False, track=False, block=True, with_extra=False):
+    """
+    Receive a multipart message sent by send_arrays
+    :param socket: zmq socket
+    :param flags: zmq flags
+    :param copy: bool: receive bytes instead of zmq Frames
+    :param track: bool: track the frames
+    :param block: bool: if False, return False instead of blocking
+    :param with_extra: bool: also return the header extra object
+    :return: list of read-only numpy arrays, False if no message was available
+    """
+    if not block:
+        flags |= zmq.NOBLOCK
+    try:
+        frames = socket.recv_multipart(flags=flags, copy=copy, track=track)
+    except zmq.Again:
+        if block:
+            raise
+        return False
+    return _unpack(frames, with_extra)
+
+
+# Benchmark
+def benchmark(addr='inproc://transport_bench', shape=(1024, 1024), dtype='f8', n_msgs=100, copy=False):
+    """
+    Measure array round trip throughput over a PAIR socket pair
+    :param addr: str: zmq endpoint, ipc:// or inproc://
+    :param shape: tuple: array shape
+    :param dtype: array dtype
+    :param n_msgs: int: number of messages to send
+    :param copy: bool: zmq copy flag
+    :return: dict: messages per second and MB/s
+    """
+    ctx = zmq.Context.instance()
+    rx = ctx.socket(zmq.PAIR)
+    rx.bind(addr)
+    tx = ctx.socket(zmq.PAIR)
+    try:
+        tx.connect(addr)
+
+        A = np.random.random(shape).astype(dtype)
+        t0 = time()
+        for _ in range(n_msgs):
+            send_arrays(tx, [A], copy=copy)
+            recv_arrays(rx, copy=copy)
+        elapsed = time() - t0
+
+        return dict(addr=addr,
+                    copy=copy,
+                    msgs_per_sec=n_msgs / elapsed,
+                    mb_per_sec=n_msgs * A.nbytes / elapsed / 1e6)
+    finally:
+        tx.close(linger=0)
+        # Release the endpoint right away so it can be bound again
+        rx.unbind(addr)
+        rx.close(linger=0)
+
+
+if __name__ == '__main__':
+    for addr in ['inproc://transport_bench', 'ipc:///tmp/transport_bench.ipc']:
+        for copy in [True, False]:
+            print("%(addr)s copy=%(copy)s: %(msgs_per_sec).1f msg/s, %(mb_per_sec).1f MB/s" %
+                  benchmark(addr, copy=copy))
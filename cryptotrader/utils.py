@@ -1,4 +1,6 @@
 import logging
+import importlib
+import sys
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal, InvalidOperation, DivisionByZero, getcontext, Context
 from functools import partialmethod
@@ -9,6 +11,7 @@ from time import time, sleep
 import smtplib
 
 import numpy as np
+from .transport import send_arrays, recv_arrays
 # from bson import Decimal128
 import math
 
@@ -31,6 +34,36 @@ rew_quant = rew_con.create_decimal('0E-32')
 # Debug flag
 debug = True
 
+# Lazy imports
+class LazyModule(object):
+    """
+    Module placeholder importing the real module on first attribute access.
+    Keeps heavy optional dependencies off the import path of code that never uses them.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, item):
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                raise ImportError("%s is required for this feature: %s" % (self._name, e)) from e
+        return getattr(self._module, item)
+
+    def __repr__(self):
+        return "<lazy module '%s'%s>" % (self._name, '' if self._module is None else ' (loaded)')
+
+
+def lazy_import(name):
+    """
+    Return the module if already imported, a LazyModule otherwise
+    :param name: str: Full module name
+    """
+    return sys.modules.get(name) or LazyModule(name)
+
+
 # logger
 class Logger(object):
     logger = logging.getLogger('Cryptotrader')
@@ -188,6 +221,21 @@ def simplex_proj(y):
     return np.maximum(y - tmax, 0.)
 
 
+def simplex_proj_batch(y):
+    """ Projection of each row of y onto simplex, same thresholds as simplex_proj. """
+    y = np.asarray(y, dtype=np.float64)
+    m = y.shape[1]
+
+    s = -np.sort(-y, axis=1)
+    tmax = (np.cumsum(s, axis=1) - 1) / np.arange(1, m + 1)
+
+    # First ii with tmax >= s[ii + 1], else the whole row
+    hit = tmax[:, :-1] >= s[:, 1:]
+    ii = np.where(hit.any(axis=1), hit.argmax(axis=1), m - 1)
+
+    return np.maximum(y - tmax[np.arange(y.shape[0]), ii][:, None], 0.)
+
+
 def euclidean_proj_simplex(v, s=1):
     """ Compute the Euclidean projection on a positive simplex
     Solves the optimisation problem (using the algorithm from [1]):
@@ -289,38 +337,15 @@ def read(_socket, flags=0, block=True):
 
 def send_array(socket, A, flags=0, copy=False, track=False, block=True):
     """send a numpy array with metadata"""
-    md = dict(
-        dtype=str(A.dtype),
-        shape=A.shape,
-    )
-    if block:
-        socket.send_json(md, flags | zmq.SNDMORE)
-        return socket.send(A, flags, copy=copy, track=track)
-    else:
-        try:
-            socket.send_json(md, flags | zmq.SNDMORE | zmq.NOBLOCK)
-            return socket.send(A, flags| zmq.NOBLOCK, copy=copy, track=track)
-        except zmq.Again:
-            return False
+    return send_arrays(socket, [A], flags=flags, copy=copy, track=track, block=block)
 
 
 def recv_array(socket, flags=0, copy=False, track=False, block=True):
-    """recv a numpy array"""
-    if block:
-        md = socket.recv_json(flags=flags)
-        msg = socket.recv(flags=flags, copy=copy, track=track)
-        buf = bytearray(msg)
-        A = np.frombuffer(buf, dtype=md['dtype'])
-        return A.reshape(md['shape'])
-    else:
-        try:
-            md = socket.recv_json(flags=flags | zmq.NOBLOCK)
-            msg = socket.recv(flags=flags | zmq.NOBLOCK, copy=copy, track=track)
-            buf = bytearray(msg)
-            A = np.frombuffer(buf, dtype=md['dtype'])
-            return A.reshape(md['shape'])
-        except zmq.Again:
-            return False
+    """recv a numpy array as a read-only view over the received frame"""
+    arrays = recv_arrays(socket, flags=flags, copy=copy, track=track, block=block)
+    if arrays is False:
+        return False
+    return arrays[0]
 
 
 def send_email(emails, subject, body):
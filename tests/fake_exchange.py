@@ -0,0 +1,132 @@
+"""
+Local fake Poloniex HTTP server, for offline latency and throughput measurements
+
+Run as a script to benchmark the Poloniex client against it:
+    python -m tests.fake_exchange
+"""
+import gzip
+import json
+import threading
+from time import sleep, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+TICKER = {
+    "USDT_BTC": {"last": "4000.00000000", "lowestAsk": "4001.00000000", "highestBid": "3999.00000000",
+                 "percentChange": "0.01000000", "baseVolume": "1000000.00000000", "quoteVolume": "250.00000000"},
+    "USDT_ETH": {"last": "300.00000000", "lowestAsk": "300.10000000", "highestBid": "299.90000000",
+                 "percentChange": "0.02000000", "baseVolume": "500000.00000000", "quoteVolume": "1666.00000000"}
+}
+
+
+class FakePoloniexHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super(FakePoloniexHandler, self).setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def answer(self, args):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency:
+            sleep(self.server.latency)
+
+        command = args.get('command', [''])[0]
+        if command in self.server.responses:
+            return self.server.responses[command]
+        if command == 'returnTicker':
+            return TICKER
+        if command == 'returnChartData':
+            start, end, period = (int(float(args[k][0])) for k in ['start', 'end', 'period'])
+            return [{"date": t, "high": "1.1", "low": "0.9", "open": "1.0", "close": "1.0",
+                     "volume": "10.0", "quoteVolume": "10.0", "weightedAverage": "1.0"}
+                    for t in range(start - start % period, end, period)]
+        return {"error": "Invalid command."}
+
+    def do_GET(self):
+        self.reply(self.answer(parse_qs(urlparse(self.path).query)))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        if not self.headers.get('Sign') or not self.headers.get('Key'):
+            return self.reply({"error": "Invalid API key/secret pair."})
+        self.reply(self.answer(parse_qs(body)))
+
+
+class FakePoloniexServer(ThreadingHTTPServer):
+    """
+    Threaded http server answering Poloniex public and trading api calls with canned data
+    :param latency: float: seconds to wait before answering each request
+    :param responses: dict: command: reply overrides
+    """
+    daemon_threads = True
+
+    def __init__(self, latency=0., responses=None, port=0):
+        super(FakePoloniexServer, self).__init__(('127.0.0.1', port), FakePoloniexHandler)
+        self.latency = latency
+        self.responses = responses or {}
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def benchmark(api, n_calls=200):
+    """
+    Time sequential public calls
+    :param api: Poloniex instance pointing to the fake server
+    :return: dict: calls per second and mean latency in ms
+    """
+    t0 = time()
+    for _ in range(n_calls):
+        api.returnTicker()
+    elapsed = time() - t0
+    return dict(calls_per_sec=n_calls / elapsed, latency_ms=1e3 * elapsed / n_calls)
+
+
+if __name__ == '__main__':
+    from cryptotrader.exchange_api.poloniex import Poloniex
+
+    server = FakePoloniexServer().start()
+    try:
+        api = Poloniex(url=server.url)
+        # No client side rate limit against the local server
+        api.coach = None
+        print("keep-alive: %(calls_per_sec).1f calls/s, %(latency_ms).2f ms" % benchmark(api))
+
+        # One connection per call, as with module level requests.get
+        api.session.headers['Connection'] = 'close'
+        print("new connection per call: %(calls_per_sec).1f calls/s, %(latency_ms).2f ms" % benchmark(api))
+    finally:
+        server.stop()
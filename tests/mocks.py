@@ -1,5 +1,8 @@
 import pytest
 import mock
+import numpy as np
+import pandas as pd
+from cryptotrader.datafeed import BacktestDataFeed
 from cryptotrader.exchange_api.poloniex import Poloniex
 
 chart_data = [{'close': '5722.8374746',
@@ -9488,4 +9491,31 @@ tapi.configure_mock(**{'returnCurrencies.return_value': {'1CR': {'delisted': 1,
 
 tapi.pairs = ["USDT_BTC", "USDT_ETH"]
 
-tapi.data_length = len(chart_data)
\ No newline at end of file
+tapi.data_length = len(chart_data)
+
+
+# Synthetic backtest feed
+PAIRS = ['USDT_BTC', 'USDT_ETH']
+
+
+class Currencies(object):
+    pairs = []
+
+    def returnCurrencies(self):
+        return {'USDT': {}, 'BTC': {}, 'ETH': {}}
+
+
+def make_feed(length=60, seed=0):
+    feed = BacktestDataFeed(Currencies(), 30, PAIRS, balance={'BTC': '0.5', 'ETH': '0', 'USDT': '100'})
+    dates = np.arange(length) * 1800 + 1499999400
+    rng = np.random.RandomState(seed)
+    for i, pair in enumerate(PAIRS):
+        close = np.exp(np.cumsum(rng.randn(length) * 0.01)) * 100 * (i + 1)
+        open = np.r_[close[0], close[:-1]]
+        df = pd.DataFrame({'open': open, 'high': np.maximum(open, close) * 1.01,
+                           'low': np.minimum(open, close) * 0.99, 'close': close,
+                           'volume': rng.rand(length) * 1e3}).astype(str)
+        df['date'] = dates
+        feed.ohlc_data[pair] = df.set_index('date', drop=False)
+    feed.data_length = length
+    return feed
@@ -0,0 +1,60 @@
+"""
+Test live trading environment market snapshot
+"""
+from decimal import Decimal
+import numpy as np
+
+from cryptotrader.datafeed import ExchangeConnection
+from cryptotrader.envs.trading import LiveTradingEnvironment
+from cryptotrader.utils import convert_to
+
+
+class CountingFeed(ExchangeConnection):
+    pairs = ['USDT_BTC', 'USDT_ETH']
+
+    def __init__(self):
+        self.calls = {}
+        self.prices = {'USDT_BTC': '4000.00000000', 'USDT_ETH': '300.00000000'}
+
+    def count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def returnCurrencies(self):
+        return {'BTC': {}, 'ETH': {}, 'USDT': {}}
+
+    def returnTicker(self):
+        self.count('returnTicker')
+        return {pair: {'last': price, 'lowestAsk': price, 'highestBid': price} for pair, price in self.prices.items()}
+
+    def returnBalances(self):
+        self.count('returnBalances')
+        return {'BTC': '1.00000000', 'ETH': '10.00000000', 'USDT': '1000.00000000'}
+
+    def returnFeeInfo(self):
+        self.count('returnFeeInfo')
+        return {'takerFee': '0.00250000', 'makerFee': '0.00150000'}
+
+
+def test_snapshot_shared_within_step():
+    tapi = CountingFeed()
+    env = LiveTradingEnvironment(period=5, obs_steps=3, tapi=tapi, fiat='USDT', name='live_test')
+    # Fees are fetched once for all symbols on setup
+    assert tapi.calls['returnFeeInfo'] == 1
+
+    tapi.calls.clear()
+    env.snapshot.invalidate()
+    portval = env.calc_total_portval()
+    vector = env.calc_portfolio_vector()
+    desired = env.calc_desired_balance_array(convert_to.decimal(np.array([0.5, 0.25, 0.25])))
+    env.get_balance_array()
+
+    assert tapi.calls == {'returnTicker': 1, 'returnBalances': 1}
+    assert portval == Decimal('8000')
+    assert vector.sum() == Decimal('1')
+    assert desired[0] == Decimal('1')
+
+    # Invalidation refetches
+    tapi.prices['USDT_BTC'] = '5000.00000000'
+    env.snapshot.invalidate()
+    assert env.calc_total_portval() == Decimal('9000')
+    assert tapi.calls == {'returnTicker': 2, 'returnBalances': 2}
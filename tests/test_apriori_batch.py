@@ -0,0 +1,143 @@
+"""
+Test portfolio batch mode of apriori strategies
+"""
+import numpy as np
+import pytest
+
+from cryptotrader.agents import apriori
+from cryptotrader.envs.trading import BacktestEnvironment
+from cryptotrader.utils import safe_div, simplex_proj
+
+from .mocks import make_feed
+
+
+def last_relative(obs):
+    prices = obs.xs('open', level=1, axis=1).astype(np.float64).values
+    return np.append(prices[-1] / prices[-2], [1.0])
+
+
+PARAMS = {'PAMR': [{'eps': 0.5, 'C': 10., 'variant': 'PAMR0'}, {'eps': 0.9, 'C': 10., 'variant': 'PAMR1'},
+                   {'eps': 1.1, 'C': 0.5, 'variant': 'PAMR2'}],
+          'OLMAR': [{'eps': 2., 'window': 3}, {'eps': 10., 'window': 5}, {'eps': 1.5, 'window': 30}],
+          'CWMR': [{'eps': -0.5, 'confidence': 0.95}, {'eps': 0.1, 'confidence': 0.7}, {'eps': -0.2, 'confidence': 0.9}],
+          'TCO': [{'toff': 0.}, {'toff': 0.01}, {'toff': 0.1}]}
+
+
+@pytest.fixture(scope='module')
+def observations():
+    env = BacktestEnvironment(30, 10, make_feed(length=40), 'USDT', 'batch_test')
+    rng = np.random.RandomState(0)
+    obs = [env.reset()]
+    for _ in range(12):
+        obs.append(env.step(rng.dirichlet(np.ones(3)))[0])
+    return obs
+
+
+@pytest.mark.parametrize('name', sorted(PARAMS))
+def test_batch_matches_single(name, observations):
+    cls = apriori.get(name)
+    kwargs = {'factor': last_relative, 'optimize_factor': False} if name == 'TCO' else {}
+    params = PARAMS[name]
+
+    batch = cls(fiat='USDT', **kwargs)
+    batch.set_batch(len(params), **{key: [p[key] for p in params] for key in params[0]})
+
+    singles = []
+    for p in params:
+        agent = cls(fiat='USDT', **kwargs)
+        agent.set_params(**p)
+        singles.append(agent)
+
+    for step, obs in enumerate(observations):
+        out = batch.rebalance_batch(obs)
+        for i, agent in enumerate(singles):
+            if not step:
+                agent.b = agent.rebalance(obs)
+            elif name == 'TCO':
+                agent.b = agent.update(agent.b.copy(), safe_div(agent.factor(obs) + 1, agent.b + 1))
+            else:
+                agent.step = step
+                agent.b = agent.update(agent.b.copy(), agent.predict(obs))
+            np.testing.assert_allclose(out[i], agent.b, rtol=1e-7, atol=1e-10)
+
+    assert apriori.spec(name).batched
+
+
+def dense_cwmr_update(agent, b, x):
+    # Reference update with the two dense inversions
+    m = len(x)
+    sigma, theta, eps = agent.sigma, agent.theta, agent.eps
+    M = b.dot(x)
+    V = x.dot(sigma).dot(x)
+    x_upper = np.diag(sigma).dot(x) / np.trace(sigma)
+    foo = (V - x_upper * x.dot(sigma.sum(axis=1))) / M ** 2 + V * theta ** 2 / 2.
+    a = foo ** 2 - V ** 2 * theta ** 4 / 4
+    b_ = 2 * (eps - np.log(M)) * foo
+    c = (eps - np.log(M)) ** 2 - V * theta ** 2
+    lam = min(max(0, (-b_ + np.sqrt(b_ ** 2 - 4 * a * c)) / (2. * a), (-b_ - np.sqrt(b_ ** 2 - 4 * a * c)) / (2. * a)),
+              1e7)
+    U_sqroot = 0.5 * (-lam * theta * V + np.sqrt(lam ** 2 * theta ** 2 * V ** 2 + 4 * V))
+    mu = b - lam * sigma.dot(x - x_upper) / M
+    sigma = np.linalg.inv(np.linalg.inv(sigma) + theta * lam / U_sqroot * x[0] ** 2 * np.ones((m, m)))
+    return simplex_proj(mu), sigma / (m ** 2 * np.trace(sigma))
+
+
+def test_cwmr_matches_dense_update():
+    rng = np.random.RandomState(2)
+    agent = apriori.get('CWMR')(eps=-0.5, confidence=0.95)
+    m = 30
+    agent.sigma = np.eye(m) / m ** 2
+    b = np.ones(m) / m
+    for _ in range(20):
+        x = np.append(np.exp(rng.randn(m - 1) * 0.02), [1.])
+        expected, sigma = dense_cwmr_update(agent, b, x)
+        b = agent.update(b.copy(), x)
+        np.testing.assert_allclose(b, expected, rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(agent.sigma, sigma, rtol=1e-6, atol=1e-10)
+
+
+@pytest.mark.parametrize('combiner', ['adahedge', 'exp'])
+def test_mixture_of_experts(combiner, observations):
+    def make_experts():
+        return [apriori.get('PAMR')(eps=0.5, fiat='USDT'), apriori.get('PAMR')(eps=0.9, variant='PAMR2', fiat='USDT'),
+                apriori.get('OLMAR')(window=3, eps=2., fiat='USDT'), apriori.get('OLMAR')(window=5, eps=10., fiat='USDT'),
+                apriori.get('CWMR')(fiat='USDT'), apriori.get('ConstantRebalance')(fiat='USDT')]
+
+    batched = apriori.get('MixtureOfExperts')(make_experts(), combiner=combiner, fiat='USDT')
+    single = apriori.get('MixtureOfExperts')(make_experts(), combiner=combiner, batch=False, fiat='USDT')
+    assert sum(host is not None for host, _ in batched.groups) == 2
+
+    for step, obs in enumerate(observations):
+        batched.step = single.step = step
+        b = batched.rebalance(obs)
+        np.testing.assert_allclose(b, single.rebalance(obs), rtol=1e-7, atol=1e-10)
+        assert b.sum() == pytest.approx(1.) and np.all(b >= 0)
+
+    assert batched.w.sum() == pytest.approx(1.)
+    assert set(batched.timing) == set(batched.labels)
+
+
+def test_shared_price_features(observations):
+    pamr, olmar, cwmr = apriori.get('PAMR')(fiat='USDT'), apriori.get('OLMAR')(fiat='USDT'), apriori.get('CWMR')(fiat='USDT')
+    olmar.set_batch(2, window=[3, 30])
+    for obs in observations[1:]:
+        features = pamr.price_features(obs)
+        np.testing.assert_allclose(features['relative'], last_relative(obs))
+        np.testing.assert_allclose(pamr.predict(obs, features), pamr.predict(obs))
+        np.testing.assert_allclose(cwmr.predict(obs, features), cwmr.predict(obs))
+        np.testing.assert_allclose(olmar.predict_batch(obs, features), olmar.predict_batch(obs))
+
+
+def test_mixture_experts_follow_own_portfolios(observations):
+    experts = [apriori.get('PAMR')(eps=0.5, fiat='USDT'), apriori.get('OLMAR')(window=3, eps=2., fiat='USDT'),
+               apriori.get('CWMR')(fiat='USDT')]
+    alone = [apriori.get('PAMR')(eps=0.5, fiat='USDT'), apriori.get('OLMAR')(window=3, eps=2., fiat='USDT'),
+             apriori.get('CWMR')(fiat='USDT')]
+    mixture = apriori.get('MixtureOfExperts')(experts, fiat='USDT')
+
+    for step, obs in enumerate(observations):
+        mixture.step = step
+        mixture.rebalance(obs)
+        # Standalone batches of one update from their own last portfolio, whatever the env holds
+        expected = np.vstack([agent.rebalance_batch(obs) for agent in alone])
+        np.testing.assert_allclose(mixture.portfolios, expected, rtol=1e-7, atol=1e-10)
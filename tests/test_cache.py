@@ -0,0 +1,91 @@
+"""
+Test parameter sweep evaluation cache
+"""
+import numpy as np
+
+from cryptotrader.agents import apriori
+from cryptotrader.agents.cache import EvaluationCache, fingerprint
+from cryptotrader.envs.trading import BacktestEnvironment
+
+from .mocks import make_feed
+
+
+def make_env(seed=0):
+    env = BacktestEnvironment(30, 10, make_feed(length=60, seed=seed), 'USDT', 'cache_test')
+    env.reset()
+    return env
+
+
+def test_fingerprint():
+    env = make_env()
+    assert fingerprint(env) == fingerprint(make_env())
+    assert fingerprint(env) != fingerprint(make_env(seed=1))
+    env.set_window(20, 40)
+    assert fingerprint(env) != fingerprint(make_env())
+
+
+def test_cache_key_normalizes_params(tmpdir):
+    cache = EvaluationCache(str(tmpdir.join('cache.sqlite')))
+    agent = apriori.get('OLMAR')(fiat='USDT')
+    key, params = cache.key(agent, agent.normalize_params(eps=5., window=7.2), 'data', {'seed': 0})
+    assert cache.key(agent, agent.normalize_params(eps=5., window=7.9), 'data', {'seed': 0})[0] == key
+    assert cache.key(agent, agent.normalize_params(eps=5., window=8.1), 'data', {'seed': 0})[0] != key
+    assert cache.key(agent, agent.normalize_params(eps=5., window=7.2), 'data', {'seed': 1})[0] != key
+
+    assert cache.get(key) is None
+    cache.put(key, params, 0.5, 0.1)
+    assert cache.get(key) == (0.5, 0.1)
+    assert cache.hit_rate == 0.5
+
+
+def test_cache_key_agent_config(tmpdir):
+    cache = EvaluationCache(str(tmpdir.join('cache.sqlite')))
+    cwmr = apriori.get('CWMR')
+    params = {'eps': -0.5}
+    key = cache.key(cwmr(var=0, fiat='USDT'), params, 'data', {'seed': 0})[0]
+    assert cache.key(cwmr(var=0, fiat='USDT'), params, 'data', {'seed': 0})[0] == key
+    assert cache.key(cwmr(var=1, fiat='USDT'), params, 'data', {'seed': 0})[0] != key
+    assert cache.key(cwmr(var=0, rebalance=False, fiat='USDT'), params, 'data', {'seed': 0})[0] != key
+
+    # Searched parameters come from params, not from the agent
+    assert cache.key(cwmr(eps=-0.1, var=0, fiat='USDT'), params, 'data', {'seed': 0})[0] == key
+
+    # Run state stays out of the configuration
+    agent = cwmr(var=0, fiat='USDT')
+    agent.step = 10
+    agent.log['x'] = 1
+    agent.test_rewards = [0.1]
+    assert cache.key(agent, params, 'data', {'seed': 0})[0] == key
+
+
+def test_fit_reuses_evaluations(tmpdir):
+    path = str(tmpdir.join('cache.sqlite'))
+    space = {'eps': [0., 20.], 'window': [2, 10]}
+
+    cache = EvaluationCache(path)
+    first = apriori.get('OLMAR')(fiat='USDT').fit(make_env(), 6, 1, space, verbose=0, cache=cache,
+                                                  episode_seed=3)[0]
+    assert 0 < len(cache) <= 6
+    cache.close()
+
+    # A resumed sweep reads every evaluation from disk
+    cache = EvaluationCache(path)
+    np.random.seed(11)
+    again = apriori.get('OLMAR')(fiat='USDT').fit(make_env(), 6, 1, space, verbose=0, cache=cache,
+                                                  episode_seed=3)[0]
+    assert again == first
+    assert cache.misses == 0 and cache.hit_rate == 1.
+
+
+def test_refit_same_agent(tmpdir):
+    cache = EvaluationCache(str(tmpdir.join('cache.sqlite')))
+    space = {'eps': [0., 20.], 'window': [2, 10]}
+    agent = apriori.get('OLMAR')(fiat='USDT')
+    env = make_env()
+
+    first = agent.fit(env, 6, 1, space, verbose=0, cache=cache, episode_seed=3)[0]
+    cache.reset_stats()
+
+    # A notebook re-run on the same agent object reads every evaluation back
+    assert agent.fit(env, 6, 1, space, verbose=0, cache=cache, episode_seed=3)[0] == first
+    assert cache.misses == 0 and cache.hits == 6
@@ -0,0 +1,78 @@
+"""
+Test api rate limiter
+"""
+import asyncio
+import pytest
+
+from cryptotrader.exchange_api.coach import Coach, RateLimiter
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.t = 100.
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, dt):
+        self.t += dt
+
+
+def test_rate_limiter_burst_then_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(callLimit=6, timeFrame=1.2, burst=6, clock=clock, sleep=clock.sleep)
+
+    # Full burst goes through right away
+    assert [limiter.wait() for _ in range(6)] == [0.] * 6
+    # Then one call per interval
+    assert limiter.wait() == pytest.approx(0.2)
+    assert limiter.wait() == pytest.approx(0.2)
+
+    # Idle time refills the bucket
+    clock.t += 10
+    assert [limiter.wait() for _ in range(6)] == [0.] * 6
+
+    stats = limiter.stats()
+    assert stats['calls'] == 14
+    assert stats['delayed'] == 2
+    assert stats['maxWait'] == pytest.approx(0.2)
+
+
+def test_rate_limiter_never_exceeds_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(callLimit=6, timeFrame=1.1, clock=clock, sleep=clock.sleep)
+    times = []
+    for _ in range(100):
+        limiter.wait()
+        times.append(clock.t)
+    # any window of timeFrame secs holds at most callLimit calls
+    for i in range(len(times) - 6):
+        assert times[i + 6] - times[i] >= 1.1 - 1e-9
+
+
+def test_coach_budgets_and_costs():
+    clock = FakeClock()
+    coach = Coach(timeFrame=1., callLimit=4, privateTimeFrame=1., privateCallLimit=2,
+                  costs={'returnOrderBook': 2}, clock=clock, sleep=clock.sleep)
+
+    # heavy command takes two units
+    assert coach.wait('returnOrderBook') == 0.
+    assert coach.wait('returnTicker') == pytest.approx(0.5)
+    assert coach.wait('returnTicker') == pytest.approx(0.25)
+
+    # private budget is independent
+    assert coach.wait('buy', private=True) == 0.
+    assert coach.wait('sell', private=True) == pytest.approx(0.5)
+
+    assert set(coach.stats()) == {'public', 'private'}
+
+
+def test_coach_async_acquire():
+    coach = Coach(timeFrame=0.05, callLimit=1)
+
+    async def calls():
+        return await asyncio.gather(*[coach.acquire() for _ in range(3)])
+
+    waits = sorted(asyncio.run(calls()))
+    assert waits[0] == 0.
+    assert waits[-1] == pytest.approx(0.1, abs=0.02)
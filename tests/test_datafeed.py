@@ -0,0 +1,237 @@
+"""
+Test datafeed module
+"""
+import threading
+from time import sleep
+import pytest
+
+from cryptotrader.datafeed import ResponseCache, FeedDaemon
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.t = 0.
+
+    def __call__(self):
+        return self.t
+
+
+def test_response_cache_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(clock=clock)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get('ticker', fetch, 0.5) == 1
+    assert cache.get('ticker', fetch, 0.5) == 1
+    clock.t = 0.6
+    assert cache.get('ticker', fetch, 0.5) == 2
+
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2
+
+
+def test_response_cache_coalescing():
+    cache = ResponseCache()
+    calls = []
+    gate = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        gate.wait()
+        return 'rep'
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.get('chart', fetch, 0))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.stats()['misses'] + cache.stats()['coalesced'] < 8:
+        sleep(0.001)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert out == ['rep'] * 8
+    # zero ttl does not store the reply
+    assert len(cache) == 0
+
+
+def test_response_cache_error_not_cached():
+    cache = ResponseCache()
+
+    def fail():
+        raise ValueError('upstream')
+
+    with pytest.raises(ValueError):
+        cache.get('key', fail, 10)
+    assert cache.get('key', lambda: 'ok', 10) == 'ok'
+
+
+def test_response_cache_max_size():
+    clock = FakeClock()
+    cache = ResponseCache(max_size=4, clock=clock)
+    for i in range(10):
+        cache.get(i, lambda: i, 10 + i)
+    assert len(cache) == 4
+
+
+def test_feed_daemon_ttl():
+    daemon = FeedDaemon(cache_ttl={'returnTicker': 1})
+    assert daemon.get_ttl(('polo', 'returnTicker')) == 1
+    assert daemon.get_ttl(('polo', 'returnBalances')) is None
+    assert 0 < daemon.get_ttl(('polo', 'returnChartData', {'period': '300'})) <= 300
+
+
+def test_feed_daemon_cache_key():
+    from datetime import datetime
+    daemon = FeedDaemon(cache_ttl={'returnTicker': 1000})
+    call = daemon.handle_req('polo returnChartData btc_eth 300 1000.5 2099.9')
+    # Requests returning the same candles share an entry
+    assert daemon.cache_key(call) == ('polo', 'returnChartData', 'BTC_ETH', 300, 1200, 1800)
+    assert daemon.cache_key(daemon.handle_req('polo returnChartData BTC_ETH 300 1200 1801')) == \
+        daemon.cache_key(call)
+    assert daemon.cache_key(daemon.handle_req('polo returnChartData BTC_ETH 300 1200 2100')) != \
+        daemon.cache_key(call)
+    assert daemon.cache_key(daemon.handle_req('polo returnOrderBook btc_eth 20')) == \
+        daemon.cache_key(('polo', 'returnOrderBook', {'depth': '20', 'currencyPair': 'BTC_ETH'}))
+
+    # Replies holding the candle in progress expire like a ticker
+    assert daemon.get_ttl(daemon.handle_req('polo returnChartData BTC_ETH 300 None None')) == 1000
+    now = datetime.utcnow().timestamp()
+    closed = daemon.handle_req('polo returnChartData BTC_ETH 300 0 %f' % (now - now % 300 - 1))
+    assert 0 < daemon.get_ttl(closed) <= 300
+
+
+def test_subscriber_rolling_window(monkeypatch):
+    import json
+    import zmq
+    from cryptotrader.datafeed import DataFeed, SubscriberDataFeed
+
+    pub = zmq.Context.instance().socket(zmq.PUB)
+    pub.bind('ipc:///tmp/test_feed_pub.ipc')
+    feed = SubscriberDataFeed('polo', addr='ipc:///tmp/test_feed.ipc', sub_addr='ipc:///tmp/test_feed_pub.ipc',
+                              pairs=['BTC_ETH'], period=300, window=3)
+    try:
+        # Wait for the subscription to go through
+        for _ in range(500):
+            pub.send_multipart([b'polo ticker', json.dumps({'BTC_ETH': {'last': '0.05'}}).encode()])
+            if feed.ticker:
+                break
+            sleep(0.01)
+        assert feed.returnTicker()['BTC_ETH']['last'] == '0.05'
+
+        for date in [0, 300, 600, 900]:
+            feed.on_message(['polo', 'candle', 'BTC_ETH'], {'date': date, 'close': '1'})
+        # Stale and repeated candles are ignored, window is bounded
+        feed.on_message(['polo', 'candle', 'BTC_ETH'], {'date': 600, 'close': '1'})
+        assert [c['date'] for c in feed.candles['BTC_ETH']] == [300, 600, 900]
+
+        assert feed.covers('BTC_ETH', 300, 300, 1200)
+        assert not feed.covers('BTC_ETH', 300, 0, 1200)
+        assert not feed.covers('BTC_ETH', 900, 300, 1200)
+        # Closed bars come from the window, the open one from the REQ path
+        requests = []
+
+        def req(self, pair, period, start=None, end=None):
+            requests.append((start, end))
+            return [{'date': 900, 'close': '1'}, {'date': 1200, 'close': '2'}]
+
+        monkeypatch.setattr(DataFeed, 'returnChartData', req)
+        assert [c['date'] for c in feed.returnChartData('BTC_ETH', 300, 600, 1199)] == [600, 900]
+        assert not requests
+        assert [c['date'] for c in feed.returnChartData('BTC_ETH', 300, 600, 1200)] == [600, 900, 1200]
+        assert requests == [(1200, 1200)]
+
+        # A broadcast candle in progress serves the open bar, following the ticker
+        feed.on_message(['polo', 'open', 'BTC_ETH'], {'date': 1200, 'open': '1', 'high': '1.5', 'low': '1',
+                                                      'close': '1'})
+        feed.on_message(['polo', 'ticker'], {'BTC_ETH': {'last': '2'}})
+        bars = feed.returnChartData('BTC_ETH', 300, 600, 1200)
+        assert [c['date'] for c in bars] == [600, 900, 1200] and len(requests) == 1
+        assert (bars[-1]['close'], bars[-1]['high'], bars[-1]['low']) == (2., 2., 1.)
+        # Stale candles in progress and bars past it go through the REQ path
+        feed.open_bars['BTC_ETH'] = (feed.open_bars['BTC_ETH'][0], 0)
+        feed.returnChartData('BTC_ETH', 300, 600, 1200)
+        assert len(requests) == 2
+        # Closing the candle drops it
+        feed.on_message(['polo', 'candle', 'BTC_ETH'], {'date': 1200, 'close': '2'})
+        assert not feed.open_bars
+    finally:
+        feed.close()
+        pub.close(linger=0)
+
+
+def test_async_datafeed_pipelining():
+    import asyncio
+    import json
+    import zmq
+    from cryptotrader.datafeed import AsyncDataFeed
+
+    addr = 'ipc:///tmp/test_async_feed.ipc'
+    server = zmq.Context.instance().socket(zmq.ROUTER)
+    server.bind(addr)
+    pairs = ['BTC_ETH', 'BTC_LTC', 'BTC_XMR']
+
+    def serve():
+        # Hold every request, then answer in reverse order
+        reqs = [server.recv_multipart() for _ in pairs]
+        for frames in reversed(reqs):
+            pair = frames[-1].decode().split(' ')[2]
+            rep = [{'date': 300, 'open': '1', 'close': '1', 'pair': pair}]
+            server.send_multipart(frames[:-1] + [json.dumps(rep).encode()])
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+
+    async def gather():
+        async with AsyncDataFeed('polo', addr, timeout=5) as feed:
+            return await feed.gatherChartData(pairs, 300)
+
+    try:
+        out = asyncio.run(gather())
+    finally:
+        thread.join()
+        server.close(linger=0)
+
+    assert {pair: rep[0]['pair'] for pair, rep in out.items()} == {pair: pair for pair in pairs}
+
+
+def test_datafeed_batch_reuses_loop():
+    import json
+    import zmq
+    from cryptotrader.datafeed import DataFeed
+
+    addr = 'ipc:///tmp/test_batch_feed.ipc'
+    server = zmq.Context.instance().socket(zmq.ROUTER)
+    server.bind(addr)
+    pairs = ['BTC_ETH', 'BTC_LTC']
+    clients = set()
+
+    def serve():
+        for _ in range(2 * len(pairs)):
+            frames = server.recv_multipart()
+            clients.add(frames[0])
+            pair = frames[-1].decode().split(' ')[2]
+            rep = [{'date': 300, 'open': '1', 'close': '1', 'pair': pair}]
+            server.send_multipart(frames[:-1] + [json.dumps(rep).encode()])
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    feed = DataFeed('polo', addr, timeout=5)
+    try:
+        outs = [feed.returnChartDataBatch(pairs, 300) for _ in range(2)]
+        loop_thread = feed._batch_thread
+    finally:
+        thread.join(5)
+        feed.close_batch()
+        server.close(linger=0)
+
+    assert all({pair: rep[0]['pair'] for pair, rep in out.items()} == {pair: pair for pair in pairs}
+               for out in outs)
+    # Both batches went through the same DEALER socket and loop thread
+    assert len(clients) == 1
+    assert not loop_thread.is_alive() and feed._batch_loop is None
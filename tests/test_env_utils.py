@@ -0,0 +1,56 @@
+"""
+Test synthetic market generator
+"""
+import numpy as np
+
+from cryptotrader.envs.utils import ou_filter, annealed_sigma, generate_market, PRICE_COMPONENTS
+from cryptotrader.random_process import OrnsteinUhlenbeckProcess, ConstrainedOrnsteinUhlenbeckProcess
+
+
+def test_ou_filter_matches_process():
+    process = OrnsteinUhlenbeckProcess(theta=5., mu=0.3, sigma=2., sigma_min=0.5, n_steps_annealing=50, size=3)
+    np.random.seed(7)
+    expected = np.stack([process.sample() for _ in range(120)])
+
+    np.random.seed(7)
+    noise = np.random.normal(size=(120, 3))
+    sigma = annealed_sigma(2., 0.5, 50, 120)[:, None]
+    x = ou_filter(sigma * np.sqrt(process.dt) * noise, process.theta, process.mu, process.dt)
+
+    np.testing.assert_allclose(x, expected, rtol=1e-10, atol=1e-12)
+
+
+def test_generate_market_streams():
+    prices, volumes, regimes = generate_market(500, 3, periods=[100, 200, 300], seed=11, regimes=(1., 2.),
+                                               switch_prob=0.05)
+    assert prices.shape == volumes.shape == (500, 3)
+    assert np.all(prices >= 2.) and np.all(volumes > 0)
+    assert set(np.unique(regimes)) == {0, 1}
+
+    again, _, _ = generate_market(500, 3, periods=[100, 200, 300], seed=11, regimes=(1., 2.), switch_prob=0.05)
+    np.testing.assert_array_equal(prices, again)
+
+    # Adding assets leaves the others paths untouched
+    more, _, _ = generate_market(500, 4, periods=[100, 200, 300, 400], seed=11, regimes=(1., 2.), switch_prob=0.05)
+    np.testing.assert_array_equal(prices, more[:, :3])
+
+    corr = np.array([[1., 0.99], [0.99, 1.]])
+    prices, _, _ = generate_market(2000, 2, seed=3, corr=corr, components=((1., 0., 10., None, 1),))
+    returns = np.diff(prices, axis=0)
+    assert np.corrcoef(returns.T)[0, 1] > 0.5
+
+
+def test_price_components_match_signal_processes():
+    # generate_signal sampled ConstrainedOrnsteinUhlenbeckProcess, which runs with mu=0, sigma=1, dt=1e-2
+    for theta, mu, sigma, sigma_min, n_annealing in PRICE_COMPONENTS:
+        process = ConstrainedOrnsteinUhlenbeckProcess(size=(1,), theta=theta, mu=1.0, sigma=100.0,
+                                                      sigma_min=50.0, n_steps_annealing=n_annealing)
+        np.random.seed(5)
+        expected = np.stack([process.sample() for _ in range(200)])
+
+        np.random.seed(5)
+        noise = np.random.normal(size=(200, 1))
+        sigma = annealed_sigma(sigma, sigma_min, n_annealing, 200)[:, None]
+        x = ou_filter(sigma * np.sqrt(1e-2) * noise, theta, mu, 1e-2)
+
+        np.testing.assert_allclose(x, expected, rtol=1e-10, atol=1e-12)
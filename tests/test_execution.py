@@ -0,0 +1,126 @@
+"""
+Test order book execution engine
+"""
+import threading
+from decimal import Decimal
+from time import sleep
+
+from cryptotrader.envs.execution import ExecutionEngine, book_vwap
+
+BOOK = {'asks': [['1.0', '2'], ['1.1', '2'], ['1.2', '10']],
+        'bids': [['0.9', '1'], ['0.8', '3'], ['0.7', '10']],
+        'isFrozen': '0'}
+
+
+class FakeExchange(object):
+    """ Fills immediate or cancel orders against a static book """
+    threadsafe = True
+
+    def __init__(self, fill_ratio=Decimal('1'), latency=0., trades=False):
+        self.fill_ratio = fill_ratio
+        self.latency = latency
+        self.trades = trades
+        self.closed = set()
+        self.orders = []
+        self.books = 0
+        self.threads = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def returnOrderBook(self, pair, depth):
+        with self.lock:
+            self.books += 1
+            self.threads.add(threading.current_thread().name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        sleep(self.latency)
+        with self.lock:
+            self.active -= 1
+        return BOOK
+
+    def fill(self, side, pair, rate, amount, orderType):
+        with self.lock:
+            self.orders.append((side, pair, Decimal(rate), Decimal(amount)))
+        filled = (Decimal(amount) * self.fill_ratio).quantize(Decimal('1E-8'))
+        trades = []
+        if self.trades:
+            # Fills walk the book from the best level, half of them at a better rate than the limit
+            half = (filled / 2).quantize(Decimal('1E-8'))
+            trades = [{'amount': str(half), 'rate': BOOK['asks'][0][0] if side == 'buy' else BOOK['bids'][0][0]},
+                      {'amount': str(filled - half), 'rate': rate}]
+        return {'orderNumber': '1', 'resultingTrades': trades, 'amountUnfilled': str(Decimal(amount) - filled)}
+
+    def buy(self, pair, rate, amount, orderType=False):
+        return self.fill('buy', pair, rate, amount, orderType)
+
+    def sell(self, pair, rate, amount, orderType=False):
+        return self.fill('sell', pair, rate, amount, orderType)
+
+    def returnBalances(self):
+        return {'BTC': '10', 'ETH': '10', 'LTC': '10'}
+
+    def close_thread_socks(self, threads):
+        self.closed.update(threads)
+
+
+def test_book_vwap():
+    vwap, worst, filled = book_vwap(BOOK['asks'], Decimal('3'))
+    assert worst == Decimal('1.1')
+    assert filled == Decimal('3')
+    assert abs(vwap - Decimal('3.1') / 3) < Decimal('1E-8')
+
+    # Not enough depth
+    _, worst, filled = book_vwap(BOOK['bids'], Decimal('100'))
+    assert worst == Decimal('0.7') and filled == Decimal('14')
+
+
+def test_execute_slices_one_book():
+    tapi = FakeExchange()
+    engine = ExecutionEngine(tapi, 'BTC', slices=4)
+    report = engine.execute('buy', 'ETH', Decimal('4'))
+
+    assert report['done']
+    assert report['filled'] == Decimal('4')
+    assert tapi.books == 1
+    # Child limits walk up the book
+    assert [order[2] for order in tapi.orders] == [Decimal('1.0'), Decimal('1.0'), Decimal('1.1'), Decimal('1.1')]
+
+
+def test_execute_partial_fills_stop():
+    tapi = FakeExchange(fill_ratio=Decimal('0'))
+    engine = ExecutionEngine(tapi, 'BTC', slices=2)
+    report = engine.execute('sell', 'ETH', Decimal('2'))
+
+    # No fill at all: gives up after one pass instead of looping
+    assert not report['done']
+    assert tapi.books == 1
+
+
+def test_execute_price_from_trades():
+    tapi = FakeExchange(trades=True)
+    report = ExecutionEngine(tapi, 'BTC', slices=1).execute('buy', 'ETH', Decimal('4'))
+
+    # Limit at 1.1 for the sweep, half filled at 1.0
+    assert report['done'] and report['cost'] == Decimal('4.2')
+    assert report['price'] == Decimal('1.05')
+
+
+def test_rebalance_concurrent_pairs():
+    tapi = FakeExchange(latency=0.1)
+    engine = ExecutionEngine(tapi, 'BTC', slices=1)
+    reports = engine.rebalance(['ETH', 'LTC', 'XMR'], [Decimal('-1'), Decimal('-2'), Decimal('1')])
+
+    assert [r['side'] for r in reports] == ['sell', 'sell', 'buy']
+    assert all(r['done'] for r in reports)
+    # Both sells pulled their books from different workers at the same time
+    assert len(tapi.threads) >= 2
+    assert tapi.max_active == 2
+
+    # Later rebalances reuse the pool, closing it releases the workers sockets
+    pool = engine.pool
+    engine.rebalance(['ETH', 'LTC'], [Decimal('-1'), Decimal('-1')])
+    assert engine.pool is pool
+    threads = set(engine.threads)
+    engine.close()
+    assert engine.pool is None and tapi.closed == threads and len(threads) >= 2
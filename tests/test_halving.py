@@ -0,0 +1,61 @@
+"""
+Test early stopping hyper parameter search
+"""
+from copy import copy
+
+import numpy as np
+import pytest
+
+from cryptotrader.agents import apriori
+from cryptotrader.agents.halving import SuccessiveHalving, Hyperband, sample_params
+from cryptotrader.envs.trading import BacktestEnvironment
+
+from .mocks import make_feed
+
+
+@pytest.fixture
+def env():
+    return BacktestEnvironment(30, 10, make_feed(length=100), 'USDT', 'halving_test')
+
+
+def test_test_steps_resume(env):
+    env.set_window(20, 40)
+    full_agent = apriori.get('PAMR')(eps=0.7, fiat='USDT')
+    full_env = copy(env)
+    obs, expected, done = full_agent.test_steps(full_env, 30)
+    assert done and full_env.index == 40
+
+    agent = apriori.get('PAMR')(eps=0.7, fiat='USDT')
+    obs, r0, done = agent.test_steps(env, 8)
+    assert not done and agent.step == 8
+    obs, r1, done = agent.test_steps(env, 30, obs)
+    assert done
+    assert r0 + r1 == pytest.approx(expected)
+    assert env.calc_total_portval() == full_env.calc_total_portval()
+
+
+def test_sample_params():
+    rng = np.random.RandomState(0)
+    for _ in range(20):
+        params = sample_params(apriori.spec('PAMR').search_space, rng)
+        assert params['variant'] in ('PAMR0', 'PAMR1', 'PAMR2') and 0. <= params['eps'] <= 1.
+        assert ('C' in params) == (params['variant'] != 'PAMR0')
+
+
+def test_hyperband_brackets():
+    assert Hyperband(3).brackets(9, 27) == [(9, 3.), (5, 9.), (3, 27.)]
+    assert SuccessiveHalving(3).brackets(9, 27) == [(9, 3.)]
+
+
+def test_fit_successive_halving(env):
+    np.random.seed(0)
+    env.reset()
+    agent = apriori.get('OLMAR')(fiat='USDT')
+    params, info = agent.fit(env, 9, 2, {'eps': [0., 20.], 'window': [2, 10]}, nb_max_episode_steps=27, verbose=0,
+                             scheduler=SuccessiveHalving(3, eta=3, seed=1))
+
+    # 9 candidates on 3 steps, 3 resumed to 9 steps and 1 to 27
+    assert [steps for _, steps, _ in info['evaluations']] == [3] * 9 + [9] * 3 + [27]
+    assert info['steps'] == (9 * 3 + 3 * 6 + 18) * 2
+    assert params is info['evaluations'][-1][0]
+    assert agent.window == int(params['window']) and not env.training
@@ -0,0 +1,58 @@
+"""
+Test import time budget
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time budget in seconds, generous enough for slow CI boxes
+BUDGET = float(os.environ.get('CRYPTOTRADER_IMPORT_BUDGET', 3.))
+
+# Backends that must only load on first use
+LAZY = ['bokeh', 'empyrical', 'optunity', 'talib', 'cvxopt', 'scipy']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module):
+    """
+    Import module in a fresh interpreter under -X importtime
+    :return: tuple: cumulative seconds, modules loaded
+    """
+    code = "import sys, %s; print(','.join(sys.modules))" % module
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    lines = [line for line in proc.stderr.splitlines() if line.startswith('import time:')]
+    cumulative = [line.split('|') for line in lines if line.split('|')[-1].strip() == module]
+    return int(cumulative[-1][1]) / 1e6, set(proc.stdout.strip().split(','))
+
+
+@pytest.mark.parametrize('module', ['cryptotrader.envs.trading', 'cryptotrader.agents.apriori'])
+def test_import_budget(module):
+    seconds, modules = import_time(module)
+    assert not modules & set(LAZY), "Eagerly imported: %s" % (modules & set(LAZY))
+    assert seconds < BUDGET, "%s took %.2fs to import" % (module, seconds)
+
+
+def test_strategy_registry_loads_one_module():
+    code = ("import sys; from cryptotrader.agents import apriori; apriori.spec('CWMR'); apriori.get('OLMAR');"
+            "print(','.join(sys.modules))")
+    proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True,
+                          check=True)
+    modules = set(proc.stdout.strip().split(','))
+    strategies = {name for name in modules if name.startswith('cryptotrader.agents.strategies.')}
+    assert strategies == {'cryptotrader.agents.strategies.base', 'cryptotrader.agents.strategies.mean_reversion'}
+    assert not modules & set(LAZY)
+
+
+def test_strategy_registry_metadata():
+    from cryptotrader.agents import apriori
+    for name in apriori.names():
+        cls = apriori.get(name)
+        assert cls.__name__ == name
+        assert set(apriori.spec(name).fields) <= {'open', 'high', 'low', 'close', 'volume', 'amount'}
+    assert apriori.PAMR is apriori.get('PAMR')
+    with pytest.raises(KeyError):
+        apriori.get('NotAStrategy')
@@ -0,0 +1,48 @@
+"""
+Test Poloniex client http session against a local fake server
+"""
+import pytest
+
+from cryptotrader.exchange_api.poloniex import Poloniex
+from cryptotrader.exceptions import ExchangeError
+from .fake_exchange import FakePoloniexServer, TICKER
+
+
+def make_api(server, **kwargs):
+    api = Poloniex(url=server.url, **kwargs)
+    # No client side rate limit against the local server
+    api.coach = None
+    return api
+
+
+@pytest.fixture
+def fake_server():
+    server = FakePoloniexServer().start()
+    yield server
+    server.stop()
+
+
+def test_keep_alive(fake_server):
+    api = make_api(fake_server)
+    for _ in range(10):
+        assert api.returnTicker() == TICKER
+    assert fake_server.requests == 10
+    assert fake_server.connections == 1
+
+
+def test_private_call(fake_server):
+    fake_server.responses['returnBalances'] = {'BTC': '1.00000000'}
+    api = make_api(fake_server, key='key', secret='secret')
+    assert api.returnBalances() == {'BTC': '1.00000000'}
+
+    with pytest.raises(ExchangeError):
+        api('returnOpenLoanOffers')
+
+
+@pytest.mark.parametrize('jsonNums', [False, float, 'fast'])
+def test_json_nums(fake_server, jsonNums):
+    api = make_api(fake_server, jsonNums=jsonNums, compress=False)
+    chart = api.returnChartData('USDT_BTC', 300, start=3000, end=4500)
+
+    assert [c['date'] for c in chart] == [3000, 3300, 3600, 3900, 4200]
+    assert chart[0]['close'] == '1.0'
@@ -0,0 +1,79 @@
+"""
+Test step profiling hooks
+"""
+from threading import Barrier, Thread
+
+import numpy as np
+import pandas as pd
+
+from cryptotrader.agents import apriori
+from cryptotrader.envs.trading import BacktestEnvironment
+from cryptotrader.profiling import StepProfiler
+
+from .mocks import make_feed
+
+
+def make_env():
+    return BacktestEnvironment(30, 5, make_feed(length=30), 'USDT', 'profiling_test')
+
+
+def test_profiler_summary():
+    env = make_env()
+    agent = apriori.get('ConstantRebalance')(fiat='USDT')
+    frame_init = pd.DataFrame.__init__
+    profiler = StepProfiler(capture='cprofile', capture_steps=5, verbose=False)
+
+    agent.test(env, nb_episodes=2, profiler=profiler)
+
+    assert len(profiler.episodes) == 2
+    summary, counters = profiler.episodes[-1]
+    assert counters['steps'] == summary.at['step', 'calls'] == 23
+    assert summary.at['agent.rebalance', 'calls'] == 23
+    assert {'get_observation', 'get_history', 'get_ohlc', 'simulate_trade', 'get_reward'} <= set(summary.index)
+    assert summary.at['get_ohlc', 'total_s'] <= summary.at['get_history', 'total_s'] <= summary.at['step', 'total_s']
+    assert counters['api.returnChartData'] > 0 and counters['frames'] > 0
+    assert 'function calls' in profiler.capture_report
+
+    # Detached, nothing is left wrapped
+    assert 'step' not in env.__dict__ and 'rebalance' not in agent.__dict__
+    assert 'returnChartData' not in env.tapi.__dict__
+    assert pd.DataFrame.__init__ is frame_init
+
+
+def test_profiler_disabled_results_match():
+    rewards = []
+    for profiler in [None, StepProfiler(verbose=False)]:
+        np.random.seed(0)
+        rewards.append(apriori.get('ConstantRebalance')(fiat='USDT').test(make_env(), profiler=profiler))
+    assert rewards[0] == rewards[1]
+
+
+def test_profiler_frames_per_thread():
+    frame_init = pd.DataFrame.__init__
+    barrier = Barrier(2)
+    profilers = [StepProfiler(verbose=False) for _ in range(2)]
+    envs = [make_env() for _ in range(2)]
+    for env in envs:
+        env.reset()
+
+    def run(i):
+        profilers[i].attach(envs[i])
+        barrier.wait()
+        # Threads attach, build frames and detach interleaved
+        for _ in range(10 * (i + 1)):
+            pd.DataFrame()
+        barrier.wait()
+        if i:
+            profilers[i].detach()
+        barrier.wait()
+        pd.DataFrame()
+        profilers[i].detach()
+
+    threads = [Thread(target=run, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [profiler.frames for profiler in profilers] == [11, 20]
+    assert pd.DataFrame.__init__ is frame_init
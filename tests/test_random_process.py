@@ -0,0 +1,63 @@
+"""
+Test random process block sampling
+"""
+import numpy as np
+import pytest
+
+from cryptotrader.random_process import GaussianWhiteNoiseProcess, OrnsteinUhlenbeckProcess, \
+    ConstrainedOrnsteinUhlenbeckProcess, SinusoidalProcess, BlockNoise
+
+
+def make_processes():
+    return [GaussianWhiteNoiseProcess(mu=0.1, sigma=2., sigma_min=0.5, n_steps_annealing=30, size=3),
+            OrnsteinUhlenbeckProcess(theta=3., mu=0.2, sigma=1.5, sigma_min=0.1, n_steps_annealing=40, size=3),
+            ConstrainedOrnsteinUhlenbeckProcess(theta=3., size=3, a_min=-0.5, a_max=0.5),
+            SinusoidalProcess(50, 3, 16)]
+
+
+@pytest.mark.parametrize('index', range(4))
+def test_sample_block_matches_sample(index):
+    np.random.seed(5)
+    process = make_processes()[index]
+    expected = np.stack([process.sample() for _ in range(70)])
+
+    np.random.seed(5)
+    process = make_processes()[index]
+    # Two blocks, state and annealing carry over
+    block = np.concatenate([process.sample_block(25), process.sample_block(45)])
+
+    assert block.shape == (70, 3)
+    np.testing.assert_allclose(block, expected, rtol=1e-10, atol=1e-12)
+
+
+def test_block_noise():
+    np.random.seed(1)
+    process = OrnsteinUhlenbeckProcess(theta=1., size=2)
+    expected = np.stack([process.sample() for _ in range(10)])
+
+    np.random.seed(1)
+    noise = BlockNoise(OrnsteinUhlenbeckProcess(theta=1., size=2), block_size=4)
+    np.testing.assert_allclose(np.stack([noise.sample() for _ in range(10)]), expected, rtol=1e-10, atol=1e-12)
+
+    noise.reset_states()
+    assert noise.block is None
+    np.testing.assert_array_equal(noise.process.x_prev, np.zeros(2))
+
+
+def test_tuple_size_blocks():
+    def make_tuple_processes():
+        return [GaussianWhiteNoiseProcess(sigma=2., sigma_min=0.5, n_steps_annealing=30, size=(2, 3)),
+                OrnsteinUhlenbeckProcess(theta=3., sigma=1.5, sigma_min=0.1, n_steps_annealing=40, size=(2, 3)),
+                ConstrainedOrnsteinUhlenbeckProcess(theta=3., size=(2, 3), a_min=-0.5, a_max=0.5)]
+
+    for index in range(3):
+        np.random.seed(9)
+        process = make_tuple_processes()[index]
+        expected = np.stack([process.sample() for _ in range(20)])
+
+        np.random.seed(9)
+        noise = BlockNoise(make_tuple_processes()[index], block_size=8)
+        block = np.stack([noise.sample() for _ in range(20)])
+
+        assert block.shape == (20, 2, 3)
+        np.testing.assert_allclose(block, expected, rtol=1e-10, atol=1e-12)
@@ -0,0 +1,80 @@
+"""
+Test replay store
+"""
+import numpy as np
+import pytest
+
+from cryptotrader.agents.replay import ReplayStore, SumTree
+from cryptotrader.envs.trading import TrainingEnvironment
+
+from .mocks import make_feed
+
+
+@pytest.fixture
+def env():
+    return TrainingEnvironment(30, 5, make_feed(), 'USDT', 'replay_test', seed=0)
+
+
+def fill(env, store, n_steps):
+    """ Run random actions, keeping every observation seen """
+    seen = []
+    obs = env.reset()
+    rng = np.random.RandomState(0)
+    for _ in range(n_steps):
+        action = rng.dirichlet(np.ones(3))
+        next_obs, reward, done, _ = env.step(action)
+        store.append(obs, action, reward, done)
+        seen.append(obs)
+        obs = env.reset() if done else next_obs
+    seen.append(obs)
+    return seen
+
+
+def test_rebuilds_observations(env):
+    store = ReplayStore.from_env(env, capacity=64)
+    seen = fill(env, store, 150)
+    assert len(store) == 64
+
+    batch = store.sample_batch(32)
+    oldest = store.count - store.capacity
+    for i, step in enumerate(batch['steps']):
+        # Windows reaching before the kept transitions are filled with the oldest amounts
+        if step - store.obs_steps >= oldest:
+            np.testing.assert_allclose(batch['state0'][i], seen[step], rtol=1e-6)
+            np.testing.assert_allclose(batch['state1'][i], seen[step + 1], rtol=1e-6)
+
+    experiences = store.sample(4)
+    assert experiences[0].state0[0].shape == (5, 13)
+
+
+def test_persistence(env, tmpdir):
+    path = str(tmpdir.join('memory'))
+    store = ReplayStore.from_env(env, capacity=100, path=path, alpha=0.6)
+    fill(env, store, 80)
+    store.save()
+
+    loaded = ReplayStore.load(path, seed=1)
+    assert loaded.count == store.count and loaded.tree.total == pytest.approx(store.tree.total)
+    assert isinstance(loaded.buffers['amounts'], np.memmap)
+    steps = np.arange(10, 20)
+    np.testing.assert_array_equal(loaded.observe(steps), store.observe(steps))
+
+
+def test_prioritised_sampling(env):
+    store = ReplayStore.from_env(env, capacity=32, alpha=1.)
+    fill(env, store, 32)
+    steps = np.arange(31)
+    errors = np.full(31, 1e-3)
+    errors[7] = 100.
+    store.update_priorities(steps, errors)
+
+    batch = store.sample_batch(64)
+    assert (batch['steps'] == 7).mean() > 0.9
+    assert batch['weights'].max() == pytest.approx(1.)
+
+
+def test_sum_tree():
+    tree = SumTree(5)
+    tree.update(np.arange(5), [1., 2., 3., 4., 0.])
+    assert tree.total == 10.
+    np.testing.assert_array_equal(tree.find(np.array([0., 0.99, 1., 2.5, 5.9, 6., 9.99])), [0, 0, 1, 1, 2, 3, 3])
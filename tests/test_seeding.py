@@ -0,0 +1,84 @@
+"""
+Test seeded random streams and episode schedules
+"""
+import random
+
+import numpy as np
+
+from cryptotrader.agents import apriori
+from cryptotrader.seeding import child_seed, spawn
+from cryptotrader.envs.trading import BacktestEnvironment
+from cryptotrader.envs.vector import VecTradingEnvironment
+
+from .mocks import make_feed
+
+
+def make_env(seed=None):
+    env = BacktestEnvironment(30, 5, make_feed(), 'USDT', 'seeding_test')
+    env.training = True
+    if seed is not None:
+        env.seed(seed)
+    return env
+
+
+def training_starts(env, n):
+    starts = []
+    for _ in range(n):
+        env.reset()
+        starts.append(env.index)
+    return starts
+
+
+def test_child_seed():
+    assert child_seed(7, 'worker', 2) == child_seed(7, 'worker', np.int64(2))
+    assert len(set(spawn(7, 10, 'worker') + spawn(8, 10, 'worker') + spawn(7, 10, 'episode'))) == 30
+    assert child_seed(None, 'worker', 2) is None
+
+
+def test_env_streams():
+    assert training_starts(make_env(3), 10) == training_starts(make_env(3), 10)
+    assert training_starts(make_env(3), 10) != training_starts(make_env(4), 10)
+
+    # Unseeded envs keep drawing from the global numpy stream
+    np.random.seed(1)
+    starts = training_starts(make_env(), 5)
+    np.random.seed(1)
+    assert starts == list(np.random.randint(6, 59, size=5))
+
+
+def test_episode_schedule():
+    env = make_env(3)
+    schedule = env.episode_schedule(20, seed=5)
+    np.testing.assert_array_equal(schedule[:8], make_env().episode_schedule(8, seed=5))
+    assert schedule.min() >= 6 and schedule.max() <= 58
+
+    env.set_schedule(schedule[:4])
+    assert training_starts(env, 4) == list(schedule[:4])
+
+    vec = VecTradingEnvironment(make_env(), 2, seed=1, dtype=np.float64)
+    vec.set_schedule(schedule)
+    vec.reset()
+    np.testing.assert_array_equal(vec.index, schedule[:2])
+    vec.reset_envs(np.array([False, True]))
+    assert vec.index[1] == schedule[2]
+
+
+def test_fit_keeps_caller_streams():
+    env = make_env(3)
+    env.training = False
+    env.reset()
+    env.set_schedule([10, 20])
+    random.seed(1)
+    np.random.seed(1)
+
+    apriori.get('OLMAR')(fiat='USDT').fit(env, 3, 1, {'eps': [0., 20.], 'window': [2, 10]}, verbose=0,
+                                          episode_seed=7)
+
+    # Neither the global streams nor the env stream and schedule moved
+    random_value, np_value = random.random(), np.random.random()
+    random.seed(1)
+    np.random.seed(1)
+    assert (random_value, np_value) == (random.random(), np.random.random())
+    assert env.seed_value == 3
+    env.training = True
+    assert training_starts(env, 4) == [10, 20] + training_starts(make_env(3), 2)
@@ -0,0 +1,97 @@
+"""
+Test simulated exchange
+"""
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cryptotrader.datafeed import BacktestDataFeed, SimulatedExchange
+from cryptotrader.envs.execution import ExecutionEngine
+from cryptotrader.envs.trading import LiveTradingEnvironment
+from cryptotrader.exchange_api.poloniex import ExchangeError
+
+PAIRS = ['BTC_ETH', 'BTC_LTC']
+
+
+@pytest.fixture
+def exchange():
+    feed = BacktestDataFeed(None, 30, PAIRS, balance={'BTC': '100', 'ETH': '0', 'LTC': '0'})
+    dates = np.arange(100) * 1800 + 1500000000
+    for i, pair in enumerate(PAIRS):
+        price = np.linspace(1., 2., 100) / (i + 1)
+        feed.ohlc_data[pair] = pd.DataFrame({'date': dates, 'open': price, 'high': price * 1.01,
+                                             'low': price * 0.99, 'close': price * 1.005,
+                                             'volume': price * 1000, 'quoteVolume': np.full(100, 1000.)})
+    feed.data_length = 100
+    return SimulatedExchange(feed, levels=10, spread=0.002, tick=0.001, depth=0.1)
+
+
+def test_book(exchange):
+    book = exchange.returnOrderBook('BTC_ETH', 5)
+    assert len(book['asks']) == len(book['bids']) == 5
+    assert float(book['asks'][0][0]) > 1. > float(book['bids'][0][0])
+    assert book['asks'][0][1] == pytest.approx(10.)
+
+    ticker = exchange.returnTicker()
+    assert float(ticker['BTC_LTC']['last']) == pytest.approx(0.5)
+
+    exchange.advance(50)
+    assert float(exchange.returnTicker()['BTC_ETH']['last']) == pytest.approx(1 + 50 / 99)
+
+
+def test_partial_fills_and_slippage(exchange):
+    # Limit at the second level fills two levels only
+    reply = exchange.buy('BTC_ETH', '1.0021', '50')
+    assert float(reply['amountUnfilled']) == pytest.approx(30.)
+    assert len(reply['resultingTrades']) == 2
+
+    # Liquidity is consumed until the next bar
+    reply = exchange.buy('BTC_ETH', '1.0021', '50')
+    assert float(reply['amountUnfilled']) == pytest.approx(50.)
+    exchange.advance()
+    assert exchange.returnOrderBook('BTC_ETH')['asks'][0][1] == pytest.approx(10.)
+
+    balance = exchange.returnBalances()
+    assert float(balance['ETH']) == pytest.approx(20 * 0.9975)
+    assert float(balance['BTC']) < 100 - 20.
+
+
+def test_errors(exchange):
+    with pytest.raises(ExchangeError, match='Not enough ETH'):
+        exchange.sell('BTC_ETH', '0.9', '1')
+    with pytest.raises(ExchangeError, match='Total must be at least'):
+        exchange.buy('BTC_ETH', '1.1', '0.00001')
+
+
+def test_execution_engine(exchange):
+    engine = ExecutionEngine(exchange, 'BTC', slices=4)
+    report = engine.execute('buy', 'LTC', Decimal('30'))
+    assert report['done']
+    assert report['price'] > Decimal('0.5')
+    assert float(exchange.returnBalances()['LTC']) == pytest.approx(30 * 0.9975)
+
+
+def test_live_rebalance(exchange):
+    exchange.index = 50
+    env = LiveTradingEnvironment(30, 3, exchange, 'BTC', 'simulated_live')
+    env.balance = env.init_balance = env.get_balance()
+    env.action_df = pd.DataFrame([list(env.calc_portfolio_vector()) + [False]],
+                                 columns=list(env.symbols) + ['online'], index=[env.timestamp])
+    books = {pair: exchange.book_arrays(pair) for pair in PAIRS}
+
+    assert env.online_rebalance(np.array([0.3, 0.2, 0.5]), env.timestamp)
+    np.testing.assert_allclose(np.float64(env.calc_portfolio_vector()), [0.3, 0.2, 0.5], atol=1e-3)
+
+    # Buys walk the synthetic book from its best ask, consuming what they filled
+    balance = exchange.returnBalances()
+    spent = 0.
+    for i, pair in enumerate(PAIRS):
+        asks, ask_amounts = books[pair][:2]
+        filled = float(balance[pair.split('_')[1]]) / 0.9975
+        fills = np.clip(filled - np.concatenate([[0.], np.cumsum(ask_amounts)[:-1]]), 0., ask_amounts)
+        np.testing.assert_allclose(exchange.consumed[i, 0], fills, atol=1e-6)
+        assert fills[1] > 0
+        spent += np.dot(asks, fills)
+    assert float(balance['BTC']) == pytest.approx(100 - spent, abs=1e-6)
@@ -0,0 +1,62 @@
+"""
+Test zero copy array transport
+"""
+import pytest
+import numpy as np
+import zmq
+
+from cryptotrader.transport import send_arrays, recv_arrays, encode_dtype, decode_dtype, benchmark
+from cryptotrader.utils import send_array, recv_array
+
+
+@pytest.fixture
+def pair():
+    ctx = zmq.Context.instance()
+    rx = ctx.socket(zmq.PAIR)
+    tx = ctx.socket(zmq.PAIR)
+    rx.bind('inproc://test_transport')
+    tx.connect('inproc://test_transport')
+    yield tx, rx
+    tx.close(linger=0)
+    rx.unbind('inproc://test_transport')
+    rx.close(linger=0)
+
+
+def test_roundtrip_multiple_arrays(pair):
+    tx, rx = pair
+    arrays = [np.arange(12, dtype='f4').reshape(3, 4),
+              np.random.random((4, 5))[:, ::2],  # non contiguous
+              np.zeros((0, 3), dtype='i8')]
+    send_arrays(tx, arrays, extra={'step': 1})
+    out, extra = recv_arrays(rx, with_extra=True)
+
+    assert extra == {'step': 1}
+    assert len(out) == len(arrays)
+    for A, B in zip(arrays, out):
+        assert A.dtype == B.dtype
+        np.testing.assert_array_equal(A, B)
+        assert not B.flags.writeable
+
+
+def test_structured_dtype(pair):
+    tx, rx = pair
+    dtype = np.dtype([('date', 'i8'), ('ohlc', 'f8', (4,)), ('pair', 'U8')])
+    A = np.zeros(3, dtype=dtype)
+    A['ohlc'] = np.random.random((3, 4))
+    A['pair'] = 'BTC_ETH'
+    assert decode_dtype(encode_dtype(dtype)) == dtype
+
+    send_array(tx, A)
+    B = recv_array(rx)
+    assert B.dtype == dtype
+    np.testing.assert_array_equal(A, B)
+
+
+def test_nonblocking(pair):
+    tx, rx = pair
+    assert recv_arrays(rx, block=False) is False
+
+
+def test_benchmark():
+    out = benchmark(shape=(64, 64), n_msgs=5)
+    assert out['mb_per_sec'] > 0
@@ -0,0 +1,90 @@
+"""
+Test vectorised environment
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from cryptotrader.envs.trading import BacktestEnvironment, TrainingEnvironment
+from cryptotrader.seeding import np_random
+from cryptotrader.envs.vector import VecTradingEnvironment, WindowSampler
+
+from .mocks import make_feed
+
+
+@pytest.fixture
+def env():
+    return BacktestEnvironment(30, 5, make_feed(), 'USDT', 'vec_test')
+
+
+def test_parity(env):
+    vec = VecTradingEnvironment(env, 1, training=False, dtype=np.float64)
+    rng = np.random.RandomState(1)
+
+    obs = env.reset()
+    vec_obs = vec.reset()
+    np.testing.assert_allclose(vec.to_columns(vec_obs)[0], obs.values, rtol=1e-6)
+
+    for _ in range(20):
+        action = rng.dirichlet(np.ones(3))
+        obs, reward, done, _ = env.step(action)
+        vec_obs, rewards, dones, _ = vec.step(action[None])
+        np.testing.assert_allclose(vec.to_columns(vec_obs)[0], obs.values, rtol=1e-6)
+        assert rewards[0] == pytest.approx(reward, abs=1e-7)
+        assert dones[0] == done
+
+
+def test_batch_step(env):
+    vec = VecTradingEnvironment(env, 64, seed=42)
+    obs = vec.reset()
+    assert obs.shape == (64, 5, 3, 6) and obs.dtype == np.float32
+
+    for _ in range(100):
+        obs, rewards, dones, info = vec.step(np.random.dirichlet(np.ones(3), 64))
+        assert obs.shape == (64, 5, 3, 6)
+        assert np.isfinite(rewards).all()
+        assert (vec.index > vec.obs_steps).all() and (vec.index < vec.data_length).all()
+        assert (info['portval'] > 0).all()
+
+
+def test_training_env_parity(env):
+    train_env = TrainingEnvironment(30, 5, make_feed(), 'USDT', 'train_test')
+    train_env.training = False
+    rng = np.random.RandomState(2)
+
+    obs = env.reset()
+    train_obs = train_env.reset()
+    assert train_obs.dtype == np.float32
+    assert train_env.timestamp == env.timestamp
+    np.testing.assert_allclose(train_obs, obs.values, rtol=1e-5)
+
+    for _ in range(20):
+        action = rng.dirichlet(np.ones(3))
+        obs, reward, done, _ = env.step(action)
+        train_obs, train_reward, train_done, _ = train_env.step(action)
+        np.testing.assert_allclose(train_obs, obs.values, rtol=1e-5)
+        assert train_reward == pytest.approx(reward, abs=1e-5)
+        assert train_done == done
+    assert train_env.calc_total_portval() == pytest.approx(float(env.calc_total_portval()), rel=1e-5)
+
+
+def test_window_sampler(env):
+    sampler = WindowSampler.from_env(env, seed=3)
+    obs, target = sampler.make_batch(8)
+    assert obs.shape == (8, 1, 4, 13) and target.shape == (8, 1, 2, 1)
+
+    # Same sample through the dataframe pipeline
+    index = np_random(3)[0].randint(env.obs_steps, env.data_length, size=8)
+    for i in range(8):
+        env.index = index[i]
+        env.portfolio_df = pd.DataFrame()
+        env.balance = env.init_balance
+        expected = env.get_observation(True).values.astype(np.float32)
+        np.testing.assert_allclose(obs[i, 0], expected[:-1], rtol=1e-6)
+        np.testing.assert_allclose(target[i, 0, :, 0], expected[-1, [3, 9]] / expected[-1, [0, 6]] - 1, rtol=1e-4)
+
+    prefetch = WindowSampler.from_env(env, target_type='classification', prefetch=2)
+    obs, target = prefetch.sample(16)
+    assert obs.shape[0] == 16 and set(np.unique(target)) <= {-1., 0., 1.}
+    assert prefetch.sample(4)[0].shape[0] == 4
+    prefetch.close()
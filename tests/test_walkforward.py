@@ -0,0 +1,72 @@
+"""
+Test walk forward optimization
+"""
+import numpy as np
+import pytest
+
+from cryptotrader.agents import apriori
+from cryptotrader.agents.walkforward import WalkForward, make_folds, narrow_space
+from cryptotrader.envs.trading import BacktestEnvironment
+
+from .mocks import make_feed
+
+
+def test_make_folds():
+    folds = make_folds(11, 100, 30, 20)
+    assert [fold.test for fold in folds] == [(41, 61), (61, 81)]
+    assert [fold.train for fold in folds] == [(11, 41), (31, 61)]
+    assert make_folds(11, 100, 30, 20, anchored=True)[1].train == (11, 61)
+
+
+def test_narrow_space():
+    space = {'variant': {'PAMR0': {'eps': [0., 1.]}, 'PAMR1': {'eps': [0., 1.], 'C': [1., 5000.]}},
+             'window': [2, 60]}
+    narrow = narrow_space(space, {'eps': 0.9, 'C': 10., 'window': 30, 'variant': 'PAMR1'}, 0.5)
+    assert narrow_space(space, {'eps': 0.5, 'C': None}, 1.)['variant']['PAMR1']['C'] == [1., 5000.]
+    assert narrow['variant']['PAMR0']['eps'] == pytest.approx([0.65, 1.])
+    assert narrow['variant']['PAMR1']['C'] == [1., 1259.75]
+    assert narrow['window'] == [15, 45]
+
+
+def test_env_window():
+    env = BacktestEnvironment(30, 10, make_feed(length=60), 'USDT', 'window_test')
+    env.set_window(20, 30)
+    obs = env.reset()
+    assert env.index == 20
+    for step in range(1, 11):
+        obs, _, done, _ = env.step(np.array([0.3, 0.3, 0.4]))
+        assert done == (step == 10)
+    assert env.index == 30 and obs.shape[0] == 10
+    assert env.get_hindsight().shape[0] == 11
+
+
+@pytest.mark.parametrize('warm_start', [True, False])
+def test_walk_forward(warm_start):
+    np.random.seed(3)
+    env = BacktestEnvironment(30, 10, make_feed(length=100), 'USDT', 'walk_forward_test')
+    engine = WalkForward(apriori.get('PAMR')(fiat='USDT'), env, train_size=30, test_size=20,
+                         warm_start=warm_start, max_workers=2)
+
+    equity, report = engine.run(nb_steps=3, batch_size=1, verbose=0)
+
+    assert len(report) == len(engine.folds) == 2
+    # Test folds are contiguous and no step is counted twice
+    assert equity.shape[0] == 41 and equity.index.is_monotonic_increasing and equity.iloc[0] == 1.
+    assert equity.iloc[-1] == pytest.approx(np.prod(report.test_return + 1))
+    # Folds read the template data feed
+    assert engine.fold_env((41, 61)).tapi is env.tapi
+    assert all(set(params) >= {'eps', 'variant'} for params in report.params)
+
+
+def test_walk_forward_parallel_reproducible():
+    reports = []
+    for max_workers in [1, 3, 3]:
+        env = BacktestEnvironment(30, 10, make_feed(length=100), 'USDT', 'walk_forward_test')
+        env.seed(5)
+        engine = WalkForward(apriori.get('PAMR')(fiat='USDT'), env, train_size=30, test_size=20,
+                             warm_start=False, max_workers=max_workers)
+        equity, report = engine.run(nb_steps=3, batch_size=1, verbose=0, episode_seed=3)
+        reports.append((list(report.params), list(equity)))
+
+    # Seeded folds find the same parameters whether they run serially or in parallel
+    assert reports[0] == reports[1] == reports[2]